@@ -0,0 +1,68 @@
+import copy
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from caching import invalidation
+from caching.local import TTLCache
+
+
+token_cache = TTLCache(
+    maxsize=getattr(settings, "AUTH_TOKEN_CACHE_MAXSIZE", 10000),
+    ttl=getattr(settings, "AUTH_TOKEN_CACHE_TTL", 300),
+    name="auth_token",
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication backed by an in-process TTL cache
+
+    The token lookup joins the user and its employee profile in one query, so
+    IsEmployee/IsManager/CanUpdateOrderStatus read request.user.employee
+    without touching the database. Entries are dropped in every worker through
+    the invalidation bus, which the signal handlers in backoffice.signals
+    publish to whenever the Token, User or Employee changes.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+
+        if cached is None:
+            try:
+                cached = Token.objects.select_related("user", "user__employee").get(
+                    key=key
+                )
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+            # Tagged with the user so invalidate_user finds it without a scan
+            token_cache.set(key, cached, tag=cached.user_id)
+
+        if not cached.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        # Hand every request its own copies so per-request mutations never
+        # leak into the cached instances
+        user = copy.copy(cached.user)
+        token = copy.copy(cached)
+        token.user = user
+        return (user, token)
+
+
+def invalidate_token(key):
+    token_cache.invalidate(key)
+
+
+def invalidate_user(user_id):
+    if user_id is None:
+        token_cache.clear()
+    else:
+        token_cache.delete_tag(user_id)
+
+
+invalidation.subscribe("auth.token", invalidate_token)
+invalidation.subscribe("auth.user", invalidate_user)
@@ -0,0 +1,44 @@
+"""
+Password hashing across a process pool
+
+The pool's processes are started with "spawn": forking a worker that runs
+threads (the log listener, the invalidation bus, the server's own) can copy
+locks some thread held at the time and deadlock the child. A spawned process
+starts a fresh interpreter and unpickles the functions it runs by importing
+their modules, so this module doesn't import the ORM: it is imported before
+Django's apps are loaded.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Below this many passwords the pool start-up costs more than it saves
+PARALLEL_HASH_THRESHOLD = 8
+
+
+def _init_worker(settings_module):
+    # make_password only needs the settings (PASSWORD_HASHERS), not the apps
+    os.environ["DJANGO_SETTINGS_MODULE"] = settings_module
+
+
+def hash_passwords(passwords, processes=None):
+    """Hash passwords with the configured hasher, in parallel when worthwhile"""
+    if processes is None:
+        processes = settings.ONBOARDING_HASH_PROCESSES
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (processes * 4))
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(settings.SETTINGS_MODULE,),
+    ) as executor:
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
@@ -0,0 +1,75 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backoffice.onboarding import OnboardingError, bulk_register_employees
+
+
+class Command(BaseCommand):
+    help = (
+        "Register employees in bulk from a CSV or JSON file. CSV files need a "
+        "header row with username,password,email,first_name,last_name,role,"
+        "phone_number; JSON files hold a list of objects with the same keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON file with employee records")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Password hashing processes (default: ONBOARDING_HASH_PROCESSES)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per INSERT statement",
+        )
+        parser.add_argument(
+            "--tokens-out",
+            help="Write username,token pairs for the new employees to this CSV",
+        )
+
+    def handle(self, *args, **options):
+        records = self.read_records(options["path"])
+        if not records:
+            raise CommandError("No employee records found.")
+
+        started = time.perf_counter()
+        try:
+            created = bulk_register_employees(
+                records,
+                processes=options["processes"],
+                batch_size=options["batch_size"],
+            )
+        except OnboardingError as e:
+            for error in e.errors:
+                self.stderr.write(
+                    f"Record {error['index']} ({error['username']}): {error['error']}"
+                )
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options["tokens_out"]:
+            with open(options["tokens_out"], "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["username", "token"])
+                for row in created:
+                    writer.writerow([row["username"], row["token"]])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Registered {len(created)} employees in {elapsed:.2f}s")
+        )
+
+    def read_records(self, path):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                if path.endswith(".json"):
+                    data = json.load(f)
+                    return data.get("employees", []) if isinstance(data, dict) else data
+                return list(csv.DictReader(f))
+        except (OSError, json.JSONDecodeError, csv.Error) as e:
+            raise CommandError(f"Could not read {path}: {e}")
@@ -0,0 +1,86 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker imports before serving its first request
+STARTUP = (
+    "import django_project.wsgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def parse_import_times(output):
+    """(module, self µs, cumulative µs, depth) for each line of -X importtime"""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            modules.append((module, int(own), int(cumulative), len(indent) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the app as a worker does at startup (settings, apps, WSGI "
+        "handler and URLconf) in a fresh interpreter under -X importtime, and "
+        "report the slowest imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=25)
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Rank modules by their own import time or including their imports",
+        )
+        parser.add_argument(
+            "--module",
+            action="append",
+            default=[],
+            help="Also import this module, as a request using it would",
+        )
+
+    def handle(self, *args, **options):
+        code = STARTUP + "".join(f"import {name}\n" for name in options["module"])
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        modules = parse_import_times(result.stderr)
+        if result.returncode != 0 or not modules:
+            raise CommandError(f"Importing the app failed:\n{result.stderr[-2000:]}")
+
+        total = sum(own for _, own, _, _ in modules)
+        self.stdout.write(f"{len(modules)} modules imported in {total / 1000:.1f} ms\n")
+
+        key = 2 if options["sort"] == "cumulative" else 1
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for module, own, cumulative, depth in sorted(
+            modules, key=lambda row: row[key], reverse=True
+        )[: options["top"]]:
+            self.stdout.write(f"{own / 1000:9.1f} {cumulative / 1000:9.1f}  {module}")
+
+        # Own time summed per top-level package, nested imports included
+        packages = defaultdict(int)
+        for module, own, _, _ in modules:
+            packages[module.partition(".")[0]] += own
+        self.stdout.write(f"\n{'ms':>9}  package")
+        for package, own in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[: options["top"]]:
+            self.stdout.write(f"{own / 1000:9.1f}  {package}")
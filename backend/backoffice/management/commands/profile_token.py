@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_project.profiling import HEADER, MODES, make_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Print a signed X-Profile header value. Requests that carry it are "
+        "profiled and the profile is written to PROFILER_DIR."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, default="sample")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{HEADER}: {make_token(options['mode'])}")
+        self.stderr.write(
+            f"Valid for {settings.PROFILER_TOKEN_MAX_AGE} seconds; profiles are "
+            f"written to {settings.PROFILER_DIR}"
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backoffice', '0004_alter_employee_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['is_active', 'role'], name='employee_active_role_idx'),
+        ),
+    ]
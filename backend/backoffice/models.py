@@ -25,3 +25,9 @@ class Employee(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.role}"
+
+    class Meta:
+        indexes = [
+            # Backs the roster listing filters (is_active, optionally role)
+            models.Index(fields=["is_active", "role"], name="employee_active_role_idx"),
+        ]
@@ -0,0 +1,151 @@
+"""
+Bulk employee onboarding
+
+Registering one employee at a time pays a full PBKDF2 hash plus a handful of
+single-row inserts (User, Employee and the Token created by the post_save
+signal) per person. ``bulk_register_employees`` hashes the passwords across a
+process pool and writes each table with one bulk_create.
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+
+from .hashing import hash_passwords
+from .models import Employee
+from .serializers import EmployeeRecordSerializer
+
+USER_FIELDS = ["username", "email", "first_name", "last_name"]
+
+
+class OnboardingError(Exception):
+    """Raised when a batch is rejected; ``errors`` lists the offending rows"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid employee record(s)")
+        self.errors = errors
+
+
+def _error(index, username, error):
+    # Only echo usernames that are strings; anything else was rejected
+    if not isinstance(username, str):
+        username = None
+    return {"index": index, "username": username, "error": error}
+
+
+def validate_employee_records(records):
+    """
+    Validate ``records`` with EmployeeRecordSerializer and check their
+    usernames are unique in the batch and not taken yet
+
+    Returns:
+        (valid records, errors) where errors lists {"index", "username",
+        "error"} dicts and is empty when every record is valid
+    """
+    valid = []
+    errors = []
+    indexes = {}
+
+    for index, record in enumerate(records):
+        serializer = EmployeeRecordSerializer(data=record)
+        if not serializer.is_valid():
+            username = record.get("username") if isinstance(record, dict) else None
+            for field, messages in serializer.errors.items():
+                prefix = (
+                    "" if field == api_settings.NON_FIELD_ERRORS_KEY else f"{field}: "
+                )
+                errors.extend(
+                    _error(index, username, f"{prefix}{message}")
+                    for message in messages
+                )
+            continue
+
+        username = serializer.validated_data["username"]
+        if username in indexes:
+            errors.append(_error(index, username, "duplicate username in batch"))
+            continue
+        indexes[username] = index
+        valid.append(serializer.validated_data)
+
+    existing = User.objects.filter(username__in=indexes).values_list(
+        "username", flat=True
+    )
+    errors.extend(
+        _error(indexes[username], username, "username already exists")
+        for username in existing
+    )
+    errors.sort(key=lambda error: error["index"])
+
+    return valid, errors
+
+
+def bulk_register_employees(records, processes=None, batch_size=500):
+    """
+    Create Users, Employees and Tokens for ``records`` in one transaction
+
+    Args:
+        records: List of dictionaries with username, password, email,
+            first_name, last_name, role and phone_number
+        processes: Size of the password hashing pool (default:
+            ONBOARDING_HASH_PROCESSES)
+        batch_size: Rows per INSERT statement
+
+    Returns:
+        A list of {"user_id", "username", "role", "token"} dictionaries in the
+        same order as ``records``
+
+    Raises:
+        OnboardingError: when any record is invalid; nothing is written
+    """
+    records, errors = validate_employee_records(records)
+    if errors:
+        raise OnboardingError(errors)
+
+    hashed = hash_passwords([record["password"] for record in records], processes)
+
+    users = [
+        User(
+            password=password,
+            **{field: record.get(field) or "" for field in USER_FIELDS},
+        )
+        for record, password in zip(records, hashed)
+    ]
+
+    with transaction.atomic():
+        # bulk_create skips post_save, so create_auth_token doesn't fire per
+        # row; the tokens are inserted in bulk below instead
+        User.objects.bulk_create(users, batch_size=batch_size)
+
+        if any(user.pk is None for user in users):
+            # Backends that can't return ids from a bulk insert
+            ids = dict(
+                User.objects.filter(
+                    username__in=[user.username for user in users]
+                ).values_list("username", "id")
+            )
+            for user in users:
+                user.pk = ids[user.username]
+
+        employees = [
+            Employee(
+                user=user,
+                role=record["role"],
+                phone_number=record.get("phone_number") or "",
+            )
+            for record, user in zip(records, users)
+        ]
+        Employee.objects.bulk_create(employees, batch_size=batch_size)
+
+        tokens = [Token(key=Token.generate_key(), user=user) for user in users]
+        Token.objects.bulk_create(tokens, batch_size=batch_size)
+
+    return [
+        {
+            "user_id": user.pk,
+            "username": user.username,
+            "role": employee.role,
+            "token": token.key,
+        }
+        for user, employee, token in zip(users, employees, tokens)
+    ]
@@ -1,5 +1,3 @@
-from typing import ReadOnly
-
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
@@ -34,3 +32,42 @@ class EmployeeSerializer(serializers.ModelSerializer):
             "hire_date",
             "is_active",
         ]
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+class EmployeeRecordSerializer(serializers.Serializer):
+    """One record of a bulk onboarding batch (see backoffice.onboarding)"""
+
+    username = serializers.CharField(
+        max_length=_max_length(User, "username"),
+        validators=[User.username_validator],
+    )
+    password = serializers.CharField(trim_whitespace=False)
+    email = serializers.EmailField(
+        max_length=_max_length(User, "email"),
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+    )
+    first_name = serializers.CharField(
+        max_length=_max_length(User, "first_name"),
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+    )
+    last_name = serializers.CharField(
+        max_length=_max_length(User, "last_name"),
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+    )
+    role = serializers.ChoiceField(choices=Employee.ROLE_CHOICES)
+    phone_number = serializers.CharField(
+        max_length=_max_length(Employee, "phone_number"),
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+    )
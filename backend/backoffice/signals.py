@@ -1,8 +1,10 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from caching import invalidation
+
 from .models import Employee
 
 
@@ -17,3 +19,22 @@ def assign_default_permissions(sender, instance, created, **kwargs):
     if created:
         # You can add any default permissions or groups here
         pass
+
+
+# Keep the cached token -> user resolution in CachedTokenAuthentication fresh
+# in every worker
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidation.publish("auth.token", instance.key)
+    invalidation.publish("auth.user", instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidation.publish("auth.user", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def invalidate_cached_employee(sender, instance, **kwargs):
+    if instance.user_id:
+        invalidation.publish("auth.user", instance.user_id)
@@ -1,3 +1,238 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from django_project.testing import QueryBudgetMixin
+
+from .authentication import CachedTokenAuthentication, token_cache
+from .models import Employee
+
+
+def create_employees(count, role="chef"):
+    start = User.objects.count()
+    users = User.objects.bulk_create(
+        User(
+            username=f"employee{start + i}",
+            email=f"employee{start + i}@example.com",
+            first_name="Employee",
+            last_name=str(start + i),
+        )
+        for i in range(count)
+    )
+    return Employee.objects.bulk_create(
+        Employee(user=user, role=role, phone_number="5550000000") for user in users
+    )
+
+
+class BackofficeQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="admin")
+        self.manager = User.objects.create_user("manager", password="manager")
+        Employee.objects.create(
+            user=self.manager, role="manager", phone_number="5550000001"
+        )
+
+    def seed(self, count):
+        create_employees(count)
+
+    def test_users_list(self):
+        self.authenticate(self.admin)
+        self.assertWithinBudget(
+            lambda: self.client.get("/users/"), queries=2, max_bytes=12_000
+        )
+
+    def test_users_list_by_role(self):
+        self.authenticate(self.admin)
+        self.assertWithinBudget(
+            lambda: self.client.get("/users/", {"role": "chef", "is_active": "true"}),
+            queries=2,
+            max_bytes=12_000,
+        )
+
+    def test_employees_list(self):
+        self.authenticate(self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.get("/employees/"), queries=2, max_bytes=6_000
+        )
+
+    def test_employee_retrieve(self):
+        self.authenticate(self.manager)
+        employee = Employee.objects.get(user=self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.get(f"/employees/{employee.pk}/"),
+            queries=1,
+            max_bytes=200,
+        )
+
+    def test_employee_profile(self):
+        self.authenticate(self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.get("/employees/profile/"), queries=0, max_bytes=200
+        )
+
+
+class TokenCacheTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.manager = User.objects.create_user("manager", password="manager")
+        self.employee = Employee.objects.create(
+            user=self.manager, role="manager", phone_number="5550000001"
+        )
+        self.token = Token.objects.get(user=self.manager)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_cached_requests_check_permissions_without_queries(self):
+        self.assertEqual(self.client.get("/employees/profile/").status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/employees/profile/").status_code, 200)
+
+    def test_role_changes_apply_to_cached_tokens(self):
+        self.assertEqual(self.client.get("/employees/").status_code, 200)
+        self.employee.role = "chef"
+        self.employee.save()
+        self.assertEqual(self.client.get("/employees/").status_code, 403)
+
+    def test_deactivated_users_are_rejected(self):
+        self.assertEqual(self.client.get("/employees/profile/").status_code, 200)
+        self.manager.is_active = False
+        self.manager.save()
+        self.assertEqual(self.client.get("/employees/profile/").status_code, 401)
+
+    def test_deleted_tokens_are_rejected(self):
+        self.assertEqual(self.client.get("/employees/profile/").status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get("/employees/profile/").status_code, 401)
+
+    def test_user_changes_drop_only_that_users_tokens(self):
+        other = User.objects.create_user("other", password="other")
+        other_key = Token.objects.get(user=other).key
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+        authentication.authenticate_credentials(other_key)
+
+        self.manager.last_login = timezone.now()
+        self.manager.save(update_fields=["last_login"])
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_key))
+        self.assertEqual(token_cache._tags, {other.pk: {other_key}})
+
+    def test_requests_get_their_own_user(self):
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user.first_name = "Changed"
+        again, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertIsNot(again, user)
+        self.assertEqual(again.first_name, "")
+
+
+def employee_record(username, **fields):
+    return {
+        "username": username,
+        "password": f"{username}-password",
+        "email": f"{username}@example.com",
+        "first_name": "New",
+        "last_name": "Hire",
+        "role": "chef",
+        "phone_number": "5550000002",
+        **fields,
+    }
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    ONBOARDING_HASH_PROCESSES=1,
+)
+class BulkOnboardingTests(APITestCase):
+    def setUp(self):
+        manager = User.objects.create_user("manager")
+        Employee.objects.create(user=manager, role="manager", phone_number="1")
+        self.client.force_authenticate(manager)
+
+    def register(self, records):
+        return self.client.post(
+            "/employees/bulk-register/", {"employees": records}, format="json"
+        )
+
+    def test_creates_users_employees_and_tokens(self):
+        response = self.register(
+            [employee_record("ana"), employee_record("ben", role="delivery")]
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["total_created"], 2)
+        for row in response.data["created"]:
+            user = User.objects.select_related("employee").get(pk=row["user_id"])
+            self.assertTrue(user.check_password(f"{user.username}-password"))
+            self.assertEqual(user.employee.role, row["role"])
+            self.assertEqual(Token.objects.get(user=user).key, row["token"])
+        self.assertEqual(
+            [row["role"] for row in response.data["created"]], ["chef", "delivery"]
+        )
+
+    def test_invalid_records_are_reported_and_nothing_is_written(self):
+        User.objects.create_user("taken")
+        records = [
+            employee_record("ok"),
+            "not an object",
+            employee_record(["a", "list"], email=""),
+            employee_record("x" * 151),
+            employee_record("longphone", phone_number="1" * 16),
+            employee_record("cook", role="cook"),
+            employee_record("nopassword", password=""),
+            employee_record("ok"),
+            employee_record("taken"),
+        ]
+
+        response = self.register(records)
+
+        self.assertEqual(response.status_code, 400)
+        errors = [(error["index"], error["error"]) for error in response.data["errors"]]
+        self.assertEqual([index for index, _ in errors], [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertIn("dictionary", errors[0][1])
+        self.assertTrue(errors[1][1].startswith("username: "))
+        self.assertIn("150 characters", errors[2][1])
+        self.assertTrue(errors[3][1].startswith("phone_number: "))
+        self.assertTrue(errors[4][1].startswith("role: "))
+        self.assertTrue(errors[5][1].startswith("password: "))
+        self.assertEqual(errors[6][1], "duplicate username in batch")
+        self.assertEqual(errors[7][1], "username already exists")
+        self.assertIsNone(response.data["errors"][1]["username"])
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Employee.objects.count(), 1)
+
+
+class OnboardEmployeesCommandTests(APITestCase):
+    def test_hashes_across_processes(self):
+        # Spawned processes load the settings module afresh, so they hash with
+        # the configured PBKDF2 hasher: keep the batch small
+        records = [employee_record(f"hire{i}") for i in range(8)]
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / "employees.json"
+        path.write_text(json.dumps(records))
+        tokens = directory / "tokens.csv"
+
+        call_command(
+            "onboard_employees",
+            str(path),
+            "--processes",
+            "2",
+            "--tokens-out",
+            str(tokens),
+            stdout=io.StringIO(),
+        )
+
+        users = User.objects.filter(username__startswith="hire").order_by("id")
+        self.assertEqual(len(users), 8)
+        self.assertTrue(users[7].check_password("hire7-password"))
+        self.assertEqual(len(tokens.read_text().splitlines()), 9)
@@ -3,24 +3,74 @@ from django.contrib.auth.models import User
 from rest_framework import status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from .models import Employee
+from .onboarding import OnboardingError, bulk_register_employees
 from .permissions import CanUpdateOrderStatus, IsEmployee, IsManager
 from .serializers import EmployeeSerializer, UserSerializer
 
 
+class BackofficePagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+def parse_bool(value):
+    return str(value).lower() in ["1", "true", "yes"]
+
+
 # ViewSets define the view behavior.
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    # The serializer links the reverse `employee` relation, join it up front
+    queryset = User.objects.select_related("employee").order_by("id")
     serializer_class = UserSerializer
+    pagination_class = BackofficePagination
+
+    def get_queryset(self):
+        """
+        Optional filters: ?role=<employee role>&is_active=<true|false>
+        """
+        queryset = super().get_queryset()
+
+        if self.action == "list":
+            role = self.request.query_params.get("role")
+            is_active = self.request.query_params.get("is_active")
+
+            if role:
+                queryset = queryset.filter(employee__role=role)
+            if is_active is not None:
+                queryset = queryset.filter(is_active=parse_bool(is_active))
+
+        return queryset
 
 
 class EmployeeViewSet(viewsets.ModelViewSet):
-    queryset = Employee.objects.filter(is_active=True)
+    # EmployeeSerializer renders `user` as a primary key, so no join is needed
+    queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsManager]  # Only managers can manage employees
+    pagination_class = BackofficePagination
+
+    def get_queryset(self):
+        """
+        Only active employees by default; listing accepts ?is_active=false to
+        see inactive ones and ?role=<role> (both served by employee_active_role_idx)
+        """
+        queryset = super().get_queryset()
+        is_active = True
+
+        if self.action == "list":
+            role = self.request.query_params.get("role")
+            if role:
+                queryset = queryset.filter(role=role)
+            if "is_active" in self.request.query_params:
+                is_active = parse_bool(self.request.query_params["is_active"])
+
+        return queryset.filter(is_active=is_active).order_by("id")
 
     @action(detail=False, methods=["get"], permission_classes=[IsEmployee])
     def profile(self, request):
@@ -62,3 +112,36 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             },
             status=status.HTTP_201_CREATED,
         )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-register",
+        permission_classes=[IsManager],
+    )
+    def bulk_register(self, request):
+        """
+        Register many employees at once
+        Expected body: {"employees": [{username, password, email, first_name,
+        last_name, role, phone_number}, ...]}
+        """
+        records = request.data.get("employees")
+
+        if not isinstance(records, list) or not records:
+            return Response(
+                {"error": "Provide a non-empty 'employees' list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            created = bulk_register_employees(records)
+        except OnboardingError as e:
+            return Response(
+                {"error": str(e), "errors": e.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"created": created, "total_created": len(created)},
+            status=status.HTTP_201_CREATED,
+        )
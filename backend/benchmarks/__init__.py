@@ -0,0 +1,13 @@
+"""
+Microbenchmarks for hot Python paths
+
+Run from the backend directory:
+
+    python -m benchmarks [--filter serializer] [--output results.json]
+    python -m benchmarks --compare results.json
+
+Every case runs against a fresh in-memory SQLite database seeded from a
+fixed seed. Timing rounds that write are rolled back, so every round sees
+the same data. Results record ops/sec and the memory allocated per call
+(tracemalloc), tagged with the git commit so runs can be compared.
+"""
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+
+
+def setup_django():
+    """Point the project at a private in-memory SQLite database"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+    os.environ.setdefault("DJANGO_SECRET_KEY", "benchmarks")
+    os.environ["DATABASE_ENGINE"] = "sqlite3"
+    os.environ["DATABASE_NAME"] = ":memory:"
+    # Write last_seen through instead of starting the background flusher
+    os.environ["CUSTOMER_LAST_SEEN_FLUSH_INTERVAL"] = "0"
+
+    import django
+
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Minimum seconds per round"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    from . import cases, runner
+
+    cases.seed(args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'case':<46}{'ops/s':>12}{'median us':>12}{'peak B/call':>13}")
+    for case in runner.registered(args.filter):
+        result = runner.run(case, args.repeat, args.min_time, args.seed)
+        results[case.name] = result
+
+        line = (
+            f"{case.name:<46}{result['best_ops_per_sec']:>12,.1f}"
+            f"{result['median_us']:>12,.1f}{result['peak_bytes_per_call']:>13,}"
+        )
+        previous = (baseline or {}).get(case.name)
+        if previous:
+            change = result["best_ops_per_sec"] / previous["best_ops_per_sec"] - 1
+            line += f"  {change:+.1%} vs baseline"
+        print(line, flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"environment": runner.environment(), "results": results}, f, indent=2
+            )
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
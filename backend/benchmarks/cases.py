@@ -0,0 +1,158 @@
+import io
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from delivery import seeding
+from delivery.models import Order
+from delivery.serializers import OrderSerializer
+from delivery.views import order_items_prefetch
+from menu.models import MenuItem
+from menu.views import MenuItemViewSet
+
+from .runner import benchmark
+
+MENU_ITEMS = 30
+ORDERS = 200
+BASKET = 4
+CSV_ROWS = 50
+
+
+def seed(seed=0):
+    """The fixed data set every case runs against"""
+    seeding.seed_menu(MENU_ITEMS, sizes_per_item=3, seed=seed)
+    seeding.seed_orders(
+        ORDERS, customers=50, days=30, basket_mean=BASKET, method="bulk", seed=seed
+    )
+    User.objects.create_superuser("benchmarks", password="benchmarks")
+
+
+def _menu_items_data(rng):
+    return [
+        {
+            "menu_item_id": item.pk,
+            "size_id": rng.choice(list(item.sizes.all())).pk,
+            "quantity": rng.randint(1, 3),
+        }
+        for item in rng.sample(list(MenuItem.objects.prefetch_related("sizes")), BASKET)
+    ]
+
+
+def _order_fields():
+    return {
+        "customer_name": "Benchmark Customer",
+        "customer_phone": "5550000000",
+        "customer_email": "benchmark@example.com",
+        "address_line_1": "1 Main Street",
+        "no_exterior": "1",
+        "card_number": "4242",
+        "card_holder": "Benchmark Customer",
+        "expiry_date": "12/2030",
+        "cvv": "123",
+        "total_amount": Decimal("0"),
+    }
+
+
+@benchmark("OrderSerializer.to_representation")
+def order_to_representation(number):
+    order = Order.objects.prefetch_related(order_items_prefetch()).order_by("pk")[0]
+    serializer = OrderSerializer()
+    return lambda: serializer.to_representation(order)
+
+
+@benchmark("OrderSerializer(many=True).data[25 orders]")
+def order_page_data(number):
+    page = list(
+        Order.objects.prefetch_related(order_items_prefetch()).order_by("pk")[:25]
+    )
+    return lambda: OrderSerializer(page, many=True).data
+
+
+@benchmark("OrderSerializer.create")
+def order_serializer_create(number):
+    rng = random.Random(0)
+    payloads = iter(
+        [
+            {
+                "customer_info": {"name": "Ana", "phone": "5550001111"},
+                "address_info": {"address_line_1": "1 Main", "no_exterior": "1"},
+                "order_instructions": {"special_instructions": ""},
+                "payment_info": {
+                    "card_number": "4242424242424242",
+                    "card_holder": "Ana",
+                    "expiry_date": "12/2030",
+                    "cvv": "123",
+                },
+                "menu_items": _menu_items_data(rng),
+            }
+            for _ in range(number)
+        ]
+    )
+
+    def create():
+        serializer = OrderSerializer(data=next(payloads))
+        serializer.is_valid(raise_exception=True)
+        serializer.save(transaction_id="txn_benchmark", status="pending")
+
+    return create
+
+
+@benchmark(f"Order.create_order_items[{BASKET} items]")
+def order_create_order_items(number):
+    rng = random.Random(0)
+    orders = Order.objects.bulk_create(
+        Order(order_number=f"BENCH-{uuid.uuid4().hex}", **_order_fields())
+        for _ in range(number)
+    )
+    work = iter([(order, _menu_items_data(rng)) for order in orders])
+
+    def create_items():
+        order, items = next(work)
+        order.create_order_items(items)
+
+    return create_items
+
+
+@benchmark("Order.calculate_total_amount")
+def order_calculate_total_amount(number):
+    order = Order.objects.order_by("pk")[0]
+    return order.calculate_total_amount
+
+
+@benchmark(f"MenuItemViewSet.upload_from_csv[{CSV_ROWS} rows]")
+def menu_upload_from_csv(number):
+    admin = User.objects.get(username="benchmarks")
+    view = MenuItemViewSet.as_view({"post": "upload_from_csv"})
+    factory = APIRequestFactory()
+
+    def make_request(round_number):
+        content = io.StringIO()
+        content.write(
+            "name,category,type,imgAlt,imgSrc,"
+            "size_name1,price1,description1,size_name2,price2,description2\n"
+        )
+        for row in range(CSV_ROWS):
+            # Unique names, so every call creates rather than updates
+            name = f"CSV item {round_number}-{row}"
+            content.write(
+                f"{name},Pizzas,food,{name},https://example.com/{row}.jpg,"
+                f'Small,9.50,"Small {name}",Large,14.00,"Large {name}"\n'
+            )
+        upload = SimpleUploadedFile(
+            "menu.csv", content.getvalue().encode(), content_type="text/csv"
+        )
+        request = factory.post("/menu/upload-csv/", {"file": upload})
+        force_authenticate(request, user=admin)
+        return request
+
+    requests = iter([make_request(i) for i in range(number)])
+
+    def upload():
+        response = view(next(requests))
+        assert response.status_code == 201, response.data
+
+    return upload
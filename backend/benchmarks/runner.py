@@ -0,0 +1,114 @@
+import gc
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import django
+from django.db import transaction
+
+_registry = []
+
+
+@dataclass
+class Benchmark:
+    name: str
+    prepare: object
+
+
+def benchmark(name):
+    """
+    Register a case. The decorated function takes the number of calls a
+    round will make, does any untimed preparation, and returns the function
+    to time (called with no arguments)
+    """
+
+    def register(prepare):
+        _registry.append(Benchmark(name, prepare))
+        return prepare
+
+    return register
+
+
+def registered(name_filter=None):
+    return [case for case in _registry if not name_filter or name_filter in case.name]
+
+
+def _round(case, number):
+    """Seconds taken by ``number`` calls, preparation excluded"""
+    with transaction.atomic():
+        call = case.prepare(number)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for _ in range(number):
+                call()
+            elapsed = time.perf_counter() - started
+        finally:
+            if gc_enabled:
+                gc.enable()
+        # Undo any writes so later rounds see the same data
+        transaction.set_rollback(True)
+    return elapsed
+
+
+def _allocations(case, number):
+    """Bytes allocated and peak bytes per call, measured with tracemalloc"""
+    with transaction.atomic():
+        call = case.prepare(number)
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            for _ in range(number):
+                call()
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+    return (after - before) / number, (peak - before) / number
+
+
+def run(case, repeat=5, min_time=0.2, seed=0):
+    # Calibrate: grow the call count until a round takes at least min_time
+    number = 1
+    while True:
+        random.seed(seed)
+        if _round(case, number) >= min_time or number >= 1_000_000:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        random.seed(seed)
+        timings.append(_round(case, number) / number)
+
+    random.seed(seed)
+    retained, peak = _allocations(case, min(number, 100))
+
+    return {
+        "calls_per_round": number,
+        "rounds": repeat,
+        "best_ops_per_sec": round(1 / min(timings), 1),
+        "median_ops_per_sec": round(1 / statistics.median(timings), 1),
+        "best_us": round(min(timings) * 1e6, 2),
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "stdev_us": round(statistics.pstdev(timings) * 1e6, 2),
+        "retained_bytes_per_call": round(retained),
+        "peak_bytes_per_call": round(peak),
+    }
+
+
+def environment():
+    from django_project.loadtest import git_commit
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "django": django.get_version(),
+        "machine": platform.machine(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
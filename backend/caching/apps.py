@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+class CachingConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "caching"
+
+    def ready(self):
+        from .invalidation import bus
+
+        # Workers start listening for other workers' invalidations when they
+        # serve their first request, after any fork
+        request_started.connect(bus.ensure_listening, dispatch_uid="cache-invalidation")
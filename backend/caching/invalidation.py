@@ -0,0 +1,152 @@
+"""
+Cross-worker invalidation of in-process caches
+
+In-process caches subscribe to a topic with a handler that drops one key, or
+everything when the key is None. Model signal handlers publish to the topic
+when a row changes. The bus applies the invalidation in the publishing worker
+right away and again once the transaction commits, and sends it to the other
+workers through the transport named by INVALIDATION_TRANSPORT:
+
+- "local": this process only (a single worker, tests)
+- "postgres": LISTEN/NOTIFY on INVALIDATION_CHANNEL. Notifications go out
+  when the writing transaction commits and reach every worker of every
+  container.
+- "socket": datagrams between the workers of one host (or container),
+  through their Unix sockets in INVALIDATION_SOCKET_DIR
+- "table": a shared table of per-topic versions, polled every
+  INVALIDATION_POLL_INTERVAL seconds; works on any database but drops whole
+  topics rather than single keys
+
+Messages carry the publishing process and a version that grows with every
+message it sends. A worker that may have missed messages (its listener lost
+the database connection, a datagram was dropped, polling failed) drops
+everything its subscribers cache. Stale entries therefore survive at most
+INVALIDATION_RETRY_INTERVAL seconds after a failure, or one poll interval
+with the table transport.
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from django_project import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = {
+    "local": "caching.transports.LocalTransport",
+    "postgres": "caching.transports.PostgresNotifyTransport",
+    "socket": "caching.transports.UnixSocketTransport",
+    "table": "caching.transports.VersionTableTransport",
+}
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.handlers = {}
+        self.origin = None
+        self.transport = None
+        self._pid = None
+        self._version = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, handler):
+        """Call ``handler(key)`` for every invalidation published to ``topic``"""
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic, key=None):
+        """Invalidate ``key`` (everything when None) of ``topic`` in all workers"""
+        transport = self.get_transport()
+        self.apply(topic, key, "local")
+        if transport.transactional:
+            # Sent with the writing transaction, so it is dropped on rollback
+            transport.send(self.message(topic, key))
+
+        def committed():
+            # Drops anything cached from the old row while the write was open
+            self.apply(topic, key, "local")
+            if not transport.transactional:
+                transport.send(self.message(topic, key))
+
+        transaction.on_commit(committed)
+
+    def message(self, topic, key=None):
+        with self._lock:
+            self._version += 1
+            version = self._version
+        return {"origin": self.origin, "version": version, "topic": topic, "key": key}
+
+    def heartbeat(self):
+        """
+        The latest version sent, for transports that can lose messages, so
+        other workers notice a loss without waiting for the next message.
+        None until this worker has sent something.
+        """
+        if not self._version:
+            return None
+        return {"origin": self.origin, "version": self._version, "topic": None}
+
+    def receive(self, message):
+        """Apply a message from another worker"""
+        origin = message["origin"]
+        if origin == self.origin:
+            return
+
+        if self.transport.lossy:
+            with self._lock:
+                last = self._seen.get(origin, 0)
+                if message["version"] <= last:
+                    return
+                self._seen[origin] = message["version"]
+            if last and message["version"] > last + 1:
+                self.resync(f"missed messages from {origin}")
+                return
+
+        if message["topic"] is not None:
+            self.apply(message["topic"], message.get("key"), "remote")
+
+    def apply(self, topic, key, source):
+        for handler in self.handlers.get(topic, []):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Cache invalidation handler failed for %s", topic)
+        metrics.CACHE_INVALIDATIONS.labels(topic, source).inc()
+
+    def resync(self, reason):
+        """Drop everything subscribers cache, after possibly missing messages"""
+        logger.warning("Dropping all in-process caches: %s", reason)
+        for topic in self.handlers:
+            self.apply(topic, None, "resync")
+
+    def get_transport(self):
+        """This process's transport (a forked worker builds its own)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.origin = (
+                        f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                    )
+                    self._version = 0
+                    self._seen = {}
+                    name = getattr(settings, "INVALIDATION_TRANSPORT", "local")
+                    self.transport = import_string(TRANSPORTS[name])(self)
+                    self._pid = os.getpid()
+        return self.transport
+
+    def ensure_listening(self, **kwargs):
+        """Start receiving other workers' messages (a request_started receiver)"""
+        self.get_transport().start()
+
+
+bus = InvalidationBus()
+
+subscribe = bus.subscribe
+publish = bus.publish
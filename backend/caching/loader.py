@@ -0,0 +1,211 @@
+"""
+Stampede-protected loading of expensive cached values
+
+SingleFlightCache keeps a computed value in a Django cache for ``ttl``
+seconds and makes sure a miss is computed once, not once per waiting thread:
+
+- concurrent misses in one process wait for a single computation
+  ("coalesced"), and a lease in the cache (``cache.add``) keeps other
+  processes sharing the cache from computing it at the same time
+- a fresh entry is refreshed in the background a little before it expires,
+  with a probability that grows as expiry nears and with how long the value
+  took to compute (probabilistic early expiration, "XFetch")
+- for ``stale_ttl`` seconds after expiry, the stale value is served while one
+  background refresh runs (stale-while-revalidate)
+- invalidate() bumps a generation counter kept in the cache next to the
+  value, so a computation that started before the change, in any process
+  sharing the cache, doesn't store its outdated result
+
+Lookups are counted per cache as hit, miss, coalesced and stale on the
+cache_requests_total metric, and background refreshes on
+cache_refreshes_total.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import connections
+
+from django_project import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    def __init__(
+        self,
+        name,
+        ttl,
+        stale_ttl=0,
+        beta=1.0,
+        lease_timeout=10,
+        cache_alias="default",
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.lease_timeout = lease_timeout
+        self.cache_alias = cache_alias
+        # Lookups by result: hit, miss, coalesced, stale
+        self.counts = Counter()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def cache_key(self, key):
+        return f"single-flight:{self.name}:{key}"
+
+    def get(self, compute, key=""):
+        """The cached value for ``key``, computing it with ``compute()`` on a miss"""
+        if not self.ttl:
+            return compute()
+
+        cache_key = self.cache_key(key)
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            value, fresh_until, duration = entry
+            now = time.time()
+            if now < fresh_until:
+                self.record("hit")
+                # -log(random) is exponentially distributed, so the chance of
+                # refreshing early grows as expiry nears
+                if self.beta and (
+                    now - duration * self.beta * math.log(1 - random.random())
+                    >= fresh_until
+                ):
+                    self.refresh_in_background(cache_key, compute, "early")
+                return value
+            if self.stale_ttl:
+                self.record("stale")
+                self.refresh_in_background(cache_key, compute, "stale")
+                return value
+
+        return self.load(cache_key, compute)
+
+    async def aget(self, compute, key=""):
+        return await sync_to_async(self.get)(compute, key)
+
+    def invalidate(self, key=""):
+        """Drop ``key``; computations already running won't store their result"""
+        cache = self.cache
+        cache_key = self.cache_key(key)
+        generation_key = f"{cache_key}:generation"
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            # No counter yet (lookups read it as 0), or it was evicted
+            if not cache.add(generation_key, 1, None):
+                cache.incr(generation_key)
+        cache.delete(cache_key)
+
+    def load(self, cache_key, compute, background=False):
+        with self._lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = _Flight()
+
+        if not leader:
+            if background:
+                return None
+            self.record("coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        if not background:
+            self.record("miss")
+        try:
+            flight.value = self.compute_and_store(cache_key, compute)
+            return flight.value
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[cache_key]
+            flight.done.set()
+
+    def compute_and_store(self, cache_key, compute):
+        cache = self.cache
+        lease_key = f"{cache_key}:lease"
+        lease = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lease_timeout
+        while not cache.add(lease_key, lease, self.lease_timeout):
+            if time.monotonic() >= deadline:
+                # The holder is taking too long: compute it without the lease
+                lease = None
+                break
+            # Another process is computing it: use its result when it lands,
+            # or take over if it gives up the lease without storing one
+            time.sleep(0.05)
+            entry = cache.get(cache_key)
+            if entry is not None and entry[1] > time.time():
+                return entry[0]
+
+        generation_key = f"{cache_key}:generation"
+        try:
+            generation = cache.get(generation_key, 0)
+            started = time.monotonic()
+            value = compute()
+            duration = time.monotonic() - started
+            if cache.get(generation_key, 0) == generation:
+                cache.set(
+                    cache_key,
+                    (value, time.time() + self.ttl, duration),
+                    self.ttl + self.stale_ttl,
+                )
+            return value
+        finally:
+            # Only give up our own lease: once it expired, another process may
+            # hold the key (the cache has no atomic compare-and-delete, which
+            # leaves a window as short as one round trip)
+            if lease is not None and cache.get(lease_key) == lease:
+                cache.delete(lease_key)
+
+    def refresh_in_background(self, cache_key, compute, trigger):
+        with self._lock:
+            if cache_key in self._flights:
+                return
+        metrics.CACHE_REFRESHES.labels(self.name, trigger).inc()
+        threading.Thread(
+            target=self._refresh,
+            args=(cache_key, compute),
+            name=f"refresh-{self.name}",
+            daemon=True,
+        ).start()
+
+    def _refresh(self, cache_key, compute):
+        try:
+            self.load(cache_key, compute, background=True)
+        except Exception:
+            # The next lookup after expiry computes it again
+            logger.exception("Refreshing the %s cache failed", self.name)
+        finally:
+            # This thread's database connections would otherwise leak
+            connections.close_all()
+
+    def record(self, result):
+        self.counts[result] += 1
+        metrics.record_cache_result(self.name, result)
@@ -0,0 +1,89 @@
+"""
+In-process caches
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django_project.metrics import record_cache_lookup
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after ``ttl`` seconds
+
+    Entries can be set with a ``tag`` (e.g. the user a token belongs to) and
+    dropped together with ``delete_tag``, without scanning the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, name=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._discard(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+
+        if self.name:
+            record_cache_lookup(self.name, entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key, value, tag=None):
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate(self, key=None):
+        """Invalidation bus handler: drop ``key``, or everything when None"""
+        if key is None:
+            self.clear()
+        else:
+            self.delete(key)
+
+    def delete_tag(self, tag):
+        """Drop every entry set with ``tag``"""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def _discard(self, key):
+        """Drop ``key`` and its tag index entry; the caller holds the lock"""
+        entry = self._data.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+        keys = self._tags[entry[2]]
+        keys.discard(key)
+        if not keys:
+            del self._tags[entry[2]]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from caching.standin import RedisStandin, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Redis stand-in holding the shared cache for offline "
+        "development. Start the backend with CACHE_BACKEND=redis "
+        "CACHE_LOCATION=redis://<host>:<port>/0 to use it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=6379)
+        parser.add_argument(
+            "--max-keys",
+            type=int,
+            default=100_000,
+            help="Keys kept per database before the least recently used go",
+        )
+
+    def handle(self, *args, **options):
+        server = make_server(
+            options["host"],
+            options["port"],
+            RedisStandin(max_keys=options["max_keys"]),
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Redis stand-in listening on "
+                f"redis://{options['host']}:{options['port']}/0"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,8 @@
+from django.db import models
+
+
+class CacheVersion(models.Model):
+    """Invalidation counter of a topic, for the "table" invalidation transport"""
+
+    topic = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
@@ -0,0 +1,152 @@
+"""
+Declarative response caching for DRF viewsets
+
+A viewset mixing in CachedViewMixin lists the actions it caches:
+
+    cache_policies = {
+        "retrieve": CachePolicy(
+            ttl=60, vary_headers=["X-Device-ID"], vary_user=True,
+            tags=["order:{pk}"],
+        ),
+    }
+
+Successful GET responses of those actions are cached (through a
+SingleFlightCache, so misses are coalesced) once authentication and
+permission checks have passed. Entries are keyed by the path, the query
+string, the ``vary_headers`` values and, with ``vary_user``, the user.
+
+Tags are formatted with the view's URL kwargs and ``headers`` (the request
+headers, "" when missing), e.g. "device:{headers[X-Device-ID]}". Every
+entry depends on the current version of each of its tags in the default
+cache: invalidate_tags() moves those versions on in every worker through the
+invalidation bus, and model signal handlers call it when rows change. A
+worker that may have missed invalidations moves the version shared by all
+tags on instead.
+"""
+
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from . import invalidation
+from .loader import SingleFlightCache
+
+# Part of every entry's key, moved on to drop them all
+ALL_TAGS = "*"
+
+
+def tag_key(tag):
+    return f"cache-tag:{tag}"
+
+
+def tag_versions(tags):
+    """The current version of each tag, starting the ones never seen"""
+    keys = [tag_key(ALL_TAGS)] + [tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Evicted or new: any version nothing was cached under will do
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_tag(tag):
+    # None after possibly missed invalidations
+    cache.set(tag_key(ALL_TAGS if tag is None else tag), uuid.uuid4().hex, None)
+
+
+def invalidate_tags(*tags):
+    """Drop every cached response tagged with any of ``tags``, in all workers"""
+    for tag in tags:
+        invalidation.publish("cache.tags", tag)
+
+
+invalidation.subscribe("cache.tags", bump_tag)
+
+
+class Headers:
+    """Request headers for tag templates, blank when missing"""
+
+    def __init__(self, request):
+        self.request = request
+
+    def __getitem__(self, name):
+        return self.request.headers.get(name, "")
+
+
+class CachePolicy:
+    def __init__(self, ttl, stale_ttl=0, vary_headers=(), vary_user=False, tags=()):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.vary_headers = vary_headers
+        self.vary_user = vary_user
+        self.tags = tags
+        self.loader = None
+
+    def bind(self, name):
+        """Give the policy its loader, once its view and action are known"""
+        self.loader = SingleFlightCache(
+            f"view:{name}", ttl=self.ttl, stale_ttl=self.stale_ttl
+        )
+
+    def key(self, request, view_kwargs):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        parts = [request.path, query]
+        parts += [request.headers.get(name, "") for name in self.vary_headers]
+        if self.vary_user:
+            parts.append(str(request.user.pk))
+
+        tags = [
+            tag.format(headers=Headers(request), **view_kwargs) for tag in self.tags
+        ]
+        parts += tag_versions(tags)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class CachedViewMixin:
+    """Serve the actions in ``cache_policies`` from the cache"""
+
+    cache_policies = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for action, policy in cls.cache_policies.items():
+            if policy.loader is None:
+                policy.bind(f"{cls.__name__}.{action}")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        policy = self.cache_policies.get(self.action)
+        # Authenticated and permitted by now: swap in the cached handler
+        if policy is not None and request.method == "GET" and policy.loader.ttl:
+            handler = self.get
+
+            def cached(request, *args, **kwargs):
+                return self.cached_response(policy, handler, request, *args, **kwargs)
+
+            self.get = cached
+
+    def cached_response(self, policy, handler, request, *args, **kwargs):
+        produced = []
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            produced.append(response)
+            if response.status_code != 200:
+                raise UncacheableResponse
+            return response.data
+
+        try:
+            data = policy.loader.get(compute, policy.key(request, kwargs))
+        except UncacheableResponse:
+            # Requests that waited on this one compute their own answer
+            return produced[0] if produced else handler(request, *args, **kwargs)
+        return Response(data)
+
+
+class UncacheableResponse(Exception):
+    pass
@@ -0,0 +1,287 @@
+"""
+Local stand-in for the subset of Redis that Django's RedisCache uses
+
+Run it with the redis_standin management command and start the backend with
+CACHE_BACKEND=redis CACHE_LOCATION=redis://<host>:<port>/0 to share one cache
+between workers (and exercise the Redis code path) without a Redis server.
+Keys live in memory and expire lazily, with the least recently used keys
+evicted beyond ``max_keys``. Clients speak RESP2, or RESP3 after HELLO 3.
+"""
+
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+
+class CommandError(Exception):
+    pass
+
+
+class RedisStandin:
+    """In-memory keyspaces behind the stand-in server"""
+
+    def __init__(self, max_keys=100_000, databases=16):
+        self.max_keys = max_keys
+        # key -> (value, expiry as time.monotonic() or None), per database
+        self.databases = [OrderedDict() for _ in range(databases)]
+        self._lock = threading.Lock()
+
+    def lookup(self, db, key):
+        entry = db.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del db[key]
+            return None
+        db.move_to_end(key)
+        return entry
+
+    def store(self, db, key, value, expiry=None):
+        db[key] = (value, expiry)
+        db.move_to_end(key)
+        while len(db) > self.max_keys:
+            db.popitem(last=False)
+
+    def handler(self, name):
+        handler = getattr(self, f"command_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"unknown command '{name}'")
+        return handler
+
+    def execute(self, db_index, name, args):
+        """Run one command against database ``db_index`` and return its reply"""
+        handler = self.handler(name)
+        with self._lock:
+            return handler(self.databases[db_index], *args)
+
+    def execute_many(self, db_index, commands):
+        """Run queued (name, args) commands atomically, as EXEC does"""
+        replies = []
+        with self._lock:
+            for name, args in commands:
+                try:
+                    replies.append(self.handler(name)(self.databases[db_index], *args))
+                except CommandError as exc:
+                    replies.append(exc)
+                except (IndexError, TypeError, ValueError):
+                    replies.append(wrong_arguments(name))
+        return replies
+
+    def command_ping(self, db, message=None):
+        return message if message is not None else Status("PONG")
+
+    def command_get(self, db, key):
+        entry = self.lookup(db, key)
+        return entry[0] if entry else None
+
+    def command_mget(self, db, *keys):
+        return [self.command_get(db, key) for key in keys]
+
+    def command_set(self, db, key, value, *options):
+        expiry = None
+        only_new = only_existing = False
+        options = [option.upper() for option in options]
+        position = 0
+        while position < len(options):
+            option = options[position]
+            if option in (b"EX", b"PX"):
+                amount = int(options[position + 1])
+                seconds = amount if option == b"EX" else amount / 1000
+                expiry = time.monotonic() + seconds
+                position += 2
+                continue
+            if option == b"NX":
+                only_new = True
+            elif option == b"XX":
+                only_existing = True
+            else:
+                raise CommandError("syntax error")
+            position += 1
+
+        exists = self.lookup(db, key) is not None
+        if (only_new and exists) or (only_existing and not exists):
+            return None
+        self.store(db, key, value, expiry)
+        return Status("OK")
+
+    def command_mset(self, db, *pairs):
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self.store(db, key, value)
+        return Status("OK")
+
+    def command_del(self, db, *keys):
+        deleted = 0
+        for key in keys:
+            if self.lookup(db, key) is not None:
+                del db[key]
+                deleted += 1
+        return deleted
+
+    def command_exists(self, db, *keys):
+        return sum(self.lookup(db, key) is not None for key in keys)
+
+    def command_expire(self, db, key, seconds):
+        entry = self.lookup(db, key)
+        if entry is None:
+            return 0
+        self.store(db, key, entry[0], time.monotonic() + int(seconds))
+        return 1
+
+    def command_persist(self, db, key):
+        entry = self.lookup(db, key)
+        if entry is None or entry[1] is None:
+            return 0
+        self.store(db, key, entry[0])
+        return 1
+
+    def command_incrby(self, db, key, amount):
+        entry = self.lookup(db, key)
+        try:
+            value = int(entry[0] if entry else 0) + int(amount)
+        except ValueError:
+            raise CommandError("value is not an integer or out of range")
+        self.store(db, key, str(value).encode(), entry[1] if entry else None)
+        return value
+
+    def command_incr(self, db, key):
+        return self.command_incrby(db, key, 1)
+
+    def command_flushdb(self, db, *options):
+        db.clear()
+        return Status("OK")
+
+    def command_dbsize(self, db):
+        return len(db)
+
+    def command_client(self, db, *args):
+        # CLIENT SETNAME / SETINFO from the client's handshake
+        return Status("OK")
+
+
+def wrong_arguments(name):
+    return CommandError(f"wrong arguments for '{name.lower()}' command")
+
+
+class Status(str):
+    """A simple string reply, such as +OK"""
+
+
+def encode(reply, protocol=2):
+    if isinstance(reply, Status):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, CommandError):
+        return f"-ERR {reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if reply is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    if isinstance(reply, dict):
+        if protocol == 3:
+            head = f"%{len(reply)}\r\n".encode()
+        else:
+            head = f"*{len(reply) * 2}\r\n".encode()
+        return head + b"".join(
+            encode(item, protocol) for pair in reply.items() for item in pair
+        )
+    if isinstance(reply, list):
+        return f"*{len(reply)}\r\n".encode() + b"".join(
+            encode(item, protocol) for item in reply
+        )
+    if isinstance(reply, str):
+        reply = reply.encode()
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+class StandinRequestHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        """The next command as a list of bytes arguments, or None at EOF"""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def hello(self, args):
+        if args:
+            protocol = int(args[0])
+            if protocol not in (2, 3):
+                raise CommandError("NOPROTO unsupported protocol version")
+            self.protocol = protocol
+        return {
+            "server": "redis",
+            "version": "7.0.0",
+            "proto": self.protocol,
+            "id": threading.get_ident(),
+            "mode": "standalone",
+            "role": "master",
+            "modules": [],
+        }
+
+    def handle(self):
+        standin = self.server.standin
+        self.protocol = 2
+        db_index = 0
+        # Commands queued between MULTI and EXEC
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+
+            name = args[0].decode().upper()
+            try:
+                if queued is not None and name not in ("EXEC", "DISCARD", "MULTI"):
+                    standin.handler(name)
+                    queued.append((name, args[1:]))
+                    reply = Status("QUEUED")
+                elif name == "MULTI":
+                    if queued is not None:
+                        raise CommandError("MULTI calls can not be nested")
+                    queued = []
+                    reply = Status("OK")
+                elif name in ("EXEC", "DISCARD"):
+                    if queued is None:
+                        raise CommandError(f"{name} without MULTI")
+                    commands, queued = queued, None
+                    if name == "EXEC":
+                        reply = standin.execute_many(db_index, commands)
+                    else:
+                        reply = Status("OK")
+                elif name == "SELECT":
+                    index = int(args[1])
+                    if not 0 <= index < len(standin.databases):
+                        raise CommandError("DB index is out of range")
+                    db_index = index
+                    reply = Status("OK")
+                elif name == "HELLO":
+                    reply = self.hello(args[1:])
+                elif name == "QUIT":
+                    self.wfile.write(encode(Status("OK")))
+                    return
+                else:
+                    reply = standin.execute(db_index, name, args[1:])
+            except CommandError as exc:
+                reply = exc
+            except (IndexError, TypeError, ValueError):
+                reply = wrong_arguments(name)
+            self.wfile.write(encode(reply, self.protocol))
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def make_server(host="127.0.0.1", port=6379, standin=None):
+    server = StandinServer((host, port), StandinRequestHandler)
+    server.standin = standin or RedisStandin()
+    return server
@@ -0,0 +1,308 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from backoffice.authentication import CachedTokenAuthentication, token_cache
+
+from .invalidation import InvalidationBus
+from .loader import SingleFlightCache
+from .standin import make_server
+from .models import CacheVersion
+
+
+class Recorder:
+    """Subscriber remembering the keys it was handed"""
+
+    def __init__(self):
+        self.keys = []
+        self.received = threading.Event()
+
+    def __call__(self, key):
+        self.keys.append(key)
+        self.received.set()
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting")
+        time.sleep(0.01)
+
+
+class SingleFlightCacheTests(TestCase):
+    def loader(self, **kwargs):
+        loader = SingleFlightCache(self.id(), **{"ttl": 60, "beta": 0, **kwargs})
+        self.addCleanup(loader.invalidate)
+        return loader
+
+    def test_concurrent_misses_compute_once(self):
+        loader = self.loader()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return "menu"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(loader.get(compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: loader.counts["coalesced"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["menu"] * 5)
+        self.assertEqual(loader.get(compute), "menu")
+        self.assertEqual(loader.counts, {"miss": 1, "coalesced": 4, "hit": 1})
+
+    def test_expired_value_served_while_refreshing(self):
+        loader = self.loader(stale_ttl=60)
+        loader.cache.set(loader.cache_key(""), ("old", time.time() - 1, 0), 60)
+
+        self.assertEqual(loader.get(lambda: "new"), "old")
+        self.assertEqual(loader.counts["stale"], 1)
+        wait_for(lambda: loader.cache.get(loader.cache_key(""))[0] == "new")
+        self.assertEqual(loader.get(lambda: "newer"), "new")
+
+    def test_refreshes_early_as_expiry_nears(self):
+        loader = self.loader(beta=1000)
+        loader.cache.set(loader.cache_key(""), ("old", time.time() + 1, 1), 60)
+
+        self.assertEqual(loader.get(lambda: "new"), "old")
+        wait_for(lambda: loader.cache.get(loader.cache_key(""))[0] == "new")
+
+    def test_invalidated_while_computing_isnt_stored(self):
+        loader = self.loader()
+
+        def compute():
+            loader.invalidate()
+            return "before the change"
+
+        self.assertEqual(loader.get(compute), "before the change")
+        self.assertEqual(loader.get(lambda: "after"), "after")
+
+    def test_invalidated_by_another_process_isnt_stored(self):
+        loader = self.loader()
+        # Same cache and name, but none of this process's state
+        other_process = SingleFlightCache(loader.name, ttl=60, beta=0)
+
+        def compute():
+            other_process.invalidate()
+            return "before the change"
+
+        self.assertEqual(loader.get(compute), "before the change")
+        self.assertEqual(loader.get(lambda: "after"), "after")
+
+    def test_another_process_lease_is_left_alone_after_timing_out(self):
+        loader = self.loader(lease_timeout=0.2)
+        lease_key = f"{loader.cache_key('')}:lease"
+        loader.cache.add(lease_key, "other process", 60)
+        self.addCleanup(loader.cache.delete, lease_key)
+
+        self.assertEqual(loader.get(lambda: "menu"), "menu")
+        self.assertEqual(loader.cache.get(lease_key), "other process")
+        self.assertEqual(loader.cache.get(loader.cache_key(""))[0], "menu")
+
+    def test_lease_given_up_without_a_value_is_taken_over(self):
+        loader = self.loader(lease_timeout=5)
+        lease_key = f"{loader.cache_key('')}:lease"
+        loader.cache.add(lease_key, "other process", 60)
+        threading.Timer(0.1, loader.cache.delete, [lease_key]).start()
+
+        started = time.monotonic()
+        self.assertEqual(loader.get(lambda: "menu"), "menu")
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIsNone(loader.cache.get(lease_key))
+
+    def test_errors_reach_every_waiting_caller(self):
+        loader = self.loader()
+        release = threading.Event()
+        errors = []
+
+        def compute():
+            release.wait(2)
+            raise ValueError("database down")
+
+        def get():
+            try:
+                loader.get(compute)
+            except ValueError as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: loader.counts["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(loader.get(lambda: "recovered"), "recovered")
+
+
+class RedisStandinTests(TestCase):
+    """Django's Redis cache backend works against the stand-in"""
+
+    def setUp(self):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            self.skipTest("The Redis cache backend needs redis-py")
+
+        server = make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address
+        self.cache = RedisCache(f"redis://{host}:{port}/1", {})
+
+    def test_cache_operations(self):
+        cache = self.cache
+        cache.set("menu", {"items": [1, 2]})
+        self.assertEqual(cache.get("menu"), {"items": [1, 2]})
+        self.assertFalse(cache.add("menu", "other"))
+        self.assertTrue(cache.add("lease", True, 10))
+
+        cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        self.assertEqual(cache.incr("a", 5), 6)
+        self.assertTrue(cache.has_key("b"))
+        cache.delete_many(["a", "b"])
+        self.assertIsNone(cache.get("a"))
+
+        cache.set("short", 1, 0.01)
+        self.assertTrue(cache.touch("menu", 60))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("short"))
+
+        cache.clear()
+        self.assertIsNone(cache.get("menu"))
+
+
+class InvalidationBusTests(TestCase):
+    def test_publish_applies_locally_and_again_on_commit(self):
+        bus = InvalidationBus()
+        recorder = Recorder()
+        bus.subscribe("menu", recorder)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bus.publish("menu", 7)
+            self.assertEqual(recorder.keys, [7])
+        self.assertEqual(recorder.keys, [7, 7])
+
+    def test_token_changes_drop_cached_credentials(self):
+        user = User.objects.create_user("ana", password="ana")
+        key = Token.objects.get(user=user).key
+        CachedTokenAuthentication().authenticate_credentials(key)
+        self.assertIsNotNone(token_cache.get(key))
+
+        user.is_active = False
+        user.save()
+        self.assertIsNone(token_cache.get(key))
+
+
+class UnixSocketTransportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(
+            INVALIDATION_TRANSPORT="socket",
+            INVALIDATION_SOCKET_DIR=directory,
+            INVALIDATION_RETRY_INTERVAL=0.05,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def bus(self):
+        bus = InvalidationBus()
+        self.addCleanup(lambda: bus.transport and bus.transport.stop())
+        return bus
+
+    def test_other_workers_receive_invalidations(self):
+        publisher, listener = self.bus(), self.bus()
+        recorder = Recorder()
+        listener.subscribe("customer", recorder)
+        listener.ensure_listening()
+        # The listener binds its socket in its own thread
+        for _ in range(100):
+            if listener.transport.path.exists():
+                break
+            threading.Event().wait(0.01)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            publisher.publish("customer", "device-1")
+        self.assertTrue(recorder.received.wait(2))
+        self.assertEqual(recorder.keys, ["device-1"])
+
+    def test_missed_messages_drop_everything(self):
+        bus = self.bus()
+        bus.get_transport()
+        recorder = Recorder()
+        bus.subscribe("menu", recorder)
+
+        message = {"origin": "other", "topic": "menu", "key": 1}
+        bus.receive({**message, "version": 1})
+        bus.receive({**message, "version": 1})  # duplicates are ignored
+        self.assertEqual(recorder.keys, [1])
+
+        with self.assertLogs("caching.invalidation", "WARNING"):
+            bus.receive({**message, "version": 3, "key": 3})
+        self.assertEqual(recorder.keys, [1, None])
+
+        # A heartbeat reveals a lost last message
+        with self.assertLogs("caching.invalidation", "WARNING"):
+            bus.receive({"origin": "other", "topic": None, "version": 5})
+        self.assertEqual(recorder.keys, [1, None, None])
+
+
+@override_settings(INVALIDATION_TRANSPORT="table")
+class VersionTableTransportTests(TestCase):
+    def test_version_bump_drops_the_topic(self):
+        publisher, listener = InvalidationBus(), InvalidationBus()
+        recorder = Recorder()
+        listener.subscribe("menu", recorder)
+        listener.get_transport().poll()
+
+        publisher.publish("menu", 4)
+        publisher.publish("menu", 5)
+        self.assertEqual(CacheVersion.objects.get(topic="menu").version, 2)
+
+        listener.transport.poll()
+        self.assertEqual(recorder.keys, [None])
+        listener.transport.poll()
+        self.assertEqual(recorder.keys, [None])
+
+
+@override_settings(INVALIDATION_TRANSPORT="postgres", INVALIDATION_RETRY_INTERVAL=0.1)
+class PostgresNotifyTransportTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("LISTEN/NOTIFY needs PostgreSQL")
+
+    def test_notifications_reach_listeners_on_commit(self):
+        publisher, listener = InvalidationBus(), InvalidationBus()
+        self.addCleanup(lambda: listener.transport.stop())
+        recorder = Recorder()
+        listener.subscribe("auth.user", recorder)
+        listener.ensure_listening()
+        threading.Event().wait(0.5)  # LISTEN runs in the listener thread
+
+        publisher.publish("auth.user", 42)
+        self.assertTrue(recorder.received.wait(2))
+        self.assertEqual(recorder.keys, [42])
@@ -0,0 +1,233 @@
+"""
+Transports carrying invalidation messages between workers (see
+caching.invalidation)
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    IntegrityError,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.db.models import F
+
+from .models import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    # send() runs inside the writer's transaction instead of after commit
+    transactional = False
+    # Messages can get lost while the receiver is up, so receivers check
+    # each origin's versions for gaps
+    lossy = False
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.retry_interval = getattr(settings, "INVALIDATION_RETRY_INTERVAL", 5)
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start receiving in a daemon thread, once per process"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            threading.Thread(
+                target=self.receive_loop, name="cache-invalidation", daemon=True
+            ).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def send(self, message):
+        raise NotImplementedError
+
+    def receive_loop(self):
+        raise NotImplementedError
+
+
+class LocalTransport(Transport):
+    """Single-process deployments: nothing to send or receive"""
+
+    def start(self):
+        pass
+
+    def send(self, message):
+        pass
+
+
+class PostgresNotifyTransport(Transport):
+    transactional = True
+
+    def __init__(self, bus):
+        super().__init__(bus)
+        self.channel = getattr(settings, "INVALIDATION_CHANNEL", "cache_invalidation")
+
+    def send(self, message):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)", [self.channel, json.dumps(message)]
+            )
+
+    def conninfo(self):
+        from psycopg.conninfo import make_conninfo
+
+        database = settings.DATABASES[DEFAULT_DB_ALIAS]
+        return make_conninfo(
+            dbname=database["NAME"],
+            user=database.get("USER") or None,
+            password=database.get("PASSWORD") or None,
+            host=database.get("HOST") or None,
+            port=database.get("PORT") or None,
+            application_name="cache-invalidation",
+        )
+
+    def receive_loop(self):
+        import psycopg
+        from psycopg import sql
+
+        reconnecting = False
+        while not self._stopped.is_set():
+            try:
+                with psycopg.connect(self.conninfo(), autocommit=True) as conn:
+                    conn.execute(
+                        sql.SQL("LISTEN {}").format(sql.Identifier(self.channel))
+                    )
+                    if reconnecting:
+                        # Whatever was published while disconnected is lost
+                        self.bus.resync("invalidation listener reconnected")
+                    reconnecting = True
+                    self.listen(conn)
+            except Exception:
+                logger.exception("Cache invalidation listener failed")
+                self.bus.resync("invalidation listener disconnected")
+                self._stopped.wait(self.retry_interval)
+
+    def listen(self, conn):
+        while not self._stopped.is_set():
+            for notify in conn.notifies(timeout=self.retry_interval):
+                self.bus.receive(json.loads(notify.payload))
+            # notifies() doesn't notice a dead connection by itself
+            conn.execute("SELECT 1")
+
+
+class UnixSocketTransport(Transport):
+    """
+    Every worker binds a datagram socket in INVALIDATION_SOCKET_DIR and sends
+    each message to all the other sockets there; sockets of workers that are
+    gone are removed on the first failed send
+    """
+
+    lossy = True
+
+    def __init__(self, bus):
+        super().__init__(bus)
+        self.directory = Path(settings.INVALIDATION_SOCKET_DIR)
+        self.path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # A receiver that stopped reading must not block the writer
+        self.sender.settimeout(0.1)
+        self._send_lock = threading.Lock()
+
+    def send(self, message):
+        data = json.dumps(message).encode()
+        with self._send_lock:
+            for path in self.directory.glob("*.sock"):
+                if path == self.path:
+                    continue
+                try:
+                    self.sender.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    # The receiver notices the version gap
+                    logger.warning("Could not send cache invalidation to %s", path)
+
+    def receive_loop(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(str(self.path))
+        receiver.settimeout(self.retry_interval)
+        next_heartbeat = time.monotonic() + self.retry_interval
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self.bus.receive(json.loads(receiver.recv(65536)))
+                except socket.timeout:
+                    pass
+
+                if time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + self.retry_interval
+                    heartbeat = self.bus.heartbeat()
+                    if heartbeat is not None:
+                        self.send(heartbeat)
+        finally:
+            receiver.close()
+            self.path.unlink(missing_ok=True)
+
+
+class VersionTableTransport(Transport):
+    """
+    A CacheVersion row per topic, bumped by every publish and polled by every
+    worker. A topic whose version moved is dropped as a whole.
+    """
+
+    transactional = True
+
+    def __init__(self, bus):
+        super().__init__(bus)
+        self.poll_interval = getattr(settings, "INVALIDATION_POLL_INTERVAL", 2)
+        self.versions = None
+
+    def send(self, message):
+        topic = message["topic"]
+        bumped = CacheVersion.objects.filter(topic=topic).update(
+            version=F("version") + 1
+        )
+        if not bumped:
+            try:
+                with transaction.atomic():
+                    CacheVersion.objects.create(topic=topic, version=1)
+            except IntegrityError:
+                CacheVersion.objects.filter(topic=topic).update(
+                    version=F("version") + 1
+                )
+
+    def poll(self):
+        versions = dict(CacheVersion.objects.values_list("topic", "version"))
+        if self.versions is not None:
+            for topic, version in versions.items():
+                if version != self.versions.get(topic):
+                    self.bus.apply(topic, None, "remote")
+        self.versions = versions
+
+    def receive_loop(self):
+        while not self._stopped.wait(
+            0 if self.versions is None else self.poll_interval
+        ):
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Polling cache versions failed")
+                self.bus.resync("cache version polling failed")
+            finally:
+                # Releases the connection when pooling, reconnects after errors
+                close_old_connections()
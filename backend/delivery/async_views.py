@@ -0,0 +1,128 @@
+from asgiref.sync import sync_to_async
+
+from django_project.async_views import AsyncPage, async_read_view, json_response
+from django_project.instrumentation import span
+
+from . import last_seen
+from .models import Customer, Order
+from .serializers import OrderListSerializer, OrderSerializer, OrderStatusSerializer
+from .views import (
+    OrderPagination,
+    OrderViewSet,
+    order_items_prefetch,
+    order_status_queryset,
+)
+
+ORDER_NOT_FOUND = {"success": False, "detail": "Order not found"}
+
+
+async def get_device_order(request, queryset, pk):
+    """
+    (order, error response) for an anonymous client, which can only see the
+    orders of the device in its X-Device-ID header
+    """
+    try:
+        order = await queryset.aget(pk=pk)
+    except Order.DoesNotExist:
+        return None, json_response(
+            {"detail": "No Order matches the given query."}, status=404
+        )
+
+    device_id = request.headers.get("X-Device-ID")
+    if not device_id or order.customer is None:
+        return None, json_response(ORDER_NOT_FOUND, status=404)
+    if str(order.customer.device_id) != device_id:
+        return None, json_response(ORDER_NOT_FOUND, status=404)
+    return order, None
+
+
+async def order_detail(request, pk):
+    """GET /orders/<id>/: a single order of the requesting device"""
+    queryset = Order.objects.select_related("customer").prefetch_related(
+        order_items_prefetch()
+    )
+    order, error = await get_device_order(request, queryset, pk)
+    if error:
+        return error
+
+    with span("serialize"):
+        data = OrderSerializer(order).data
+    return json_response({"success": True, "order": data})
+
+
+async def order_status(request, pk):
+    """GET /orders/<id>/status/: status polling for an order of the device"""
+    order, error = await get_device_order(request, order_status_queryset(), pk)
+    if error:
+        return error
+
+    return json_response({"success": True, "order": OrderStatusSerializer(order).data})
+
+
+async def my_orders(request):
+    """GET /orders/my-orders/: the requesting device's orders, newest first"""
+    device_id = request.headers.get("X-Device-ID")
+    if not device_id:
+        return json_response(
+            {
+                "success": False,
+                "detail": "Device ID is required. Please include X-Device-ID header.",
+            },
+            status=400,
+        )
+
+    try:
+        customer = await Customer.objects.aget(device_id=device_id)
+    except Customer.DoesNotExist:
+        return json_response(
+            {
+                "success": True,
+                "count": 0,
+                "orders": [],
+                "detail": "No orders found for this device.",
+            }
+        )
+    # touch() may write to the database (on a full buffer or with buffering off)
+    await sync_to_async(last_seen.touch)(customer.pk)
+
+    page = AsyncPage(OrderPagination, request)
+    orders = await page.fetch(
+        Order.objects.filter(customer=customer).order_by("-created_at")
+    )
+    if orders is None:
+        return page.not_found()
+
+    with span("serialize"):
+        data = OrderListSerializer(orders, many=True).data
+    return page.response(data)
+
+
+order_detail_view = async_read_view(
+    order_detail,
+    OrderViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        },
+        basename="order",
+        detail=True,
+    ),
+    "OrderViewSet",
+    "retrieve",
+)
+order_status_view = async_read_view(
+    order_status,
+    OrderViewSet.as_view(
+        {"get": "order_status", "put": "update_status"}, basename="order", detail=True
+    ),
+    "OrderViewSet",
+    "order_status",
+)
+my_orders_view = async_read_view(
+    my_orders,
+    OrderViewSet.as_view({"get": "my_orders"}, basename="order", detail=False),
+    "OrderViewSet",
+    "my_orders",
+)
@@ -0,0 +1,147 @@
+"""
+Write-coalesced tracking of Customer.last_seen
+
+Touch points call ``touch(customer_id)`` instead of saving the Customer row.
+Timestamps are buffered per worker process and written back periodically
+with one bulk UPDATE, so customer activity never costs a row write (and a
+row lock on the customers table) per request.
+"""
+
+import atexit
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+
+class LastSeenBuffer:
+    """
+    In-memory buffer of customer_id -> most recent activity timestamp
+    """
+
+    def __init__(self, flush_interval=None, max_pending=None):
+        # None follows CUSTOMER_LAST_SEEN_FLUSH_INTERVAL, read on every touch
+        self.flush_interval = flush_interval
+        self.max_pending = (
+            max_pending
+            if max_pending is not None
+            else getattr(settings, "CUSTOMER_LAST_SEEN_MAX_PENDING", 5000)
+        )
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+        self._stopped = threading.Event()
+
+    def interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, "CUSTOMER_LAST_SEEN_FLUSH_INTERVAL", 30)
+
+    def touch(self, customer_id, when=None):
+        """Record activity for a customer; the write happens on the next flush"""
+        if customer_id is None:
+            return
+
+        when = when or timezone.now()
+
+        # A zero interval disables buffering (useful for tests and debugging)
+        if not self.interval():
+            self._write({customer_id: when})
+            return
+
+        with self._lock:
+            current = self._pending.get(customer_id)
+            if current is None or when > current:
+                self._pending[customer_id] = when
+            pending = len(self._pending)
+
+        self._ensure_flusher()
+
+        # Don't let a burst of activity grow the buffer without bound
+        if pending >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered timestamp with a single UPDATE statement"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if pending:
+            try:
+                self._write(pending)
+            except Exception:
+                # Put the timestamps back so the next flush retries them
+                with self._lock:
+                    for customer_id, when in pending.items():
+                        current = self._pending.get(customer_id)
+                        if current is None or when > current:
+                            self._pending[customer_id] = when
+                raise
+
+        return len(pending)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _write(self, pending):
+        from .models import Customer
+
+        whens = [
+            When(pk=customer_id, then=Value(when))
+            for customer_id, when in pending.items()
+        ]
+        Customer.objects.filter(pk__in=pending.keys()).update(
+            last_seen=Case(*whens, output_field=DateTimeField())
+        )
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        pid = os.getpid()
+        if self._flusher_pid == pid and self._flusher.is_alive():
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid and self._flusher.is_alive():
+                return
+
+            self._flusher = threading.Thread(
+                target=self._run, name="last-seen-flusher", daemon=True
+            )
+            self._flusher_pid = pid
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval()):
+            try:
+                self.flush()
+            except Exception:
+                # Keep the flusher alive; the next flush retries with new data
+                pass
+            finally:
+                # The flusher owns its own connection, don't leave it open
+                connections.close_all()
+
+    def shutdown(self):
+        """Stop the periodic flusher and write whatever is still buffered"""
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+buffer = LastSeenBuffer()
+atexit.register(buffer.shutdown)
+
+
+def touch(customer_id, when=None):
+    buffer.touch(customer_id, when)
+
+
+def flush():
+    return buffer.flush()
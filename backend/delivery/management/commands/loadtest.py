@@ -0,0 +1,128 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_project import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running server with concurrent virtual users (menu browsing, "
+        "order creation, status polling, manager search) and report latency "
+        "percentiles and throughput per endpoint. Results can be saved as a "
+        "baseline and compared against later runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Server to test (default: %(default)s)",
+        )
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Measured seconds"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=float,
+            default=5,
+            help="Seconds of unmeasured load before measuring",
+        )
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{k}={v}" for k, v in loadtest.DEFAULT_MIX.items()),
+            help="Scenario weights (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--token", help="Staff API token; the search scenario is skipped without it"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the virtual users' choices"
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0,
+            help="Mean seconds each user pauses between scenarios (0: closed loop)",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--save", help="Write the results as JSON to this path")
+        parser.add_argument("--compare", help="Baseline JSON to compare against")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when any endpoint's p95 is this fraction above the baseline",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        baseline = loadtest.load(options["compare"]) if options["compare"] else None
+
+        harness = loadtest.LoadTest(
+            options["base_url"],
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            warmup=options["warmup"],
+            mix=mix,
+            token=options["token"],
+            seed=options["seed"],
+            think_time=options["think_time"],
+            timeout=options["timeout"],
+        )
+        self.stdout.write(
+            f"{harness.concurrency} users against {harness.base_url} for "
+            f"{harness.warmup:g}s warmup + {harness.duration:g}s, mix {harness.mix}"
+        )
+        try:
+            results = harness.run()
+        except Exception as e:
+            raise CommandError(f"Load test failed: {e}")
+
+        self.print_results(results)
+        if options["save"]:
+            loadtest.save(results, options["save"])
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if baseline is not None:
+            self.print_comparison(results, baseline, options["max_regression"])
+
+    def print_results(self, results):
+        header = (
+            f"{'endpoint':<26}{'reqs':>8}{'errors':>8}{'rps':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        self.stdout.write(header)
+        for endpoint, summary in results["endpoints"].items():
+            self.stdout.write(
+                f"{endpoint:<26}{summary['requests']:>8}{summary['errors']:>8}"
+                f"{summary['throughput_rps']:>9}{summary['p50_ms']:>9}"
+                f"{summary['p95_ms']:>9}{summary['p99_ms']:>9}"
+            )
+        total = results["total"]
+        self.stdout.write(
+            f"{'total':<26}{total['requests']:>8}{total['errors']:>8}"
+            f"{total['throughput_rps']:>9}"
+        )
+
+    def print_comparison(self, results, baseline, max_regression):
+        self.stdout.write(
+            f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} "
+            f"({baseline['meta'].get('started_at')}):"
+        )
+        regressions = []
+        for endpoint, changes in loadtest.compare(results, baseline).items():
+            cells = [
+                f"{metric}: " + ("n/a" if change is None else f"{change:+.1%}")
+                for metric, change in changes.items()
+            ]
+            self.stdout.write(f"{endpoint:<26}" + "  ".join(cells))
+
+            p95 = changes["p95_ms"]
+            if max_regression is not None and p95 is not None and p95 > max_regression:
+                regressions.append(f"{endpoint} p95 {p95:+.1%}")
+
+        if regressions:
+            raise CommandError("Latency regressions: " + ", ".join(regressions))
@@ -0,0 +1,128 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from delivery import seeding
+from delivery.models import Order
+
+
+def parse_status_mix(value):
+    statuses = {status for status, _ in Order.STATUS_CHOICES}
+    mix = {}
+    for entry in value.split(","):
+        status, _, weight = entry.partition("=")
+        status = status.strip()
+        if status not in statuses:
+            raise ValueError(f"unknown status {status!r}")
+        mix[status] = float(weight)
+        if mix[status] < 0:
+            raise ValueError(f"negative weight for {status!r}")
+    if not sum(mix.values()):
+        raise ValueError("the weights add up to 0")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic menu items, customers, orders and order items for "
+        "scaling tests. Uses COPY on PostgreSQL and bulk_create elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=100_000)
+        parser.add_argument(
+            "--customers", type=int, help="Customers to create (default: orders / 4)"
+        )
+        parser.add_argument(
+            "--menu-items",
+            type=int,
+            default=40,
+            help="Make sure the menu has at least this many items",
+        )
+        parser.add_argument("--sizes-per-item", type=int, default=3)
+        parser.add_argument(
+            "--days", type=int, default=365, help="Spread orders over the last N days"
+        )
+        parser.add_argument(
+            "--growth",
+            type=float,
+            default=2.0,
+            help="Daily volume on the newest day relative to the oldest",
+        )
+        parser.add_argument(
+            "--status-mix",
+            default=",".join(f"{k}={v}" for k, v in seeding.DEFAULT_STATUS_MIX.items()),
+            help="Relative status weights (default: %(default)s)",
+        )
+        parser.add_argument("--basket-mean", type=float, default=2.5)
+        parser.add_argument("--basket-max", type=int, default=6)
+        parser.add_argument(
+            "--batch-size", type=int, default=10_000, help="Orders per chunk"
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes generating chunks (PostgreSQL recommended)",
+        )
+        parser.add_argument(
+            "--method", choices=["auto", "bulk", "copy"], default="auto"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        orders = options["orders"]
+        customers = options["customers"] or max(orders // 4, 1)
+        if orders < 0 or customers < 1:
+            raise CommandError("--orders must be >= 0 and --customers >= 1.")
+
+        try:
+            status_mix = parse_status_mix(options["status_mix"])
+        except ValueError as e:
+            raise CommandError(
+                f"--status-mix must look like delivered=85,pending=8 ({e})"
+            )
+        if options["processes"] > 1 and connection.vendor == "sqlite":
+            self.stderr.write(
+                "SQLite serializes writers; extra processes will mostly wait."
+            )
+
+        started = time.perf_counter()
+        menu_items = seeding.seed_menu(
+            options["menu_items"], options["sizes_per_item"], options["seed"]
+        )
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"\r{done}/{total} orders ({done / elapsed:,.0f}/s)", ending=""
+            )
+            self.stdout.flush()
+
+        try:
+            customers, orders, items = seeding.seed_orders(
+                orders,
+                customers,
+                days=options["days"],
+                growth=options["growth"],
+                status_mix=status_mix,
+                basket_mean=options["basket_mean"],
+                basket_max=options["basket_max"],
+                batch_size=options["batch_size"],
+                processes=options["processes"],
+                method=options["method"],
+                seed=options["seed"],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {menu_items} menu items, {customers} customers, "
+                f"{orders} orders and {items} order items in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0004_alter_order_order_special_instructions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0005_customer_last_seen_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Assigned'), ('picked', 'Picked'), ('delivered', 'Delivered')], default='pending', max_length=20),
+        ),
+    ]
@@ -1,13 +1,19 @@
+import logging
 import uuid
 from datetime import datetime
 
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 from menu.models import MenuItem, Size
 
+from . import last_seen
+
+logger = logging.getLogger(__name__)
+
 
 class Customer(models.Model):
     """
@@ -21,7 +27,8 @@ class Customer(models.Model):
         help_text="Unique identifier for anonymous users",
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    last_seen = models.DateTimeField(auto_now=True)
+    # Updated through delivery.last_seen, which coalesces writes per worker
+    last_seen = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"Customer {self.device_id}"
@@ -84,7 +91,8 @@ class Order(models.Model):
     )
 
     # Order Status & Tracking
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    # Wide enough for the payment states set by the webhook worker ("payment_failed")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     scheduled_time = models.DateTimeField(null=True, blank=True)
     total_amount = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[MinValueValidator(0)]
@@ -107,31 +115,41 @@ class Order(models.Model):
                 - size_id: ID of the Size
                 - quantity: Quantity of the item
         """
+        # Resolve every referenced menu item and size in two queries
+        menu_items = MenuItem.objects.in_bulk(
+            {int(item_data["menu_item_id"]) for item_data in menu_items_data}
+        )
+        sizes = Size.objects.in_bulk(
+            {int(item_data["size_id"]) for item_data in menu_items_data}
+        )
+
         order_items = []
         for item_data in menu_items_data:
-            try:
-                menu_item = MenuItem.objects.get(id=item_data["menu_item_id"])
-                size = Size.objects.get(id=item_data["size_id"])
-
-                # Calculate price based on menu item and size
-                price = size.price
+            menu_item = menu_items.get(int(item_data["menu_item_id"]))
+            size = sizes.get(int(item_data["size_id"]))
+            if menu_item is None or size is None:
+                logger.error(
+                    "Skipped order item: menu item %s or size %s not found",
+                    item_data["menu_item_id"],
+                    item_data["size_id"],
+                    extra={"order": self.order_number},
+                )
+                continue
 
-                order_item = OrderItem.objects.create(
+            order_items.append(
+                OrderItem(
                     order=self,
                     menu_item=menu_item,
                     size=size,
                     quantity=item_data["quantity"],
-                    price=price,
+                    # Calculate price based on menu item and size
+                    price=size.price,
                     item_name=menu_item.name,
                     size_name=size.name,
                 )
-                order_items.append(order_item)
-            except (MenuItem.DoesNotExist, Size.DoesNotExist) as e:
-                # Handle missing items - you might want to log this or raise an exception
-                print(f"Error creating order item: {e}")
-                continue
+            )
 
-        return order_items
+        return OrderItem.objects.bulk_create(order_items)
 
     def calculate_total_amount(self):
         """Calculate total amount from all order items"""
@@ -149,25 +167,28 @@ class Order(models.Model):
         """
         # Find or create customer
         customer = None
-        print("device_id on create_order_with_customer: ", device_id)
+        logger.debug("Creating order for device %s", device_id)
         if device_id:
             try:
                 customer = Customer.objects.get(device_id=device_id)
+                last_seen.touch(customer.pk)
             except Customer.DoesNotExist:
                 customer = None
 
-        if not customer:
-            customer = Customer.objects.create()
+        # One write transaction: all or nothing, and a single commit
+        with transaction.atomic():
+            if not customer:
+                customer = Customer.objects.create()
 
-        # Create the order
-        order = cls.objects.create(customer=customer, **order_data)
+            # Create the order
+            order = cls.objects.create(customer=customer, **order_data)
 
-        # Create order items
-        order.create_order_items(menu_items_data)
+            # Create order items
+            order_items = order.create_order_items(menu_items_data)
 
-        # Recalculate and update total amount
-        order.total_amount = order.calculate_total_amount()
-        order.save()
+            # Recalculate and update total amount
+            order.total_amount = sum(item.subtotal for item in order_items)
+            order.save(update_fields=["total_amount", "last_updated"])
 
         return order, customer.device_id
 
@@ -221,11 +242,3 @@ def generate_order_number(sender, instance, **kwargs):
         date_part = datetime.now().strftime("%Y%m%d")
         unique_part = str(uuid.uuid4())[:8].upper()
         instance.order_number = f"ORD-{date_part}-{unique_part}"
-
-
-@receiver(pre_save, sender=Customer)
-def update_last_seen(sender, instance, **kwargs):
-    """
-    Update last_seen timestamp when customer places an order
-    """
-    instance.last_seen = datetime.now()
@@ -0,0 +1,387 @@
+"""
+High-volume synthetic data for scaling tests (see ``manage.py seed_data``)
+
+Orders and customers get explicit primary keys allocated up front, so chunks
+of orders are independent: each is generated from its own seed, can run in
+a separate process, and OrderItems reference their orders without waiting
+for ids to come back from the database. Rows are written with bulk_create
+or, on PostgreSQL, with COPY. auto_now/auto_now_add are switched off while
+seeding so created_at follows the requested date distribution.
+"""
+
+import io
+import multiprocessing
+import random
+import uuid
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from menu.models import MenuItem, Size
+
+from .models import Customer, Order, OrderItem
+
+FIRST_NAMES = [
+    "Ana", "Luis", "María", "José", "Sofía", "Carlos", "Lucía", "Miguel",
+    "Valentina", "Diego", "Camila", "Javier", "Isabella", "Mateo", "Daniela",
+    "Andrés", "Fernanda", "Ricardo", "Paula", "Emilio",
+]  # fmt: skip
+LAST_NAMES = [
+    "García", "Martínez", "López", "Hernández", "González", "Pérez",
+    "Rodríguez", "Sánchez", "Ramírez", "Flores", "Torres", "Rivera", "Gómez",
+    "Díaz", "Morales", "Vargas",
+]  # fmt: skip
+STREETS = [
+    "Av. Reforma", "Calle Madero", "Av. Juárez", "Calle 5 de Mayo",
+    "Av. Insurgentes", "Calle Hidalgo", "Av. Universidad", "Calle Morelos",
+]  # fmt: skip
+MENU_CATEGORIES = {
+    "food": ["Pizzas", "Burgers", "Tacos", "Salads", "Pasta", "Desserts"],
+    "drink": ["Sodas", "Juices", "Coffee", "Beer"],
+}
+SIZE_NAMES = ["Small", "Medium", "Large", "Family"]
+
+# Relative order volume per hour of day: lunch and dinner peaks
+HOUR_WEIGHTS = [
+    1, 0.5, 0.3, 0.2, 0.2, 0.3, 1, 2, 3, 3, 4, 6,
+    10, 12, 10, 6, 5, 6, 9, 12, 11, 8, 5, 2,
+]  # fmt: skip
+
+DEFAULT_STATUS_MIX = {"delivered": 85, "picked": 3, "assigned": 4, "pending": 8}
+
+ORDER_COLUMNS = [
+    "id", "order_number", "customer_name", "customer_phone", "customer_email",
+    "customer_id", "address_line_1", "address_line_2", "no_interior",
+    "no_exterior", "address_special_instructions", "order_special_instructions",
+    "card_number", "card_holder", "expiry_date", "cvv", "transaction_id",
+    "status", "scheduled_time", "total_amount", "created_at", "last_updated",
+]  # fmt: skip
+ORDER_ITEM_COLUMNS = [
+    "order_id", "menu_item_id", "size_id", "quantity", "price", "item_name",
+    "size_name",
+]  # fmt: skip
+CUSTOMER_COLUMNS = ["id", "device_id", "created_at", "last_seen"]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the timestamps we set on auto_now(_add) fields"""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def use_copy(method):
+    if method == "auto":
+        return connection.vendor == "postgresql"
+    if method == "copy" and connection.vendor != "postgresql":
+        raise ValueError("COPY is only available on PostgreSQL")
+    return method == "copy"
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def copy_rows(model, columns, rows):
+    """Stream rows into ``model``'s table with PostgreSQL COPY"""
+    quote = connection.ops.quote_name
+    column_names = [model._meta.get_field(name).column for name in columns]
+    sql = (
+        f"COPY {quote(model._meta.db_table)} "
+        f"({', '.join(quote(column) for column in column_names)}) FROM STDIN"
+    )
+
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, "copy_expert"):
+            # psycopg2
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join(_copy_value(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            raw.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with raw.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+
+def insert_rows(model, columns, rows, copy, batch_size):
+    if copy:
+        copy_rows(model, columns, rows)
+    else:
+        with explicit_timestamps(model):
+            model.objects.bulk_create(
+                (model(**dict(zip(columns, row))) for row in rows),
+                batch_size=batch_size,
+            )
+
+
+def seed_menu(item_count, sizes_per_item=3, seed=0):
+    """Menu items with sizes, unless enough of them already exist"""
+    rng = random.Random(seed)
+    existing = MenuItem.objects.count()
+    if existing >= item_count:
+        return 0
+
+    items = []
+    for i in range(existing, item_count):
+        item_type = "food" if rng.random() < 0.75 else "drink"
+        category = rng.choice(MENU_CATEGORIES[item_type])
+        items.append(
+            MenuItem(
+                name=f"{category} #{i + 1}",
+                category=category,
+                type=item_type,
+                imgAlt=f"{category} #{i + 1}",
+                imgSrc=f"https://example.com/menu/{i + 1}.jpg",
+            )
+        )
+    items = MenuItem.objects.bulk_create(items)
+
+    Size.objects.bulk_create(
+        Size(
+            menu_item=item,
+            order=position + 1,
+            name=SIZE_NAMES[position % len(SIZE_NAMES)],
+            price=Decimal(rng.randrange(500, 1500)) / 100 + position * 3,
+            description=f"{SIZE_NAMES[position % len(SIZE_NAMES)]} {item.name}",
+        )
+        for item in items
+        for position in range(sizes_per_item)
+    )
+    return len(items)
+
+
+def menu_snapshot():
+    """[(menu item id, name, [(size id, size name, price), ...]), ...]"""
+    sizes = {}
+    for size in Size.objects.order_by("menu_item_id", "order"):
+        sizes.setdefault(size.menu_item_id, []).append((size.pk, size.name, size.price))
+    return [
+        (pk, name, sizes[pk])
+        for pk, name in MenuItem.objects.order_by("pk").values_list("pk", "name")
+        if pk in sizes
+    ]
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+def seed_customers(count, first_id, start, seed, copy, batch_size):
+    # Seeding again appends new customers: their device ids must differ too
+    rng = random.Random(seed * 1_000_003 + first_id)
+    window = (timezone.now() - start).total_seconds()
+    rows = []
+    for pk in range(first_id, first_id + count):
+        created_at = start + timedelta(seconds=rng.random() * window)
+        rows.append(
+            (
+                pk,
+                uuid.UUID(int=rng.getrandbits(128), version=4),
+                created_at,
+                created_at + timedelta(seconds=rng.random() * window / 4),
+            )
+        )
+        if len(rows) >= batch_size:
+            insert_rows(Customer, CUSTOMER_COLUMNS, rows, copy, batch_size)
+            rows = []
+    if rows:
+        insert_rows(Customer, CUSTOMER_COLUMNS, rows, copy, batch_size)
+
+
+def _order_rows(rng, config, first_id, count):
+    """Order and OrderItem rows for ``count`` orders starting at ``first_id``"""
+    menu = config["menu"]
+    statuses, status_weights = zip(*config["status_mix"].items())
+    status_cum = list(accumulate(status_weights))
+    day_cum = config["day_cum_weights"]
+    hour_cum = list(accumulate(HOUR_WEIGHTS))
+    customers = config["customer_ids"]
+    start_day = config["start_day"]
+    basket_mean = config["basket_mean"]
+    basket_max = min(config["basket_max"], len(menu))
+
+    orders, items = [], []
+    for pk in range(first_id, first_id + count):
+        day = bisect(day_cum, rng.random() * day_cum[-1])
+        hour = bisect(hour_cum, rng.random() * hour_cum[-1])
+        created_at = start_day + timedelta(
+            days=day, hours=hour, seconds=rng.randrange(3600)
+        )
+        status = statuses[bisect(status_cum, rng.random() * status_cum[-1])]
+
+        # Regular customers order far more often than occasional ones
+        customer_id = customers[0] + int(
+            (customers[1] - customers[0]) * rng.random() ** 3
+        )
+
+        # Basket sizes are geometric around the mean, 1..basket_max
+        basket_size = 1
+        while basket_size < basket_max and rng.random() > 1 / basket_mean:
+            basket_size += 1
+
+        total = Decimal(0)
+        for menu_item_id, item_name, sizes in rng.sample(menu, basket_size):
+            size_id, size_name, price = rng.choice(sizes)
+            quantity = 1 if rng.random() < 0.7 else rng.randint(2, 4)
+            total += price * quantity
+            items.append(
+                (pk, menu_item_id, size_id, quantity, price, item_name, size_name)
+            )
+
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        orders.append(
+            (
+                pk,
+                f"SEED-{created_at:%Y%m%d}-{pk:08X}",
+                name,
+                f"55{rng.randrange(10**8):08d}",
+                f"{name.split()[0].lower()}{pk}@example.com",
+                customer_id,
+                f"{rng.choice(STREETS)} {rng.randint(1, 999)}",
+                None,
+                str(rng.randint(1, 20)) if rng.random() < 0.3 else None,
+                str(rng.randint(1, 999)),
+                None,
+                "No onions" if rng.random() < 0.05 else None,
+                f"{rng.randrange(10**4):04d}",
+                name,
+                f"{rng.randint(1, 12):02d}/{rng.randint(2026, 2031)}",
+                "000",
+                f"txn_{rng.getrandbits(64):016x}",
+                status,
+                None,
+                total,
+                created_at,
+                created_at + timedelta(minutes=rng.randint(0, 90)),
+            )
+        )
+    return orders, items
+
+
+def seed_order_chunk(args):
+    """Generate and insert one chunk of orders; runs in worker processes"""
+    chunk, first_id, count, config = args
+    rng = random.Random(config["seed"] * 1_000_003 + chunk)
+    orders, items = _order_rows(rng, config, first_id, count)
+
+    with transaction.atomic():
+        insert_rows(Order, ORDER_COLUMNS, orders, config["copy"], config["batch_size"])
+        insert_rows(
+            OrderItem, ORDER_ITEM_COLUMNS, items, config["copy"], config["batch_size"]
+        )
+
+    return len(orders), len(items)
+
+
+def day_weights(days, growth):
+    """
+    Cumulative weights over ``days``, rising linearly so the newest day sees
+    ``growth`` times the orders of the oldest
+    """
+    return list(
+        accumulate(1 + (growth - 1) * day / max(days - 1, 1) for day in range(days))
+    )
+
+
+def seed_orders(
+    orders,
+    customers,
+    days=365,
+    growth=2.0,
+    status_mix=None,
+    basket_mean=2.5,
+    basket_max=6,
+    batch_size=10000,
+    processes=1,
+    method="auto",
+    seed=0,
+    progress=None,
+):
+    """
+    Insert ``customers`` customers and ``orders`` orders (with their items)
+    spread over the last ``days`` days. Returns (customers, orders, items).
+    """
+    copy = use_copy(method)
+    menu = menu_snapshot()
+    if not menu:
+        raise ValueError("The menu has no items with sizes; seed the menu first")
+
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_day = today - timedelta(days=days - 1)
+
+    first_customer = next_id(Customer)
+    with transaction.atomic():
+        seed_customers(customers, first_customer, start_day, seed, copy, batch_size)
+
+    first_order = next_id(Order)
+    config = {
+        "seed": seed,
+        "copy": copy,
+        "batch_size": batch_size,
+        "menu": menu,
+        "status_mix": status_mix or DEFAULT_STATUS_MIX,
+        "day_cum_weights": day_weights(days, growth),
+        "start_day": start_day,
+        "customer_ids": (first_customer, first_customer + customers - 1),
+        "basket_mean": basket_mean,
+        "basket_max": basket_max,
+    }
+    chunks = [
+        (chunk, first_order + offset, min(batch_size, orders - offset), config)
+        for chunk, offset in enumerate(range(0, orders, batch_size))
+    ]
+
+    created_orders = created_items = 0
+    if processes > 1:
+        # Forked workers must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes) as pool:
+            results = pool.imap_unordered(seed_order_chunk, chunks)
+            for chunk_orders, chunk_items in results:
+                created_orders += chunk_orders
+                created_items += chunk_items
+                if progress:
+                    progress(created_orders, orders)
+    else:
+        for chunk in chunks:
+            chunk_orders, chunk_items = seed_order_chunk(chunk)
+            created_orders += chunk_orders
+            created_items += chunk_items
+            if progress:
+                progress(created_orders, orders)
+
+    # Explicit ids leave PostgreSQL sequences behind
+    sequence_sql = connection.ops.sequence_reset_sql(no_style(), [Customer, Order])
+    if sequence_sql:
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+
+    return customers, created_orders, created_items
@@ -33,6 +33,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["price", "item_name", "size_name", "subtotal"]
 
 
+class OrderItemEntrySerializer(serializers.Serializer):
+    """One entry of an order's menu_items, checked before the payment is taken"""
+
+    menu_item_id = serializers.IntegerField(min_value=1)
+    size_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
 class OrderSerializer(serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True, read_only=True)
 
@@ -41,8 +49,8 @@ class OrderSerializer(serializers.ModelSerializer):
     address_info = serializers.DictField(write_only=True)
     order_instructions = serializers.DictField(write_only=True)
     payment_info = serializers.DictField(write_only=True)
-    menu_items = serializers.ListField(
-        child=serializers.DictField(),
+    menu_items = OrderItemEntrySerializer(
+        many=True,
         write_only=True,
         required=True,
         help_text="List of order items with menu_item_id, size_id, and quantity",
@@ -242,3 +250,14 @@ class OrderListSerializer(serializers.ModelSerializer):
             "customer_name",
         ]
         read_only_fields = fields
+
+
+class OrderStatusSerializer(serializers.ModelSerializer):
+    """Just enough of an order for status polling"""
+
+    status_display = serializers.CharField(source="get_status_display", read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "order_number", "status", "status_display", "last_updated"]
+        read_only_fields = fields
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from caching.policies import invalidate_tags
+
+from .models import Order, OrderItem
+
+
+def invalidate_cached_orders(*order_ids):
+    """Drop the cached responses of these orders (see OrderViewSet)"""
+    invalidate_tags(*(f"order:{order_id}" for order_id in order_ids))
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_cached_order(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_cached_orders(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def invalidate_cached_order_item(sender, instance, **kwargs):
+    invalidate_cached_orders(instance.order_id)
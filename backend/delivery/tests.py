@@ -1,3 +1,698 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+)
+from rest_framework.response import Response
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from backoffice.models import Employee
+from django_project.db_routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from django_project.log import JsonFormatter, QueuedStreamHandler, RequestIdFilter
+from django_project.sqlite.base import WriteQueue
+from django_project.testing import QueryBudgetMixin
+from menu.models import MenuItem
+from menu.tests import create_menu_items
+
+from . import async_views, last_seen
+from .models import Customer, Order, OrderItem
+from .signals import invalidate_cached_orders
+from .views import OrderViewSet, summary_cache
+
+
+def create_orders(count, customer, menu_items):
+    """Orders holding one to three items, as the checkout creates them"""
+    orders = Order.objects.bulk_create(
+        Order(
+            order_number=f"ORD-TEST-{uuid.uuid4().hex[:12].upper()}",
+            customer=customer,
+            customer_name=f"Customer {i}",
+            customer_phone=f"55501{i:05d}",
+            customer_email=f"customer{i}@example.com",
+            address_line_1=f"{i} Main Street",
+            no_exterior=str(i),
+            card_number="4242",
+            card_holder=f"Customer {i}",
+            expiry_date="12/2030",
+            cvv="123",
+            total_amount=Decimal("0"),
+        )
+        for i in range(count)
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            menu_item=menu_item,
+            size=menu_item.sizes.all()[0],
+            quantity=2,
+            price=Decimal("7.50"),
+            item_name=menu_item.name,
+            size_name="Small",
+        )
+        for i, order in enumerate(orders)
+        for menu_item in menu_items[: i % 3 + 1]
+    )
+    return orders
+
+
+def checkout(menu_items, quantity=1):
+    """The body the checkout posts to create an order of ``menu_items``"""
+    return {
+        "customer_info": {"name": "Ana", "phone": "5550001111"},
+        "address_info": {"address_line_1": "1 Main", "no_exterior": "1"},
+        "order_instructions": {},
+        "payment_info": {
+            "card_number": "4242424242424242",
+            "card_holder": "Ana",
+            "expiry_date": "12/2030",
+            "cvv": "123",
+        },
+        "menu_items": [
+            {
+                "menu_item_id": item.pk,
+                "size_id": item.sizes.all()[0].pk,
+                "quantity": quantity,
+            }
+            for item in menu_items
+        ],
+    }
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.menu_items = list(
+            MenuItem.objects.filter(
+                pk__in=[item.pk for item in create_menu_items(3)]
+            ).prefetch_related("sizes")
+        )
+        self.customer = Customer.objects.create()
+        self.device = {"HTTP_X_DEVICE_ID": str(self.customer.device_id)}
+
+        self.manager = User.objects.create_user("manager", password="manager")
+        Employee.objects.create(
+            user=self.manager, role="manager", phone_number="5550000001"
+        )
+        # Searching is limited to staff
+        self.admin = User.objects.create_superuser("admin", password="admin")
+
+        # Write last_seen through so its query is counted on every request
+        patcher = mock.patch.object(last_seen.buffer, "flush_interval", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Measure the views rather than cache hits
+        for policy in OrderViewSet.cache_policies.values():
+            patcher = mock.patch.object(policy.loader, "ttl", 0)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def seed(self, count):
+        create_orders(count, self.customer, self.menu_items)
+
+    def test_list(self):
+        self.authenticate(self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.get("/orders/"), queries=4, max_bytes=55_000
+        )
+
+    def test_list_compressed(self):
+        self.seed(30)
+        self.authenticate(self.manager)
+        plain = self.client.get("/orders/")
+        response = self.client.get("/orders/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_list_filtered(self):
+        self.authenticate(self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.get("/orders/", {"status": "pending"}),
+            queries=4,
+            max_bytes=55_000,
+        )
+
+    def test_search(self):
+        self.authenticate(self.admin)
+        self.assertWithinBudget(
+            lambda: self.client.get("/orders/search/", {"q": "Customer"}),
+            queries=4,
+            max_bytes=55_000,
+        )
+
+    def test_my_orders(self):
+        self.assertWithinBudget(
+            lambda: self.client.get("/orders/my-orders/", **self.device),
+            queries=4,
+            max_bytes=6_000,
+        )
+
+    def test_retrieve(self):
+        self.seed(1)
+        order = Order.objects.first()
+        self.assertWithinBudget(
+            lambda: self.client.get(f"/orders/{order.pk}/", **self.device),
+            queries=3,
+            max_bytes=2_000,
+        )
+
+    def test_order_status(self):
+        self.seed(1)
+        order = Order.objects.first()
+        self.assertWithinBudget(
+            lambda: self.client.get(f"/orders/{order.pk}/status/", **self.device),
+            queries=1,
+            max_bytes=300,
+        )
+
+    def test_update_status(self):
+        self.seed(1)
+        order = Order.objects.first()
+        self.authenticate(self.manager)
+        self.assertWithinBudget(
+            lambda: self.client.put(
+                f"/orders/{order.pk}/status/", {"status": "assigned"}, format="json"
+            ),
+            queries=4,
+            max_bytes=2_000,
+        )
+
+    @mock.patch("random.random", return_value=0.5)  # no simulated declines
+    def test_create(self, _random):
+        def create():
+            return self.client.post(
+                "/orders/",
+                checkout(self.menu_items),
+                format="json",
+                **self.device,
+            )
+
+        # Including the savepoint around the order's writes
+        self.assertWithinBudget(create, queries=11, max_bytes=4_000, status=201)
+
+
+class OrderCreationTests(APITestCase):
+    def setUp(self):
+        self.menu_items = create_menu_items(2)
+
+    @mock.patch("random.random", return_value=0.5)  # no simulated declines
+    def test_quantities_sent_as_strings(self, _random):
+        response = self.client.post(
+            "/orders/", checkout(self.menu_items, quantity="2"), format="json"
+        )
+
+        self.assertEqual(response.status_code, 201, response.content[:500])
+        order = Order.objects.get()
+        self.assertEqual(
+            order.total_amount,
+            sum(item.sizes.all()[0].price * 2 for item in self.menu_items),
+        )
+        self.assertEqual([item.quantity for item in order.order_items.all()], [2, 2])
+
+    def test_invalid_items_are_rejected_before_payment(self):
+        entry = checkout(self.menu_items[:1])["menu_items"][0]
+        invalid = [
+            {**entry, "quantity": 0},
+            {**entry, "quantity": "two"},
+            {**entry, "menu_item_id": "first"},
+            {"size_id": entry["size_id"], "quantity": 1},
+        ]
+        with mock.patch.object(OrderViewSet, "_process_payment") as process_payment:
+            for item in invalid:
+                with self.subTest(item=item):
+                    response = self.client.post(
+                        "/orders/",
+                        {**checkout([]), "menu_items": [item]},
+                        format="json",
+                    )
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("menu_items", response.json())
+
+        process_payment.assert_not_called()
+        self.assertFalse(Order.objects.exists())
+
+
+class AsyncReadViewTests(APITestCase):
+    """The async views answer exactly like the DRF routes they stand in for"""
+
+    def setUp(self):
+        # Cached responses of earlier tests may share primary keys
+        cache.clear()
+        self.menu_items = list(
+            MenuItem.objects.filter(
+                pk__in=[item.pk for item in create_menu_items(3)]
+            ).prefetch_related("sizes")
+        )
+        self.customer = Customer.objects.create()
+        self.orders = create_orders(30, self.customer, self.menu_items)
+        self.order = self.orders[0]
+        self.device_id = str(self.customer.device_id)
+
+    def assertSameResponse(self, view, path, headers=None, query=None, **kwargs):
+        expected = self.client.get(
+            path,
+            query,
+            **{
+                f"HTTP_{name.upper().replace('-', '_')}": value
+                for name, value in (headers or {}).items()
+            },
+        )
+        request = AsyncRequestFactory().get(path, query, headers=headers)
+        response = async_to_sync(view)(request, **kwargs)
+        if hasattr(response, "render"):
+            # Handed on to DRF; the request handler would render it
+            response.render()
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return json.loads(response.content)
+
+    def test_order_detail(self):
+        path = f"/orders/{self.order.pk}/"
+        view = async_views.order_detail_view
+        data = self.assertSameResponse(
+            view, path, {"X-Device-ID": self.device_id}, pk=self.order.pk
+        )
+        self.assertEqual(data["order"]["id"], self.order.pk)
+
+        self.assertSameResponse(
+            view, path, {"X-Device-ID": str(uuid.uuid4())}, pk=self.order.pk
+        )
+        self.assertSameResponse(view, path, pk=self.order.pk)
+        self.assertSameResponse(
+            view, "/orders/0/", {"X-Device-ID": self.device_id}, pk=0
+        )
+
+    def test_order_status(self):
+        path = f"/orders/{self.order.pk}/status/"
+        view = async_views.order_status_view
+        data = self.assertSameResponse(
+            view, path, {"X-Device-ID": self.device_id}, pk=self.order.pk
+        )
+        self.assertEqual(data["order"]["status"], "pending")
+        self.assertSameResponse(view, path, pk=self.order.pk)
+
+    def test_my_orders(self):
+        path = "/orders/my-orders/"
+        view = async_views.my_orders_view
+        device = {"X-Device-ID": self.device_id}
+        data = self.assertSameResponse(view, path, device)
+        self.assertEqual(data["count"], 30)
+
+        for query in ({"page": 2}, {"page": "last"}, {"page_size": 7}, {"page": 9}):
+            self.assertSameResponse(view, path, device, query)
+        self.assertSameResponse(view, path)
+        self.assertSameResponse(view, path, {"X-Device-ID": str(uuid.uuid4())})
+
+    def test_authenticated_requests_use_drf(self):
+        admin = User.objects.create_superuser("admin", password="admin")
+        token = admin.auth_token.key
+        data = self.assertSameResponse(
+            async_views.order_detail_view,
+            f"/orders/{self.order.pk}/",
+            {"Authorization": f"Token {token}"},
+            pk=self.order.pk,
+        )
+        # Staff see every order, which the anonymous path never allows
+        self.assertTrue(data["success"])
+
+
+class OrderCachePolicyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Off by default without a shared cache
+        for policy in OrderViewSet.cache_policies.values():
+            patcher = mock.patch.object(policy.loader, "ttl", 60)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        customer = Customer.objects.create()
+        self.order = create_orders(1, customer, create_menu_items(1))[0]
+        self.path = f"/orders/{self.order.pk}/status/"
+        self.device = {"HTTP_X_DEVICE_ID": str(customer.device_id)}
+
+    def status(self, **headers):
+        response = self.client.get(self.path, **headers)
+        return response.status_code, response.json().get("order", {}).get("status")
+
+    def test_cached_until_the_order_changes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.status(**self.device), (200, "pending"))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.status(**self.device), (200, "pending"))
+
+        self.order.status = "assigned"
+        self.order.save()
+        self.assertEqual(self.status(**self.device), (200, "assigned"))
+
+    def test_bulk_updates_invalidate_explicitly(self):
+        self.status(**self.device)
+        Order.objects.filter(pk=self.order.pk).update(status="picked")
+        self.assertEqual(self.status(**self.device), (200, "pending"))
+
+        invalidate_cached_orders(self.order.pk)
+        self.assertEqual(self.status(**self.device), (200, "picked"))
+
+    def test_varies_by_device(self):
+        self.assertEqual(self.status(**self.device)[0], 200)
+        self.assertEqual(self.status(HTTP_X_DEVICE_ID=str(uuid.uuid4()))[0], 404)
+        self.assertEqual(self.status()[0], 404)
+
+
+class OrderSummaryTests(APITestCase):
+    def setUp(self):
+        summary_cache.invalidate()
+        self.addCleanup(summary_cache.invalidate)
+        menu_items = create_menu_items(1)
+        self.orders = create_orders(3, Customer.objects.create(), menu_items)
+        Order.objects.filter(pk=self.orders[0].pk).update(
+            status="delivered", total_amount=Decimal("12.50")
+        )
+        Order.objects.filter(pk=self.orders[1].pk).update(total_amount=Decimal("3"))
+
+        manager = User.objects.create_user("manager", password="manager")
+        Employee.objects.create(user=manager, role="manager", phone_number="5550000001")
+        self.client.force_authenticate(manager)
+
+    def test_summary(self):
+        summary = self.client.get("/orders/summary/").json()["summary"]
+        self.assertEqual(
+            summary["by_status"],
+            {"pending": 2, "assigned": 0, "picked": 0, "delivered": 1},
+        )
+        self.assertEqual(summary["today"]["orders"], 3)
+        self.assertEqual(summary["today"]["revenue"], "15.50")
+        self.assertEqual(len(summary["last_7_days"]), 7)
+        self.assertEqual(summary["last_7_days"][0]["revenue"], "0.00")
+
+    def test_cached_between_requests(self):
+        first = self.client.get("/orders/summary/").json()["summary"]
+        Order.objects.filter(pk=self.orders[2].pk).update(status="picked")
+        second = self.client.get("/orders/summary/").json()["summary"]
+        self.assertEqual(second, first)
+
+    def test_managers_only(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/orders/summary/").status_code, 401)
+
+
+class OrderLoggingTests(APITestCase):
+    def test_records_carry_the_request_id(self):
+        stream = io.StringIO()
+        handler = QueuedStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RequestIdFilter())
+        logger = logging.getLogger("django_project.instrumentation")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.INFO)
+
+        with self.settings(REQUEST_METRICS_SAMPLE_RATE=1.0):
+            response = self.client.get(
+                "/orders/my-orders/", HTTP_X_REQUEST_ID="checkout-42"
+            )
+        handler.close()  # waits for the listener to write everything
+
+        self.assertEqual(response["X-Request-ID"], "checkout-42")
+        timing = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual(timing["message"], "request timing")
+        self.assertEqual(timing["request_id"], "checkout-42")
+        self.assertEqual(timing["action"], "my_orders")
+
+    def test_invalid_request_ids_are_replaced(self):
+        response = self.client.get("/orders/my-orders/", HTTP_X_REQUEST_ID="a b\n")
+        self.assertRegex(response["X-Request-ID"], "^[0-9a-f]{32}$")
+
+    def test_missing_items_are_rate_limited(self):
+        (rate_limit,) = logging.getLogger("delivery.models").filters
+        self.addCleanup(rate_limit.windows.clear)
+        rate_limit.windows.clear()
+        order = create_orders(1, Customer.objects.create(), [])[0]
+
+        with self.assertLogs("delivery.models", "ERROR") as logs:
+            order.create_order_items(
+                [{"menu_item_id": 0, "size_id": 0, "quantity": 1}] * 25
+            )
+        self.assertEqual(len(logs.records), rate_limit.rate)
+        self.assertEqual(rate_limit.windows[next(iter(rate_limit.windows))][2], 15)
+
+
+class WriteQueueTests(unittest.TestCase):
+    def test_granted_in_order(self):
+        queue = WriteQueue()
+        queue.acquire()
+        granted = []
+
+        def write(n):
+            queue.acquire()
+            granted.append(n)
+            queue.release()
+
+        threads = []
+        for n in range(5):
+            threads.append(threading.Thread(target=write, args=(n,)))
+            threads[-1].start()
+            # Let each one take its ticket before the next
+            while queue._next_ticket < n + 2:
+                pass
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(granted, list(range(5)))
+
+    def test_timed_out_writers_are_skipped(self):
+        queue = WriteQueue()
+        queue.acquire()
+        self.assertTrue(queue.acquire())  # re-entrant
+        timed_out = []
+        thread = threading.Thread(
+            target=lambda: timed_out.append(not queue.acquire(timeout=0.01))
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(timed_out, [True])
+
+        queue.release()
+        queue.release()
+        self.assertTrue(queue.acquire(timeout=0.01))
+
+
+class LastSeenBufferTests(APITestCase):
+    def setUp(self):
+        self.buffer = last_seen.LastSeenBuffer(flush_interval=60, max_pending=10)
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(self.buffer, "_ensure_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ana, self.ben = Customer.objects.bulk_create([Customer(), Customer()])
+        self.start = self.ana.last_seen
+
+    def last_seen(self, customer):
+        return Customer.objects.get(pk=customer.pk).last_seen
+
+    def test_touches_are_coalesced_into_one_update(self):
+        later = self.start + timedelta(minutes=5)
+        latest = self.start + timedelta(minutes=9)
+        with self.assertNumQueries(0):
+            self.buffer.touch(self.ana.pk, later)
+            self.buffer.touch(self.ana.pk, latest)
+            self.buffer.touch(self.ana.pk, later)  # arrived out of order
+            self.buffer.touch(self.ben.pk, later)
+        self.assertEqual(self.buffer.pending_count(), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.last_seen(self.ana), latest)
+        self.assertEqual(self.last_seen(self.ben), later)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_keeps_the_timestamps(self):
+        later = self.start + timedelta(minutes=5)
+        self.buffer.touch(self.ana.pk, later)
+        with mock.patch.object(self.buffer, "_write", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.assertEqual(self.last_seen(self.ana), self.start)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.last_seen(self.ana), later)
+
+    def test_full_buffer_is_flushed(self):
+        self.buffer.max_pending = 2
+        self.buffer.touch(self.ana.pk)
+        self.assertEqual(self.buffer.pending_count(), 1)
+        self.buffer.touch(self.ben.pk)
+        self.assertEqual(self.buffer.pending_count(), 0)
+        self.assertGreater(self.last_seen(self.ben), self.start)
+
+    def test_written_through_under_tests(self):
+        last_seen.touch(self.ana.pk)
+        self.assertEqual(last_seen.buffer.pending_count(), 0)
+        self.assertGreater(self.last_seen(self.ana), self.start)
+
+    def test_my_orders_records_activity(self):
+        with mock.patch.object(last_seen, "buffer", self.buffer):
+            response = self.client.get(
+                "/orders/my-orders/", HTTP_X_DEVICE_ID=str(self.ana.device_id)
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.last_seen(self.ana), self.start)
+
+        self.buffer.flush()
+        self.assertGreater(self.last_seen(self.ana), self.start)
+
+
+@unittest.skipUnless(
+    connection.settings_dict["OPTIONS"].get("write_queue"), "SQLite write queue off"
+)
+class ConcurrentOrderTests(APITransactionTestCase):
+    def test_burst_of_orders(self):
+        menu_items = create_menu_items(3)
+        items = [
+            {"menu_item_id": item.pk, "size_id": item.sizes.all()[0].pk, "quantity": 1}
+            for item in menu_items
+        ]
+        errors = []
+
+        def place_orders():
+            try:
+                for _ in range(5):
+                    Order.create_order_with_customer(
+                        {"customer_name": "Ana", "total_amount": 0}, items
+                    )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place_orders) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(OrderItem.objects.count(), 120)
+
+
+class SeedDataTests(APITestCase):
+    def seed(self, *args):
+        call_command(
+            "seed_data",
+            "--orders",
+            "20",
+            "--menu-items",
+            "3",
+            *args,
+            stdout=io.StringIO(),
+        )
+
+    def test_seeding_again_appends(self):
+        self.seed()
+        self.seed()
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Customer.objects.count(), 10)
+        self.assertEqual(Customer.objects.values("device_id").distinct().count(), 10)
+
+    def test_unknown_status_rejected(self):
+        with self.assertRaisesMessage(CommandError, "unknown status 'lost'"):
+            self.seed("--status-mix", "delivered=80,lost=20")
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], DATABASE_REPLICA_STICKINESS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # Pins need a cache every worker sees
+        shared_cache = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                }
+            }
+        )
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        self.factory = RequestFactory()
+        self.device_id = str(uuid.uuid4())
+
+    def serve(self, request, status=200, data=None):
+        """The database that ``request``'s reads went to, and the response"""
+        routed = []
+
+        def view(request):
+            routed.append(PrimaryReplicaRouter().db_for_read(Order))
+            return Response(data, status=status)
+
+        # Each request is served by a fresh middleware, as by another worker
+        response = ReplicaRoutingMiddleware(view)(request)
+        return routed[0], response
+
+    def get(self, device_id=None):
+        headers = {"X-Device-ID": device_id} if device_id else {}
+        return self.serve(self.factory.get("/orders/my-orders/", headers=headers))[0]
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.get(self.device_id), "replica1")
+
+    def test_writer_is_pinned_to_the_primary(self):
+        database, _ = self.serve(
+            self.factory.post("/orders/", headers={"X-Device-ID": self.device_id}),
+            status=201,
+        )
+        self.assertEqual(database, "default")
+
+        self.assertEqual(self.get(self.device_id), "default")
+        self.assertEqual(self.get(str(uuid.uuid4())), "replica1")
+        self.assertEqual(self.get(), "replica1")
+
+    def test_new_customer_is_pinned_by_the_device_id_it_was_given(self):
+        self.serve(
+            self.factory.post("/orders/"),
+            status=201,
+            data={"device_id": self.device_id},
+        )
+        self.assertEqual(self.get(self.device_id), "default")
+
+    def test_failed_writes_dont_pin(self):
+        self.serve(
+            self.factory.post("/orders/", headers={"X-Device-ID": self.device_id}),
+            status=400,
+        )
+        self.assertEqual(self.get(self.device_id), "replica1")
+
+    def test_refuses_a_per_process_cache(self):
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                }
+            }
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(lambda request: None)
+            with self.settings(DATABASE_REPLICA_STICKINESS=0):
+                ReplicaRoutingMiddleware(lambda request: None)
@@ -1,5 +1,13 @@
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, Prefetch, Sum, prefetch_related_objects
+from django.db.models.functions import TruncDate
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
@@ -7,9 +15,87 @@ from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
 from backoffice.permissions import CanUpdateOrderStatus, IsManager
+from caching.loader import SingleFlightCache
+from caching.policies import CachedViewMixin, CachePolicy
+from django_project import metrics
+from django_project.instrumentation import InstrumentedViewMixin, span
+
+from . import last_seen
+from .models import Customer, Order, OrderItem
+from .serializers import OrderListSerializer, OrderSerializer, OrderStatusSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def order_items_prefetch():
+    """
+    Everything OrderSerializer renders per item, in two queries per page of
+    orders however many items and sizes they hold
+    """
+    return Prefetch(
+        "order_items",
+        queryset=OrderItem.objects.select_related("menu_item", "size").prefetch_related(
+            "menu_item__sizes"
+        ),
+    )
+
+
+def order_status_queryset():
+    """Orders with only the columns the status check reads"""
+    return Order.objects.select_related("customer").only(
+        "order_number", "status", "last_updated", "customer__device_id"
+    )
+
+
+SUMMARY_DAYS = 7
+
+# The dashboard summary is only refreshed by its TTL: new orders would
+# otherwise drop it on every checkout
+summary_cache = SingleFlightCache(
+    "order_summary",
+    ttl=settings.ORDER_SUMMARY_CACHE_TTL,
+    stale_ttl=settings.ORDER_SUMMARY_STALE_TTL,
+)
+
+
+def order_summary():
+    """Order counts by status, and orders and revenue over the last days"""
+    now = timezone.now()
+    today = timezone.localdate(now)
+    first_day = today - timedelta(days=SUMMARY_DAYS - 1)
+    # Without the default ordering, which would split the groups
+    orders = Order.objects.order_by()
+
+    by_status = dict.fromkeys(dict(Order.STATUS_CHOICES), 0)
+    by_status.update(orders.values_list("status").annotate(Count("pk")))
+
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    daily = {
+        row["day"]: row
+        for row in orders.filter(created_at__gte=start)
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(orders=Count("pk"), revenue=Sum("total_amount"))
+    }
+    days = []
+    for offset in range(SUMMARY_DAYS):
+        day = first_day + timedelta(days=offset)
+        row = daily.get(day, {})
+        revenue = row.get("revenue") or Decimal(0)
+        days.append(
+            {
+                "date": day.isoformat(),
+                "orders": row.get("orders", 0),
+                "revenue": str(revenue.quantize(Decimal("0.01"))),
+            }
+        )
 
-from .models import Customer, Order
-from .serializers import OrderListSerializer, OrderSerializer
+    return {
+        "generated_at": now,
+        "by_status": by_status,
+        "today": days[-1],
+        "last_7_days": days,
+    }
 
 
 class OrderPagination(PageNumberPagination):
@@ -18,17 +104,34 @@ class OrderPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+def order_cache_policy():
+    """Orders as their device or a staff member sees them, until they change"""
+    return CachePolicy(
+        ttl=settings.ORDER_CACHE_TTL,
+        vary_headers=["X-Device-ID"],
+        vary_user=True,
+        tags=["order:{pk}"],
+    )
+
+
+class OrderViewSet(CachedViewMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     pagination_class = OrderPagination
 
+    cache_policies = {
+        "retrieve": order_cache_policy(),
+        "order_status": order_cache_policy(),
+    }
+
     permission_classes_by_action = {
         "create": [AllowAny],
         "list": [IsManager],
         "retrieve": [AllowAny],
         "update_status": [CanUpdateOrderStatus],
+        "order_status": [AllowAny],
         "my_orders": [AllowAny],
+        "summary": [IsManager],
         "default": [IsAdminUser],
     }
 
@@ -48,7 +151,15 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         Override to filter orders by device_id for non-admin users
         """
-        queryset = super().get_queryset()
+        if self.action == "order_status":
+            return order_status_queryset()
+
+        queryset = (
+            super()
+            .get_queryset()
+            .select_related("customer")
+            .prefetch_related(order_items_prefetch())
+        )
 
         # For non-admin users, filter by device_id if provided
         # if not self.request.user.is_staff or not IsManager():
@@ -77,6 +188,9 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         # Process payment before creating the order
         payment_result = self._process_payment(payment_info)
+        metrics.record_payment(
+            "checkout", "success" if payment_result.get("success") else "failure"
+        )
 
         if not payment_result.get("success"):
             return Response(
@@ -94,7 +208,7 @@ class OrderViewSet(viewsets.ModelViewSet):
 
             # Include device_id in the data for the serializer
             order_data = serializer.validated_data
-            print("Device Id provided on header: ", device_id)
+            logger.debug("Order placed with device id %s", device_id)
             if device_id:
                 order_data["device_id"] = device_id
 
@@ -103,6 +217,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                 transaction_id=payment_result.get("transaction_id"),
                 status="pending",  # Set initial status as pending
             )
+            metrics.ORDERS_CREATED.labels(order.status).inc()
+            prefetch_related_objects([order], order_items_prefetch())
 
             # Get the serialized data for response
             response_data = serializer.data
@@ -126,6 +242,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         except Exception as e:
+            logger.exception("Order creation failed")
             return Response(
                 {"success": False, "detail": f"Order creation failed: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -219,6 +336,11 @@ class OrderViewSet(viewsets.ModelViewSet):
             {"success": True, "count": queryset.count(), "orders": serializer.data}
         )
 
+    # GET /delivery/orders/summary/: dashboard counts, cached for a few seconds
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        return Response({"success": True, "summary": summary_cache.get(order_summary)})
+
     # GET /delivery/orders/my-orders/: Get orders for current device_id
     @action(detail=False, methods=["get"], url_path="my-orders")
     def my_orders(self, request):
@@ -238,6 +360,7 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         try:
             customer = Customer.objects.get(device_id=device_id)
+            last_seen.touch(customer.pk)
             orders = Order.objects.filter(customer=customer).order_by("-created_at")
 
             # Use simplified serializer for listing
@@ -247,7 +370,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             page = self.paginate_queryset(orders)
             if page is not None:
                 serializer = OrderListSerializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
+                with span("serialize"):
+                    data = serializer.data
+                return self.get_paginated_response(data)
                 # return self.get_paginated_response(
                 #     {
                 #         "success": True,
@@ -355,6 +480,19 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+    # GET /delivery/orders/[id]/status: lightweight status polling
+    @update_status.mapping.get
+    def order_status(self, request, pk=None):
+        order = self.get_object()
+        if not self._can_view_order(request, order):
+            return Response(
+                {"success": False, "detail": "Order not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = OrderStatusSerializer(order)
+        return Response({"success": True, "order": serializer.data})
+
     # DELETE /delivery/orders/[id]: Delete a single order
     def destroy(self, request, pk=None):
         try:
@@ -452,12 +590,16 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        queryset = Order.objects.filter(
-            models.Q(customer_name__icontains=search_query)
-            | models.Q(customer_phone__icontains=search_query)
-            | models.Q(customer_email__icontains=search_query)
-            | models.Q(order_number__icontains=search_query)
-        ).order_by("-created_at")
+        queryset = (
+            self.get_queryset()
+            .filter(
+                models.Q(customer_name__icontains=search_query)
+                | models.Q(customer_phone__icontains=search_query)
+                | models.Q(customer_email__icontains=search_query)
+                | models.Q(order_number__icontains=search_query)
+            )
+            .order_by("-created_at")
+        )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Run it with an ASGI server, e.g.
+
+    gunicorn django_project.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
@@ -12,5 +16,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+# Serve the read-heavy endpoints with the async views (see settings)
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+# Tells settings not to keep connections open across requests (see settings)
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
@@ -0,0 +1,100 @@
+"""
+Native async views for read-heavy endpoints (see ASYNC_READ_VIEWS)
+
+Under ASGI, the anonymous polling traffic (menu list, order detail, my-orders,
+the order status check) is served by async views that query through Django's
+async ORM, so a worker awaits the database instead of tying up a thread per
+open request. Anything else sent to the same URLs (writes, and requests
+carrying credentials, which DRF has to authenticate) is handed to the regular
+DRF view, so both paths answer with the same permissions and payloads.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .instrumentation import current_metrics
+
+renderer = JSONRenderer()
+
+
+def json_response(data, status=200):
+    """The response DRF would render for ``data`` with the JSON renderer"""
+    return HttpResponse(
+        renderer.render(data), status=status, content_type=renderer.media_type
+    )
+
+
+def has_credentials(request):
+    return (
+        "Authorization" in request.headers
+        or settings.SESSION_COOKIE_NAME in request.COOKIES
+    )
+
+
+def async_read_view(handler, fallback, view, action):
+    """
+    Async view serving anonymous GET requests with ``handler`` and everything
+    else with the DRF view ``fallback``. ``view`` and ``action`` label the
+    handler's requests in the request metrics, like InstrumentedViewMixin does
+    for DRF viewsets.
+    """
+    fallback = sync_to_async(fallback)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method != "GET" or has_credentials(request):
+            return await fallback(request, *args, **kwargs)
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view = view
+            metrics.action = action
+        return await handler(request, *args, **kwargs)
+
+    # DRF enforces CSRF itself for session-authenticated requests
+    async_view.csrf_exempt = True
+    async_view.__name__ = handler.__name__
+    return async_view
+
+
+class AsyncPage:
+    """
+    One page of a queryset with the query parameters, links and response shape
+    of a DRF PageNumberPagination class, fetched through the async ORM
+    """
+
+    def __init__(self, pagination_class, request):
+        self.paginator = pagination_class()
+        self.request = Request(request)
+        self.error = None
+
+    async def fetch(self, queryset):
+        """The rows on the requested page, or None when the page doesn't exist"""
+        paginator = self.paginator
+        page_size = paginator.get_page_size(self.request)
+        count = await queryset.acount()
+
+        # Page arithmetic runs over the row count, so only the page is fetched
+        django_paginator = paginator.django_paginator_class(range(count), page_size)
+        page_number = paginator.get_page_number(self.request, django_paginator)
+        try:
+            paginator.page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            self.error = paginator.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            return None
+        paginator.request = self.request
+
+        bottom = (paginator.page.number - 1) * page_size
+        top = bottom + len(paginator.page)
+        return [row async for row in queryset[bottom:top]]
+
+    def response(self, data):
+        return json_response(self.paginator.get_paginated_response(data).data)
+
+    def not_found(self):
+        return json_response({"detail": self.error}, status=404)
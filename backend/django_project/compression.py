@@ -0,0 +1,156 @@
+"""
+Negotiated response compression
+
+CompressionMiddleware compresses bodies of at least COMPRESSION_MIN_SIZE bytes
+with the best coding the client accepts: brotli (when the Brotli package is
+installed), then gzip. Responses built by precompressed_response() carry
+their compressed variants already, made once when their body was cached, so
+serving them costs no compression at all.
+"""
+
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .instrumentation import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference, best first, when the client weighs codings equally
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/|application/(json|javascript|xml|.*\+json|.*\+xml))"
+)
+
+
+def compress(content, coding, level=None):
+    """``content`` compressed with ``coding`` ("br" or "gzip")"""
+    if coding == "br":
+        if level is None:
+            level = getattr(settings, "COMPRESSION_BROTLI_QUALITY", 4)
+        return brotli.compress(content, quality=level)
+    if level is None:
+        level = getattr(settings, "COMPRESSION_GZIP_LEVEL", 6)
+    # mtime=0 keeps the output identical for identical content
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def negotiate(accept_encoding, available=CODINGS):
+    """
+    The coding of ``available`` the Accept-Encoding header prefers, or None
+    for the body as is
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.strip().lower().split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class PrecompressedBody:
+    """
+    A response body with its compressed variants, built once and cached in
+    place of the data it renders
+    """
+
+    # Worth spending the most CPU on: it is done once per cache fill
+    LEVELS = {"br": 11, "gzip": 9}
+
+    def __init__(self, content, content_type="application/json"):
+        self.content = content
+        self.content_type = content_type
+        self.variants = {}
+        if len(content) >= getattr(settings, "COMPRESSION_MIN_SIZE", 1024):
+            self.variants = {
+                coding: compress(content, coding, self.LEVELS[coding])
+                for coding in CODINGS
+            }
+
+
+def precompressed_response(body, status=200):
+    """A response sending ``body`` (a PrecompressedBody) in the negotiated coding"""
+    response = HttpResponse(body.content, status=status, content_type=body.content_type)
+    response.precompressed = body.variants
+    return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "COMPRESSION_ENABLED", True)
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not self.enabled or not self.compressible(response):
+            return response
+
+        # Whatever the outcome, the body depends on Accept-Encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate(request.headers.get("Accept-Encoding", ""))
+        if coding is None:
+            return response
+
+        precompressed = getattr(response, "precompressed", None)
+        if precompressed is not None:
+            content = precompressed.get(coding)
+            if content is None:
+                return response
+        else:
+            with span("compress"):
+                content = compress(response.content, coding)
+            if len(content) >= len(response.content):
+                return response
+
+        response.content = content
+        response["Content-Encoding"] = coding
+        response["Content-Length"] = str(len(content))
+        # The compressed body is no longer byte-for-byte the tagged one
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def compressible(self, response):
+        return (
+            not response.streaming
+            and response.status_code == 200
+            and not response.has_header("Content-Encoding")
+            and len(response.content) >= self.min_size
+            and COMPRESSIBLE_TYPES.match(response.get("Content-Type", "")) is not None
+        )
@@ -0,0 +1,166 @@
+"""
+Read replica routing
+
+Reads go to a replica only inside a ``replica_reads()`` block, which
+ReplicaRoutingMiddleware opens around safe (GET/HEAD/OPTIONS) requests, so
+read-only DRF actions such as order list, search and my-orders are served by
+the replicas while everything else (writes, reads during writes, management
+commands) stays on the primary. Reads inside a transaction also stay on the
+primary.
+
+After a client writes, its identity (X-Device-ID, the device id handed to a
+new customer, its Authorization header or session) is pinned to the primary
+for DATABASE_REPLICA_STICKINESS seconds so it reads its own writes despite
+replication lag. Pins live in the default cache, which must be shared by the
+workers (CACHE_BACKEND "file" on a single host, "redis" across hosts): a pin
+set by one worker in its own locmem cache would not keep the client's next
+request, served by another worker, off the replicas. With replicas and
+stickiness configured, the middleware refuses to start on such a cache.
+"""
+
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_PREFIX = "replica-pin:"
+
+# Caches that no other worker process sees
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route reads inside the block to a replica (when one is configured)"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def client_identities(request):
+    """Cache keys identifying the client behind ``request``"""
+    identities = []
+    device_id = request.headers.get("X-Device-ID")
+    if device_id:
+        identities.append(f"device:{device_id}")
+    for credential in (
+        request.headers.get("Authorization"),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+    ):
+        if credential:
+            digest = hashlib.sha256(credential.encode()).hexdigest()[:32]
+            identities.append(f"credential:{digest}")
+    return identities
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.stickiness = getattr(settings, "DATABASE_REPLICA_STICKINESS", 5)
+        if (
+            replica_aliases()
+            and self.stickiness
+            and isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_CACHES)
+        ):
+            raise ImproperlyConfigured(
+                "Read replicas pin clients that just wrote to the primary in the "
+                "default cache, which must be shared by the workers: set "
+                "CACHE_BACKEND to file or redis, or DATABASE_REPLICA_STICKINESS "
+                "to 0."
+            )
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not replica_aliases():
+            return self.get_response(request)
+
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if response.status_code < 400:
+                pins = self.pins(request, response)
+                if pins:
+                    cache.set_many(pins, self.stickiness)
+            return response
+
+        identities = client_identities(request)
+        pinned = identities and cache.get_many(
+            [PIN_PREFIX + identity for identity in identities]
+        )
+        with replica_reads(not pinned):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            if response.status_code < 400:
+                pins = self.pins(request, response)
+                if pins:
+                    await cache.aset_many(pins, self.stickiness)
+            return response
+
+        identities = client_identities(request)
+        pinned = identities and await cache.aget_many(
+            [PIN_PREFIX + identity for identity in identities]
+        )
+        with replica_reads(not pinned):
+            return await self.get_response(request)
+
+    def pins(self, request, response):
+        """Cache entries keeping the client on the primary while replicas catch up"""
+        identities = client_identities(request)
+
+        # A new customer learns its device id from the order response
+        data = getattr(response, "data", None)
+        if isinstance(data, dict) and data.get("device_id"):
+            identities.append(f"device:{data['device_id']}")
+
+        if not self.stickiness:
+            return {}
+        return {PIN_PREFIX + identity: True for identity in identities}
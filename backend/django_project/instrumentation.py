@@ -0,0 +1,265 @@
+"""
+Per-request performance instrumentation
+
+RequestTimingMiddleware samples requests and measures, for each sampled one:
+
+- total: wall time spent in the view stack
+- db: query count and time spent executing SQL, on every configured database
+- serialize: time spent in the top-level serializer's to_representation, for
+  viewsets using InstrumentedViewMixin (minus the queries it triggers)
+- payment: time spent in Stripe API calls
+- compress: time spent compressing the response
+- app: everything else
+
+The numbers are logged as a structured record on the
+"django_project.instrumentation" logger, tagged with the DRF view and action.
+As they reveal how the backend spends its time, they are sent back in a
+Server-Timing header only to staff and to requests carrying a valid X-Profile
+token, unless REQUEST_METRICS_SERVER_TIMING sends them to everyone.
+Independently of sampling, every request's latency and query count feed the
+Prometheus histograms in django_project.metrics.
+"""
+
+import contextvars
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics as prometheus
+from .profiling import HEADER as PROFILE_HEADER
+from .profiling import read_token
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("sampled", "view", "action", "queries", "db_time", "spans")
+
+    def __init__(self, sampled=True):
+        self.sampled = sampled
+        self.view = None
+        self.action = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.spans = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+def current_metrics():
+    """The metrics of the request being handled, or None when not measured"""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time a block and add it to the current request's metrics, if sampled"""
+    metrics = _current.get()
+    if metrics is None or not metrics.sampled:
+        yield
+        return
+
+    started = time.perf_counter()
+    db_before = metrics.db_time
+    try:
+        yield
+    finally:
+        # Queries issued inside the block are already counted under db
+        elapsed = time.perf_counter() - started
+        metrics.add_span(name, elapsed - (metrics.db_time - db_before))
+
+
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        with span("serialize"):
+            return super().to_representation(instance)
+
+
+_timed_serializer_classes = {}
+
+
+def timed_serializer_class(serializer_class):
+    """Subclass of ``serializer_class`` whose representation time is recorded"""
+    timed = _timed_serializer_classes.get(serializer_class)
+    if timed is None:
+        timed = type(
+            serializer_class.__name__,
+            (TimedRepresentationMixin, serializer_class),
+            {"__module__": serializer_class.__module__},
+        )
+        _timed_serializer_classes[serializer_class] = timed
+    return timed
+
+
+class InstrumentedViewMixin:
+    """
+    Tag sampled requests with the viewset and action, and time serialization
+    """
+
+    def initial(self, request, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = self.__class__.__name__
+            metrics.action = self.action
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        metrics = _current.get()
+        if metrics is None or not metrics.sampled:
+            return serializer_class
+        return timed_serializer_class(serializer_class)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "REQUEST_METRICS_ENABLED", True)
+        self.sample_rate = getattr(settings, "REQUEST_METRICS_SAMPLE_RATE", 1.0)
+        self.server_timing = getattr(settings, "REQUEST_METRICS_SERVER_TIMING", False)
+        self.profile_token_max_age = getattr(settings, "PROFILER_TOKEN_MAX_AGE", 3600)
+        self.export = getattr(settings, "PROMETHEUS_METRICS_ENABLED", True)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = self.start()
+        if metrics is None:
+            return self.get_response(request)
+
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self.capture_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        if metrics is None:
+            return await self.get_response(request)
+
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        # Connections are per thread: the wrappers go on the connections of
+        # the thread that runs this request's ORM calls and sync views
+        queries = await sync_to_async(self.capture_queries)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+        server_timing = None
+        if metrics.sampled and not self.server_timing:
+            # Reading the session's user may query the database
+            server_timing = await sync_to_async(self.sends_server_timing)(request)
+        self.finish(request, response, metrics, elapsed, server_timing)
+        return response
+
+    def start(self):
+        """Metrics for a new request, or None when it isn't measured"""
+        sampled = self.enabled and random.random() < self.sample_rate
+        if not sampled and not self.export:
+            return None
+        return RequestMetrics(sampled)
+
+    def capture_queries(self, metrics):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(metrics.record_query)
+            )
+        return stack
+
+    def finish(self, request, response, metrics, total, server_timing=None):
+        if metrics.view is None:
+            resolver_match = request.resolver_match
+            metrics.view = resolver_match.view_name if resolver_match else "unmatched"
+
+        if self.export:
+            prometheus.observe_request(
+                metrics.view,
+                metrics.action,
+                request.method,
+                response.status_code,
+                total,
+                metrics.queries,
+            )
+            prometheus.observe_db_pools()
+        if metrics.sampled:
+            if server_timing is None:
+                server_timing = self.sends_server_timing(request)
+            self.report(request, response, metrics, total, server_timing)
+
+    def sends_server_timing(self, request):
+        if self.server_timing:
+            return True
+        token = request.headers.get(PROFILE_HEADER)
+        if token and read_token(token, self.profile_token_max_age) is not None:
+            return True
+        # DRF sets the user it authenticated on the underlying request too
+        user = getattr(request, "user", None)
+        return user is not None and user.is_staff
+
+    def report(self, request, response, metrics, total, server_timing):
+        spans = {"db": metrics.db_time, **metrics.spans}
+        app = max(total - sum(spans.values()), 0.0)
+
+        if server_timing:
+            entries = [
+                f'db;dur={_ms(metrics.db_time)};desc="{metrics.queries} queries"'
+            ]
+            entries += [
+                f"{name};dur={_ms(seconds)}" for name, seconds in metrics.spans.items()
+            ]
+            entries += [f"app;dur={_ms(app)}", f"total;dur={_ms(total)}"]
+            response["Server-Timing"] = ", ".join(entries)
+
+        logger.info(
+            "request timing",
+            extra={
+                "view": metrics.view,
+                "action": metrics.action,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": metrics.queries,
+                "db_ms": _ms(metrics.db_time),
+                **{
+                    f"{name}_ms": _ms(seconds)
+                    for name, seconds in metrics.spans.items()
+                },
+                "app_ms": _ms(app),
+                "total_ms": _ms(total),
+            },
+        )
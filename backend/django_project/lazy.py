@@ -0,0 +1,33 @@
+"""
+Modules imported on first use
+
+Heavy SDKs only some requests need (the Stripe SDK) are bound to a
+LazyModule instead of being imported with the module using them, which keeps
+them out of worker startup and off the import path of management commands
+that never call them (see the profile_imports command). The first attribute
+read imports the module.
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
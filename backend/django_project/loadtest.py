@@ -0,0 +1,337 @@
+"""
+HTTP load-test harness (see ``manage.py loadtest``)
+
+A pool of virtual users runs against a live server. Each user is a thread
+with its own keep-alive session and a seeded random generator, and picks a
+scenario per iteration:
+
+- browse: GET /menu/
+- order: POST /orders/ with the user's X-Device-ID (a new customer's first
+  order is created without one and the returned device id is kept)
+- status: GET /orders/<id>/ and GET /orders/my-orders/ for the user's orders
+- search: GET /orders/search/?q=..., which needs a staff API token
+
+Latency is recorded per endpoint, and the results can be saved as JSON and
+compared against an earlier run.
+"""
+
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+import requests
+
+SCENARIOS = ["browse", "order", "status", "search"]
+DEFAULT_MIX = {"browse": 60, "order": 10, "status": 25, "search": 5}
+SEARCH_TERMS = ["ORD", "Customer", "555", "example.com", "Ana"]
+
+# Statuses that are part of normal operation rather than failures
+EXPECTED_STATUSES = {
+    "POST /orders/": {201, 402},  # the checkout declines ~10% of payments
+}
+
+
+def parse_mix(value):
+    """Parse "browse=60,order=10" into {"browse": 60.0, "order": 10.0}"""
+    mix = {}
+    for entry in value.split(","):
+        name, _, weight = entry.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {SCENARIOS}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    # The smallest value with at least ``fraction`` of the values at or below it
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    statuses: dict = field(default_factory=dict)
+    errors: int = 0
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else None,
+            "mean_ms": round(sum(latencies) / count * 1000, 2) if count else None,
+            **{
+                f"p{int(q * 100)}_ms": (
+                    round(percentile(latencies, q) * 1000, 2) if count else None
+                )
+                for q in (0.5, 0.95, 0.99)
+            },
+            "max_ms": round(latencies[-1] * 1000, 2) if count else None,
+            "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+        }
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and status collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.recording = False
+
+    def record(self, endpoint, seconds, status):
+        if not self.recording:
+            return
+
+        expected = EXPECTED_STATUSES.get(endpoint)
+        failed = status is None or (
+            status not in expected if expected else status >= 400
+        )
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.latencies.append(seconds)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if failed:
+                stats.errors += 1
+
+
+class VirtualUser:
+    def __init__(self, harness, index):
+        self.harness = harness
+        self.rng = random.Random(harness.seed * 10007 + index)
+        self.session = requests.Session()
+        self.device_id = None
+        self.order_ids = []
+
+    def request(self, method, path, endpoint, **kwargs):
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(
+                method,
+                self.harness.base_url + path,
+                timeout=self.harness.timeout,
+                **kwargs,
+            )
+            status = response.status_code
+            return response
+        except requests.RequestException:
+            return None
+        finally:
+            self.harness.recorder.record(
+                endpoint, time.perf_counter() - started, status
+            )
+
+    def browse(self):
+        self.request("GET", "/menu/", "GET /menu/")
+
+    def order(self):
+        menu = self.harness.menu
+        basket = self.rng.sample(menu, k=min(len(menu), self.rng.randint(1, 4)))
+        headers = {"X-Device-ID": self.device_id} if self.device_id else {}
+        response = self.request(
+            "POST",
+            "/orders/",
+            "POST /orders/",
+            json={
+                "customer_info": {
+                    "name": "Load Test",
+                    "phone": f"555{self.rng.randrange(10**7):07d}",
+                    "email": "loadtest@example.com",
+                },
+                "address_info": {"address_line_1": "1 Main Street", "no_exterior": "1"},
+                "order_instructions": {"special_instructions": ""},
+                "payment_info": {
+                    "card_number": "4242424242424242",
+                    "card_holder": "Load Test",
+                    "expiry_date": "12/2030",
+                    "cvv": "123",
+                },
+                "menu_items": [
+                    {
+                        "menu_item_id": item_id,
+                        "size_id": self.rng.choice(size_ids),
+                        "quantity": self.rng.randint(1, 3),
+                    }
+                    for item_id, size_ids in basket
+                ],
+            },
+            headers=headers,
+        )
+        if response is not None and response.status_code == 201:
+            payload = response.json()
+            self.device_id = self.device_id or payload.get("device_id")
+            self.order_ids.append(payload["order"]["id"])
+
+    def status(self):
+        if not self.order_ids:
+            self.order()
+            return
+
+        headers = {"X-Device-ID": self.device_id}
+        order_id = self.rng.choice(self.order_ids[-5:])
+        self.request(
+            "GET", f"/orders/{order_id}/", "GET /orders/<id>/", headers=headers
+        )
+        self.request(
+            "GET", "/orders/my-orders/", "GET /orders/my-orders/", headers=headers
+        )
+
+    def search(self):
+        self.request(
+            "GET",
+            "/orders/search/",
+            "GET /orders/search/",
+            params={"q": self.rng.choice(SEARCH_TERMS)},
+            headers={"Authorization": f"Token {self.harness.token}"},
+        )
+
+    def run(self, deadline):
+        scenarios, weights = zip(*self.harness.mix.items())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(scenarios, weights)[0])()
+            if self.harness.think_time:
+                time.sleep(self.rng.expovariate(1 / self.harness.think_time))
+
+
+class LoadTest:
+    def __init__(
+        self,
+        base_url,
+        concurrency=16,
+        duration=30,
+        warmup=5,
+        mix=None,
+        token=None,
+        seed=0,
+        think_time=0,
+        timeout=30,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.token = token
+        self.seed = seed
+        self.think_time = think_time
+        self.timeout = timeout
+        self.recorder = Recorder()
+        self.menu = []
+
+        if not token:
+            # Searching is limited to staff
+            self.mix.pop("search", None)
+
+    def load_menu(self):
+        """(menu item id, [size ids]) for every orderable item"""
+        response = requests.get(f"{self.base_url}/menu/", timeout=self.timeout)
+        response.raise_for_status()
+        self.menu = [
+            (item["id"], [size["id"] for size in item["sizes"]])
+            for item in response.json()
+            if item["sizes"]
+        ]
+        if not self.menu and self.mix.get("order"):
+            raise RuntimeError("The menu has no items with sizes to order")
+
+    def run(self):
+        self.load_menu()
+        users = [VirtualUser(self, index) for index in range(self.concurrency)]
+
+        start = time.monotonic()
+        deadline = start + self.warmup + self.duration
+        threads = [
+            threading.Thread(target=user.run, args=(deadline,), daemon=True)
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(self.warmup)
+        self.recorder.recording = True
+        measured_from = time.monotonic()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - measured_from
+
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        endpoints = {
+            endpoint: stats.summary(elapsed)
+            for endpoint, stats in sorted(self.recorder.endpoints.items())
+        }
+        total = sum(summary["requests"] for summary in endpoints.values())
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "base_url": self.base_url,
+                "concurrency": self.concurrency,
+                "duration_s": round(elapsed, 2),
+                "warmup_s": self.warmup,
+                "mix": self.mix,
+                "seed": self.seed,
+                "think_time_s": self.think_time,
+            },
+            "total": {
+                "requests": total,
+                "errors": sum(summary["errors"] for summary in endpoints.values()),
+                "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+            },
+            "endpoints": endpoints,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """
+    Per-endpoint relative change of each latency percentile and throughput,
+    as fractions (0.1 = 10% higher than the baseline)
+    """
+    changes = {}
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(endpoint)
+        if previous is None:
+            continue
+        changes[endpoint] = {
+            metric: (
+                (current[metric] - previous[metric]) / previous[metric]
+                if current[metric] is not None and previous[metric]
+                else None
+            )
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+        }
+    return changes
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,244 @@
+"""
+Logging that never blocks a request
+
+QueuedStreamHandler puts records on a bounded in-memory queue, and a listener
+thread writes them to the stream (stdout by default) with the configured
+formatter. A request thread only pays for building the record: when the
+stream stalls, the queue fills up and further records are dropped and
+counted rather than waited on. Forked workers (gunicorn --preload) start
+their own listener.
+
+RequestIdMiddleware gives every request an id, taken from a sane X-Request-ID
+header or generated, and returns it in the response; RequestIdFilter stamps
+it on every record logged while the request is handled. JsonFormatter writes
+one JSON object per record, including the fields passed in ``extra``.
+RateLimitFilter keeps a repeated warning or error from flooding the log.
+"""
+
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "request_id",
+}
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    def start(self, request):
+        # Keep the id of a proxy or client that sent one, to join their logs
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return _request_id.set(request_id)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being handled (or None)"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most ``rate`` records per ``per`` seconds for each message
+    (the format string, so repeats with different arguments count together)
+    at ``level`` or above; the next one let through reports how many were
+    suppressed in its ``suppressed`` field
+    """
+
+    def __init__(self, rate=10, per=60, level=logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        self.level = logging._checkLevel(level)
+        # (logger, message) -> [window start, records let through, suppressed]
+        self.windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.per:
+                suppressed = window[2] if window else 0
+                if len(self.windows) >= 1000:
+                    self.windows.clear()
+                window = self.windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with its ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update(
+            (name, value)
+            for name, value in vars(record).items()
+            if name not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+_handlers = weakref.WeakSet()
+
+
+class QueuedStreamHandler(QueueHandler):
+    """
+    Hand records to a listener thread writing them to ``stream``; the
+    formatter set on this handler is the one the listener formats with
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.dropped = 0
+        super().__init__(queue.Queue(queue_size))
+        self.listener = None
+        self.start()
+        _handlers.add(self)
+
+    def start(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def after_fork(self):
+        # The parent's listener thread didn't survive the fork, and its
+        # queue's locks may have been held by it
+        self.queue = queue.Queue(self.queue_size)
+        self.dropped = 0
+        self.start()
+
+    def setFormatter(self, formatter):
+        self.target.setFormatter(formatter)
+
+    def prepare(self, record):
+        # Formatting is left to the listener thread; only what can't wait
+        # (the message arguments and the traceback) is resolved here
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            # Imported late: logging is configured before the apps load
+            from .metrics import LOG_RECORDS_DROPPED
+
+            LOG_RECORDS_DROPPED.inc()
+
+    def close(self):
+        if self.listener is not None:
+            # Writes out what is still queued
+            try:
+                self.listener.stop()
+            except queue.Full:
+                pass
+            self.listener = None
+        self.target.close()
+        super().close()
+
+
+def _restart_listeners():
+    for handler in list(_handlers):
+        if handler.listener is not None:
+            handler.after_fork()
+
+
+def _stop_listeners():
+    for handler in list(_handlers):
+        handler.close()
+
+
+os.register_at_fork(after_in_child=_restart_listeners)
+atexit.register(_stop_listeners)
@@ -0,0 +1,201 @@
+"""
+Prometheus metrics
+
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn deployments, see
+gunicorn.conf.py) every worker writes its samples to memory-mapped files in
+that directory and /metrics aggregates all of them, so a scrape sees the
+whole container rather than whichever worker answered.
+
+Processes outside gunicorn, such as the webhook worker (manage.py
+process_webhooks), don't share that directory: they serve their own metrics
+with start_metrics_server().
+"""
+
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by view and DRF action",
+    ["view", "action", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request by view and DRF action",
+    ["view", "action"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+ORDERS_CREATED = Counter(
+    "orders_created_total",
+    "Orders created, by initial status",
+    ["status"],
+)
+PAYMENTS = Counter(
+    "payments_total",
+    "Payment outcomes from checkout and Stripe webhooks",
+    ["source", "outcome"],
+)
+STRIPE_LATENCY = Histogram(
+    "stripe_api_request_duration_seconds",
+    "Latency of Stripe API calls",
+    ["operation", "error"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups, by cache and result (hit/miss, and coalesced/stale for "
+    "single-flight caches)",
+    ["cache", "result"],
+)
+CACHE_REFRESHES = Counter(
+    "cache_refreshes_total",
+    "Background refreshes of single-flight caches, by trigger (early/stale)",
+    ["cache", "trigger"],
+)
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_total",
+    "In-process cache invalidations applied, by topic and source "
+    "(local/remote/resync)",
+    ["topic", "source"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "psycopg pool connections by state (size, available, waiting requests)",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_REQUESTS = Counter(
+    "db_pool_requests_total",
+    "Connections handed out by the psycopg pool",
+    ["alias"],
+)
+DB_POOL_WAIT = Counter(
+    "db_pool_wait_seconds_total",
+    "Time requests spent waiting for a pooled connection",
+    ["alias"],
+)
+DB_POOL_CONNECTS = Counter(
+    "db_pool_connects_total",
+    "New server connections opened by the psycopg pool",
+    ["alias"],
+)
+DB_POOL_ERRORS = Counter(
+    "db_pool_errors_total",
+    "Pool failures: timed out requests, failed or lost connections",
+    ["alias", "kind"],
+)
+DB_WRITE_QUEUE_WAIT = Histogram(
+    "db_write_queue_wait_seconds",
+    "Time SQLite write transactions waited in the worker's write queue",
+    ["alias"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Pool stats are read at most this often per process
+DB_POOL_STATS_INTERVAL = 1.0
+_pool_stats_lock = threading.Lock()
+_pool_stats_read_at = 0.0
+
+
+def observe_request(view, action, method, status, seconds, queries):
+    REQUEST_LATENCY.labels(view, action or "", method, status).observe(seconds)
+    REQUEST_QUERIES.labels(view, action or "").observe(queries)
+
+
+def observe_db_pools():
+    """Copy psycopg pool statistics of every configured database to metrics"""
+    global _pool_stats_read_at
+
+    now = time.monotonic()
+    if now - _pool_stats_read_at < DB_POOL_STATS_INTERVAL:
+        return
+    if not _pool_stats_lock.acquire(blocking=False):
+        return
+
+    try:
+        _pool_stats_read_at = now
+        for alias in connections:
+            pool = getattr(connections[alias], "pool", None)
+            if pool is None:
+                continue
+
+            # pop_stats() resets the counters, so each delta is counted once
+            stats = pool.pop_stats()
+            DB_POOL_CONNECTIONS.labels(alias, "size").set(stats.get("pool_size", 0))
+            DB_POOL_CONNECTIONS.labels(alias, "available").set(
+                stats.get("pool_available", 0)
+            )
+            DB_POOL_CONNECTIONS.labels(alias, "waiting").set(
+                stats.get("requests_waiting", 0)
+            )
+            DB_POOL_REQUESTS.labels(alias).inc(stats.get("requests_num", 0))
+            DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+            DB_POOL_CONNECTS.labels(alias).inc(stats.get("connections_num", 0))
+            for kind, key in [
+                ("request", "requests_errors"),
+                ("connect", "connections_errors"),
+                ("lost", "connections_lost"),
+            ]:
+                DB_POOL_ERRORS.labels(alias, kind).inc(stats.get(key, 0))
+    finally:
+        _pool_stats_lock.release()
+
+
+def record_cache_lookup(cache, hit):
+    record_cache_result(cache, "hit" if hit else "miss")
+
+
+def record_cache_result(cache, result):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def record_payment(source, outcome, count=1):
+    if count:
+        PAYMENTS.labels(source, outcome).inc(count)
+
+
+def start_metrics_server(port, addr="0.0.0.0"):
+    """
+    Serve this process's metrics over HTTP on ``port`` from a background
+    thread, for processes that /metrics doesn't see
+    """
+    # The default registry reads this process's samples only, in
+    # multiprocess mode too
+    server, _ = start_http_server(port, addr, registry=REGISTRY)
+    return server
+
+
+def metrics_view(request):
+    """Prometheus text exposition of every worker's metrics"""
+    token = getattr(settings, "METRICS_AUTH_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
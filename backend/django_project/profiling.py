@@ -0,0 +1,249 @@
+"""
+On-demand request profiling
+
+ProfilingMiddleware profiles a single request when either
+
+- the request carries an X-Profile header with a token signed by this
+  deployment's SECRET_KEY (staff get one from POST /profiling/token or
+  ``manage.py profile_token``), or
+- the view matches an entry in PROFILER_ENDPOINTS, e.g.
+  {"OrderViewSet.create": 0.01} profiles 1% of order creations.
+
+Two capture modes are available:
+
+- "sample" (default): a background thread samples the request thread's stack
+  every PROFILER_SAMPLE_INTERVAL seconds and writes collapsed stacks
+  (``*.folded``), which flamegraph.pl and speedscope read directly.
+- "cprofile": deterministic cProfile capture written as pstats (``*.prof``)
+  for snakeviz or flameprof. Only one runs at a time per process (Python
+  3.12+ refuses a second active profiler), so a cprofile request arriving
+  while another is captured is sampled instead.
+
+A profile covers the rest of the request once this (last) middleware is
+reached: the view, with whatever wraps it such as a request transaction, and
+the rendering of its response. Profiles go to PROFILER_DIR, keeping the newest
+PROFILER_MAX_FILES files. Every other request costs one header lookup, plus a
+URL resolution and a dictionary lookup when PROFILER_ENDPOINTS is set.
+
+Under ASGI, sync views are profiled in the thread running them. Native async
+views (see django_project.async_views) interleave on the event loop thread
+with other requests, so they are not profiled.
+"""
+
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core import signing
+from django.urls import Resolver404, resolve
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+HEADER = "X-Profile"
+SIGNING_SALT = "django_project.profiling"
+MODES = ["sample", "cprofile"]
+
+# Held for the duration of a cProfile capture
+_cprofile_lock = threading.Lock()
+
+
+def make_token(mode="sample"):
+    """Signed, timestamped value for the X-Profile header"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(mode)
+
+
+def read_token(token, max_age):
+    """The profiling mode a token asks for, or None if it is invalid/expired"""
+    try:
+        mode = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def profile_token_view(request):
+    """Issue an X-Profile token to a staff user"""
+    mode = request.data.get("mode", "sample")
+    if mode not in MODES:
+        return Response(
+            {"error": f"mode must be one of {', '.join(MODES)}"}, status=400
+        )
+    return Response(
+        {
+            "header": HEADER,
+            "token": make_token(mode),
+            "expires_in": getattr(settings, "PROFILER_TOKEN_MAX_AGE", 3600),
+        }
+    )
+
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def resolve_view(request):
+    """The view ``request`` is routed to, or None when no URL matches"""
+    try:
+        return resolve(request.path_info, getattr(request, "urlconf", None)).func
+    except Resolver404:
+        return None
+
+
+def view_label(view_func, method):
+    """ "ViewSet.action" for DRF viewsets, otherwise the view's name"""
+    if view_func is None:
+        return "unmatched"
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return getattr(view_func, "__name__", "view")
+
+    actions = getattr(view_func, "actions", None)
+    if not actions:
+        return cls.__name__
+    return f"{cls.__name__}.{actions.get(method.lower(), 'unknown')}"
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = Path(getattr(settings, "PROFILER_DIR", "profiles"))
+        self.max_files = getattr(settings, "PROFILER_MAX_FILES", 50)
+        self.interval = getattr(settings, "PROFILER_SAMPLE_INTERVAL", 0.005)
+        self.token_max_age = getattr(settings, "PROFILER_TOKEN_MAX_AGE", 3600)
+        self.endpoints = getattr(settings, "PROFILER_ENDPOINTS", {})
+        self.endpoint_mode = getattr(settings, "PROFILER_ENDPOINT_MODE", "sample")
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        mode = self.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        return self.profile(mode, request, self.get_response)
+
+    async def __acall__(self, request):
+        mode = self.requested_mode(request)
+        if mode is not None and iscoroutinefunction(resolve_view(request)):
+            mode = None
+        if mode is None:
+            return await self.get_response(request)
+        # The rest of the stack runs from a thread we profile: a sync view
+        # and its rendering, run thread-sensitively, come back to that thread
+        return await sync_to_async(self.profile)(
+            mode, request, async_to_sync(self.get_response)
+        )
+
+    def profile(self, mode, request, get_response):
+        """
+        Profile ``get_response(request)``: the other middleware's
+        process_view, the view in its transaction and the response rendering
+        """
+        label = view_label(resolve_view(request), request.method)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if mode == "cprofile" and not _cprofile_lock.acquire(blocking=False):
+            mode = "sample"
+
+        if mode == "cprofile":
+            try:
+                profiler = cProfile.Profile()
+                response = profiler.runcall(get_response, request)
+            finally:
+                _cprofile_lock.release()
+            path = self.directory / f"{name}.prof"
+            profiler.dump_stats(path)
+        else:
+            with StackSampler(threading.get_ident(), self.interval) as sampler:
+                response = get_response(request)
+            path = self.directory / f"{name}.folded"
+            sampler.write(path)
+
+        self.enforce_retention()
+        response["X-Profile-Id"] = path.name
+        return response
+
+    def requested_mode(self, request):
+        token = request.headers.get(HEADER)
+        if token:
+            return read_token(token, self.token_max_age)
+
+        if not self.endpoints:
+            return None
+
+        rate = self.endpoints.get(view_label(resolve_view(request), request.method))
+        if rate and random.random() < rate:
+            return self.endpoint_mode
+        return None
+
+    def enforce_retention(self):
+        profiles = sorted(
+            (
+                path
+                for path in self.directory.iterdir()
+                if path.suffix in [".prof", ".folded"]
+            ),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in profiles[self.max_files :]:
+            path.unlink(missing_ok=True)
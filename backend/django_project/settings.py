@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 from corsheaders.defaults import default_headers
@@ -31,6 +32,51 @@ ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "127.0.0.1").split(",")
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+# Point at a local stand-in (manage.py stripe_standin) to work offline
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE")
+# HTTP client: keep-alive pool per worker, timeouts in seconds, SDK retries
+STRIPE_HTTP_POOL_MAXSIZE = int(os.environ.get("STRIPE_HTTP_POOL_MAXSIZE", 10))
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get("STRIPE_CONNECT_TIMEOUT", 3.05))
+STRIPE_READ_TIMEOUT = float(os.environ.get("STRIPE_READ_TIMEOUT", 20))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get("STRIPE_MAX_NETWORK_RETRIES", 2))
+# Prefix of the idempotency keys creating Stripe customers, unique per
+# environment when several share a Stripe account (default: derived from the
+# database's host, port and name)
+STRIPE_IDEMPOTENCY_KEY_PREFIX = os.environ.get("STRIPE_IDEMPOTENCY_KEY_PREFIX", "")
+# Per-worker cache of user -> Stripe customer id
+STRIPE_CUSTOMER_CACHE_TTL = int(os.environ.get("STRIPE_CUSTOMER_CACHE_TTL", 3600))
+STRIPE_CUSTOMER_CACHE_MAXSIZE = int(
+    os.environ.get("STRIPE_CUSTOMER_CACHE_MAXSIZE", 10000)
+)
+# Webhook inbox worker (manage.py process_webhooks)
+STRIPE_WEBHOOK_BATCH_SIZE = int(os.environ.get("STRIPE_WEBHOOK_BATCH_SIZE", 500))
+STRIPE_WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("STRIPE_WEBHOOK_MAX_ATTEMPTS", 5))
+STRIPE_WEBHOOK_POLL_INTERVAL = float(
+    os.environ.get("STRIPE_WEBHOOK_POLL_INTERVAL", 1)
+)
+# The worker runs outside gunicorn, so its metrics (webhook payment outcomes)
+# aren't part of /metrics: when set, it serves them itself on this port
+STRIPE_WEBHOOK_METRICS_PORT = int(os.environ.get("STRIPE_WEBHOOK_METRICS_PORT", 0))
+
+## Customer activity tracking
+# Customer.last_seen updates are buffered per worker and flushed with a single
+# bulk UPDATE every CUSTOMER_LAST_SEEN_FLUSH_INTERVAL seconds (0 writes through).
+CUSTOMER_LAST_SEEN_FLUSH_INTERVAL = int(
+    os.environ.get("CUSTOMER_LAST_SEEN_FLUSH_INTERVAL", 30)
+)
+CUSTOMER_LAST_SEEN_MAX_PENDING = int(
+    os.environ.get("CUSTOMER_LAST_SEEN_MAX_PENDING", 5000)
+)
+
+## Tests
+# The test runner writes Customer.last_seen through (see django_project.testing)
+TEST_RUNNER = "django_project.testing.TestRunner"
+
+## Employee onboarding
+# Bulk registration (POST /employees/bulk-register/, manage.py
+# onboard_employees) hashes passwords across this many spawned processes;
+# 0 uses one per CPU, 1 hashes in the calling process.
+ONBOARDING_HASH_PROCESSES = int(os.environ.get("ONBOARDING_HASH_PROCESSES", 0))
 
 # CORS
 CORS_ALLOWED_ORIGINS = [
@@ -45,6 +91,7 @@ INSTALLED_APPS = [
     "delivery.apps.DeliveryConfig",
     "backoffice.apps.BackofficeConfig",
     "payments.apps.PaymentsConfig",
+    "caching.apps.CachingConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -57,6 +104,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "django_project.log.RequestIdMiddleware",
+    "django_project.instrumentation.RequestTimingMiddleware",
+    "django_project.compression.CompressionMiddleware",
+    "django_project.db_routers.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -65,8 +116,126 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django_project.profiling.ProfilingMiddleware",
 ]
 
+## Logging
+# Records are queued and written to stdout by a listener thread (see
+# django_project.log), one JSON object per line (LOG_FORMAT=text for plain
+# lines) tagged with the request id. DJANGO_LOGLEVEL is the level of the
+# project's loggers; LOG_LEVELS overrides single loggers, as in
+# "caching=DEBUG,django.db.backends=DEBUG". Repeated warnings and errors of
+# the order flow are limited to LOG_RATE_LIMIT per LOG_RATE_LIMIT_PERIOD
+# seconds per message.
+DJANGO_LOGLEVEL = os.environ.get("DJANGO_LOGLEVEL", "WARNING").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", 10))
+LOG_RATE_LIMIT_PERIOD = float(os.environ.get("LOG_RATE_LIMIT_PERIOD", 60))
+LOG_LEVELS = {
+    # A warning for every 4xx response is noise
+    "django.request": "ERROR",
+    **{
+        name.strip(): level.strip().upper()
+        for name, _, level in (
+            pair.partition("=")
+            for pair in os.environ.get("LOG_LEVELS", "").split(",")
+            if pair.strip()
+        )
+    },
+}
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "django_project.log.RequestIdFilter"},
+        "rate_limit": {
+            "()": "django_project.log.RateLimitFilter",
+            "rate": LOG_RATE_LIMIT,
+            "per": LOG_RATE_LIMIT_PERIOD,
+        },
+    },
+    "formatters": {
+        "json": {"()": "django_project.log.JsonFormatter"},
+        "text": {
+            "format": "%(asctime)s %(levelname)s %(name)s [%(request_id)s] "
+            "%(message)s"
+        },
+    },
+    "handlers": {
+        "queue": {
+            "class": "django_project.log.QueuedStreamHandler",
+            "formatter": LOG_FORMAT,
+            "filters": ["request_id"],
+            "queue_size": LOG_QUEUE_SIZE,
+        },
+    },
+    "root": {"handlers": ["queue"], "level": "WARNING"},
+    "loggers": {
+        "django": {"handlers": ["queue"], "level": "WARNING", "propagate": False},
+        **{
+            app: {"level": DJANGO_LOGLEVEL}
+            for app in (
+                "backoffice",
+                "caching",
+                "delivery",
+                "django_project",
+                "menu",
+                "payments",
+            )
+        },
+        "delivery.models": {"filters": ["rate_limit"]},
+        "delivery.views": {"filters": ["rate_limit"]},
+    },
+}
+for name, level in LOG_LEVELS.items():
+    LOGGING["loggers"].setdefault(name, {})["level"] = level
+
+## Response compression
+# Bodies of at least COMPRESSION_MIN_SIZE bytes are sent brotli (with the
+# Brotli package installed) or gzip compressed, as the client's
+# Accept-Encoding prefers. Cached bodies such as the menu keep compressed
+# variants made at the highest levels; the rest are compressed per request at
+# COMPRESSION_GZIP_LEVEL / COMPRESSION_BROTLI_QUALITY.
+COMPRESSION_ENABLED = bool(int(os.environ.get("COMPRESSION_ENABLED", 1)))
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+## Request performance instrumentation
+# Fraction of requests measured (0-1); measured requests get a structured
+# "request timing" log record and, for staff users and requests with an
+# X-Profile token (see On-demand profiling), a Server-Timing header.
+# REQUEST_METRICS_SERVER_TIMING=1 sends the header to everyone.
+REQUEST_METRICS_ENABLED = bool(int(os.environ.get("REQUEST_METRICS_ENABLED", 1)))
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get("REQUEST_METRICS_SAMPLE_RATE", 1.0))
+REQUEST_METRICS_SERVER_TIMING = bool(
+    int(os.environ.get("REQUEST_METRICS_SERVER_TIMING", 0))
+)
+# Prometheus metrics served at /metrics. Set PROMETHEUS_MULTIPROC_DIR to
+# aggregate across gunicorn workers and METRICS_AUTH_TOKEN to require
+# "Authorization: Bearer <token>" from the scraper.
+PROMETHEUS_METRICS_ENABLED = bool(int(os.environ.get("PROMETHEUS_METRICS_ENABLED", 1)))
+METRICS_AUTH_TOKEN = os.environ.get("METRICS_AUTH_TOKEN")
+
+## On-demand profiling
+# Requests with a valid signed X-Profile header, and a sampled fraction of the
+# views listed in PROFILER_ENDPOINTS ("OrderViewSet.create:0.01,..."), are
+# profiled and written to PROFILER_DIR as collapsed stacks or cProfile dumps.
+PROFILER_DIR = os.environ.get("PROFILER_DIR", BASE_DIR / "profiles")
+PROFILER_MAX_FILES = int(os.environ.get("PROFILER_MAX_FILES", 50))
+PROFILER_SAMPLE_INTERVAL = float(os.environ.get("PROFILER_SAMPLE_INTERVAL", 0.005))
+PROFILER_TOKEN_MAX_AGE = int(os.environ.get("PROFILER_TOKEN_MAX_AGE", 3600))
+PROFILER_ENDPOINT_MODE = os.environ.get("PROFILER_ENDPOINT_MODE", "sample")
+PROFILER_ENDPOINTS = {
+    view: float(rate)
+    for view, _, rate in (
+        entry.partition(":")
+        for entry in os.environ.get("PROFILER_ENDPOINTS", "").split(",")
+        if entry
+    )
+}
+
 ROOT_URLCONF = "django_project.urls"
 
 TEMPLATES = [
@@ -86,22 +255,169 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "django_project.wsgi.application"
 
+## Async read views
+# Serve the anonymous read endpoints (menu list, order detail, my-orders and
+# the order status check) with native async views. django_project.asgi turns
+# this on; under WSGI every async view would run in its own event loop, so it
+# stays off there unless set explicitly.
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "0") == "1"
+
+## Worker startup
+# Workers warm up (URL resolver, serializers, database connection, menu
+# cache) before accepting requests; with GUNICORN_PRELOAD=1 the master does
+# it once before forking them (see django_project.warmup and gunicorn.conf.py)
+WARMUP_ON_START = bool(int(os.environ.get("WARMUP_ON_START", 1)))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DATABASE_ENGINE = "django.db.backends.{}".format(
+    os.getenv("DATABASE_ENGINE", "sqlite3")
+)
+
+## Database connections
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds and checked
+# before reuse when DATABASE_CONN_HEALTH_CHECKS is on. On PostgreSQL,
+# DATABASE_POOL=1 uses a psycopg connection pool per worker process instead
+# (DATABASE_POOL_MIN_SIZE to DATABASE_POOL_MAX_SIZE connections, waiting up to
+# DATABASE_POOL_TIMEOUT seconds for one), and DATABASE_STATEMENT_TIMEOUT
+# (milliseconds, 0 for none) cancels runaway queries.
+# Served through django_project.asgi, connections are closed after each
+# request whatever DATABASE_CONN_MAX_AGE says: async views run their queries
+# in per-request executor threads, so connections kept open for reuse leak and
+# pile up past the server's limit. Use DATABASE_POOL there to reuse them.
+SERVED_BY_ASGI = os.environ.get("DJANGO_ASGI", "0") == "1"
+DATABASE_POOL = DATABASE_ENGINE == "django.db.backends.postgresql" and bool(
+    int(os.getenv("DATABASE_POOL", 0))
+)
+DATABASE_OPTIONS = {}
+if DATABASE_ENGINE == "django.db.backends.postgresql":
+    DATABASE_STATEMENT_TIMEOUT = int(os.getenv("DATABASE_STATEMENT_TIMEOUT", 0))
+    if DATABASE_STATEMENT_TIMEOUT:
+        DATABASE_OPTIONS["options"] = (
+            f"-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}"
+        )
+    if DATABASE_POOL:
+        DATABASE_OPTIONS["pool"] = {
+            "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", 600)),
+        }
+
+## SQLite
+# Tuned for single-node deployments. In WAL journal mode reads carry on while
+# a write commits, and synchronous=NORMAL syncs at checkpoints rather than on
+# every commit (a power cut can lose the last commits, not corrupt the file).
+# Transactions begin IMMEDIATE, taking the write lock up front rather than
+# failing to upgrade a read lock midway, and wait up to
+# DATABASE_SQLITE_BUSY_TIMEOUT seconds for it. With
+# DATABASE_SQLITE_WRITE_QUEUE on, the write transactions of a worker's
+# threads queue for it in order (see django_project.sqlite) instead of
+# polling SQLite's lock. DATABASE_SQLITE_MMAP_SIZE is in bytes and
+# DATABASE_SQLITE_CACHE_SIZE in pages, or KiB when negative, per connection.
+DATABASE_BACKEND = DATABASE_ENGINE
+if DATABASE_ENGINE == "django.db.backends.sqlite3":
+    DATABASE_BACKEND = "django_project.sqlite"
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.getenv("DATABASE_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("DATABASE_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": int(os.getenv("DATABASE_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "cache_size": int(os.getenv("DATABASE_SQLITE_CACHE_SIZE", -64 * 1024)),
+    }
+    DATABASE_OPTIONS.update(
+        {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            "transaction_mode": "IMMEDIATE",
+            # Sets SQLite's busy_timeout
+            "timeout": float(os.getenv("DATABASE_SQLITE_BUSY_TIMEOUT", 20)),
+            "write_queue": bool(int(os.getenv("DATABASE_SQLITE_WRITE_QUEUE", 1))),
+        }
+    )
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.{}".format(
-            os.getenv("DATABASE_ENGINE", "sqlite3")
-        ),
+        "ENGINE": DATABASE_BACKEND,
         "NAME": os.getenv("DATABASE_NAME", "polls"),
         "USER": os.getenv("DATABASE_USERNAME", "myprojectuser"),
         "PASSWORD": os.getenv("DATABASE_PASSWORD", "password"),
         "HOST": os.getenv("DATABASE_HOST", "127.0.0.1"),
         "PORT": os.getenv("DATABASE_PORT", 5432),
+        # A pool manages connection lifetimes itself
+        "CONN_MAX_AGE": (
+            0
+            if DATABASE_POOL or SERVED_BY_ASGI
+            else int(os.getenv("DATABASE_CONN_MAX_AGE", 60))
+        ),
+        "CONN_HEALTH_CHECKS": bool(int(os.getenv("DATABASE_CONN_HEALTH_CHECKS", 1))),
+        "OPTIONS": DATABASE_OPTIONS,
     }
 }
+
+## Read replicas
+# DATABASE_REPLICAS lists replica hosts ("host" or "host:port"; file paths for
+# SQLite) that share the primary's credentials. Safe (GET/HEAD/OPTIONS)
+# requests read from them, and clients that just wrote read from the primary
+# for DATABASE_REPLICA_STICKINESS seconds. Those pins are kept in the default
+# cache, so replicas require a cache the workers share (CACHE_BACKEND file or
+# redis) unless the stickiness is 0. Tests mirror replicas to default.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICAS", "").split(",")), start=1
+):
+    alias = f"replica{index}"
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASE_ENGINE == "django.db.backends.sqlite3":
+        DATABASES[alias]["NAME"] = replica
+    else:
+        host, _, port = replica.partition(":")
+        DATABASES[alias]["HOST"] = host
+        DATABASES[alias]["PORT"] = port or DATABASES["default"]["PORT"]
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["django_project.db_routers.PrimaryReplicaRouter"]
+DATABASE_REPLICA_STICKINESS = int(os.getenv("DATABASE_REPLICA_STICKINESS", 5))
+
+## Cache
+# CACHE_BACKEND picks where the default cache lives:
+# - "locmem": in each worker's memory (CACHE_LOCATION names the store)
+# - "file": files in the CACHE_LOCATION directory, shared by the workers of a
+#   host
+# - "redis": the Redis server at the CACHE_LOCATION URL, shared by every
+#   worker; `manage.py redis_standin` runs a local stand-in
+# Cached endpoints, token-less replica pins and cache tag versions all use
+# it, so only "redis" makes them consistent across hosts.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHE_LOCATION = os.getenv(
+    "CACHE_LOCATION",
+    {
+        "locmem": "default",
+        "file": os.path.join(tempfile.gettempdir(), "django-cache"),
+        "redis": "redis://127.0.0.1:6379/0",
+    }[CACHE_BACKEND],
+)
+CACHE_OPTIONS = {}
+if CACHE_BACKEND != "redis":
+    # Redis evicts by its own maxmemory policy
+    CACHE_OPTIONS["MAX_ENTRIES"] = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": CACHE_LOCATION,
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
+        "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", ""),
+        "OPTIONS": CACHE_OPTIONS,
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -128,11 +444,55 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAdminUser",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "backoffice.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
 }
 
+## Token authentication cache
+# Resolved tokens (user, staff flag, employee role) are cached per worker and
+# invalidated by signals on Token, User and Employee changes.
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 300))
+AUTH_TOKEN_CACHE_MAXSIZE = int(os.environ.get("AUTH_TOKEN_CACHE_MAXSIZE", 10000))
+
+## Cache invalidation
+# In-process caches are invalidated in every worker through a bus (see
+# caching.invalidation): "local" (single process), "postgres" (LISTEN/NOTIFY),
+# "socket" (Unix sockets between the workers of one host) or "table" (a
+# polled version table, any database). gunicorn.conf.py defaults it to
+# "socket" when running more than one worker, but sockets only reach the
+# workers of one container: a deployment running the backend in several
+# containers must set "postgres" or "table" instead.
+INVALIDATION_TRANSPORT = os.environ.get("INVALIDATION_TRANSPORT", "local")
+INVALIDATION_CHANNEL = os.environ.get("INVALIDATION_CHANNEL", "cache_invalidation")
+INVALIDATION_SOCKET_DIR = os.environ.get(
+    "INVALIDATION_SOCKET_DIR",
+    os.path.join(tempfile.gettempdir(), "cache-invalidation"),
+)
+INVALIDATION_POLL_INTERVAL = float(os.environ.get("INVALIDATION_POLL_INTERVAL", 2))
+# After a listener failure, caches are dropped (and the listener reconnects)
+# this often, which bounds how long a missed invalidation can be served
+INVALIDATION_RETRY_INTERVAL = float(os.environ.get("INVALIDATION_RETRY_INTERVAL", 5))
+
+## Cached endpoints
+# Computed once per TTL with concurrent misses coalesced, refreshed early in
+# the background, and served stale for up to *_STALE_TTL more seconds while a
+# refresh runs (see caching.loader). A TTL of 0 turns caching off.
+# The menu is also dropped whenever an item or size changes.
+MENU_CACHE_TTL = int(os.environ.get("MENU_CACHE_TTL", 300))
+MENU_CACHE_STALE_TTL = int(os.environ.get("MENU_CACHE_STALE_TTL", 3600))
+# Order counts and revenue for the dashboard, not invalidated by new orders
+ORDER_SUMMARY_CACHE_TTL = int(os.environ.get("ORDER_SUMMARY_CACHE_TTL", 30))
+ORDER_SUMMARY_STALE_TTL = int(os.environ.get("ORDER_SUMMARY_STALE_TTL", 120))
+# Single orders and their status, per device, until the order changes. Off
+# by default unless the cache is Redis: changes are then dropped by tag
+# versions every process (web workers and the webhook worker alike) shares,
+# where with a per-worker or per-host cache other workers would keep serving
+# an order's old status
+ORDER_CACHE_TTL = int(
+    os.environ.get("ORDER_CACHE_TTL", 60 if CACHE_BACKEND == "redis" else 0)
+)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
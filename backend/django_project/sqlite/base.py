@@ -0,0 +1,144 @@
+"""
+SQLite backend with an in-process write queue
+
+SQLite lets one connection write at a time. Other writers wait in its busy
+handler, which polls with growing sleeps, so under a burst of orders some
+wait far longer than others and, past the busy timeout, fail with "database
+is locked".
+
+With OPTIONS["write_queue"] on, the write transactions (atomic blocks, begun
+IMMEDIATE per OPTIONS["transaction_mode"]) of a process's threads queue for
+the database in arrival order instead, and each hands it to the next as soon
+as it commits. Writers in other processes still meet at SQLite's lock,
+bounded by the busy timeout (OPTIONS["timeout"]), which also bounds the wait
+in the queue. Writes outside atomic blocks don't queue.
+"""
+
+import os
+import threading
+import time
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+from django_project.metrics import DB_WRITE_QUEUE_WAIT
+
+
+class WriteQueue:
+    """A lock granted in the order it was asked for, re-entrant per thread"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        # Tickets whose holders gave up waiting
+        self._abandoned = set()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, timeout=None):
+        """Wait for our turn, at most ``timeout`` seconds; False if it didn't come"""
+        thread = threading.get_ident()
+        with self._condition:
+            if self._owner == thread:
+                self._depth += 1
+                return True
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            if not self._condition.wait_for(lambda: self._serving == ticket, timeout):
+                self._abandoned.add(ticket)
+                return False
+            self._owner = thread
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._depth -= 1
+            if self._depth:
+                return
+            self._owner = None
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.remove(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
+
+
+# Database file -> its WriteQueue, shared by the connections of all threads
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(name):
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
+
+
+def _reset_queues():
+    # A forked worker writes on its own connections; the parent's holders
+    # and waiters didn't come along
+    global _queues_lock
+    _queues.clear()
+    _queues_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_queues)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_queue = None
+        self.write_queue_timeout = None
+        # Whether this connection's transaction holds the queue
+        self.queued = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        if kwargs.pop("write_queue", False):
+            self.write_queue = write_queue(self.settings_dict["NAME"])
+            # The sqlite3 module's default busy timeout
+            self.write_queue_timeout = kwargs.get("timeout", 5)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        if self.write_queue is not None and not self.queued:
+            start = time.monotonic()
+            if not self.write_queue.acquire(self.write_queue_timeout):
+                raise OperationalError("database is locked (write queue timeout)")
+            DB_WRITE_QUEUE_WAIT.labels(self.alias).observe(time.monotonic() - start)
+            self.queued = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.leave_write_queue()
+            raise
+
+    def leave_write_queue(self):
+        if self.queued:
+            self.queued = False
+            self.write_queue.release()
+
+    def _commit(self):
+        # A failed commit is rolled back next, which leaves the queue
+        super()._commit()
+        self.leave_write_queue()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self.leave_write_queue()
+
+    def _set_autocommit(self, autocommit):
+        super()._set_autocommit(autocommit)
+        # Back in autocommit mode, whatever became of the transaction
+        if autocommit:
+            self.leave_write_queue()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self.leave_write_queue()
@@ -0,0 +1,99 @@
+"""
+Query-count and response-size budgets for API tests
+
+QueryBudgetMixin runs a request against a small and a large data set and
+fails when the number of queries differs between the two (an N+1), exceeds
+the endpoint's budget, or the response body outgrows its ceiling. Budgets are
+upper bounds: lower them when an endpoint gets cheaper, never raise them to
+make a regression pass.
+
+TestRunner (settings.TEST_RUNNER) writes Customer.last_seen through, so no
+buffered update outlives the test database.
+"""
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+
+class QueryBudgetMixin:
+    # Total rows seeded before each measurement; the last must exceed a page
+    seed_sizes = (3, 60)
+
+    def seed(self, count):
+        """Create ``count`` more rows of whatever the endpoint lists"""
+        raise NotImplementedError
+
+    def authenticate(self, user):
+        """Send ``user``'s API token with every following request"""
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def assertWithinBudget(
+        self, request, queries, max_bytes, status=200, per_row=False
+    ):
+        """
+        Call ``request`` (a function returning a response) at each seed size
+        and check its query count and body size
+
+        ``max_bytes`` caps the whole body, or each seeded row when ``per_row``
+        is set (for endpoints that aren't paginated).
+        """
+        seeded = 0
+        counts = []
+        for size in self.seed_sizes:
+            self.seed(size - seeded)
+            seeded = size
+
+            # Warm per-worker caches (auth tokens, Stripe customers) first
+            request()
+            with CaptureQueriesContext(connections["default"]) as captured:
+                response = request()
+
+            self.assertEqual(response.status_code, status, response.content[:500])
+
+            limit = max_bytes * seeded if per_row else max_bytes
+            self.assertLessEqual(
+                len(response.content),
+                limit,
+                f"{len(response.content)} byte response with {seeded} rows "
+                f"exceeds the {limit} byte ceiling",
+            )
+
+            counts.append(len(captured))
+            sql = "\n".join(query["sql"] for query in captured.captured_queries)
+            self.assertLessEqual(
+                len(captured),
+                queries,
+                f"{len(captured)} queries with {seeded} rows, budget is "
+                f"{queries}:\n{sql}",
+            )
+
+        self.assertEqual(
+            len(set(counts)),
+            1,
+            f"Query count grows with the data set: {dict(zip(self.seed_sizes, counts))}",
+        )
+        return response
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that writes Customer.last_seen through
+
+    A touch left in a worker's buffer is flushed at interpreter exit, after
+    the test database is gone: it would land in the configured database.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Set in place, as Django sets ALLOWED_HOSTS: override_settings would
+        # hide SETTINGS_MODULE, which spawned processes need
+        self.last_seen_flush_interval = settings.CUSTOMER_LAST_SEEN_FLUSH_INTERVAL
+        settings.CUSTOMER_LAST_SEEN_FLUSH_INTERVAL = 0
+
+    def teardown_test_environment(self, **kwargs):
+        settings.CUSTOMER_LAST_SEEN_FLUSH_INTERVAL = self.last_seen_flush_interval
+        super().teardown_test_environment(**kwargs)
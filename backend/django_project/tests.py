@@ -0,0 +1,244 @@
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from menu.models import MenuItem
+from menu.tests import create_menu_items
+from menu.views import menu_cache
+
+from . import loadtest, metrics, profiling, warmup
+
+
+def database_settings(**environ):
+    """The default DATABASES entry the settings module builds under ``environ``"""
+    code = (
+        "import json\n"
+        "from django_project import settings\n"
+        "default = settings.DATABASES['default']\n"
+        "print(json.dumps({key: default[key] for key in "
+        "['CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS']}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "DJANGO_ASGI": "0", "DATABASE_POOL": "0", **environ},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+class DatabaseConnectionTests(APITestCase):
+    def test_connections_are_reused(self):
+        database = database_settings(DATABASE_CONN_MAX_AGE="60")
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_closed_after_each_request_under_asgi(self):
+        self.assertEqual(database_settings(DJANGO_ASGI="1")["CONN_MAX_AGE"], 0)
+
+    def test_postgres_pool(self):
+        database = database_settings(
+            DATABASE_ENGINE="postgresql",
+            DATABASE_POOL="1",
+            DATABASE_POOL_MAX_SIZE="4",
+            DATABASE_STATEMENT_TIMEOUT="5000",
+        )
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 4)
+        self.assertEqual(database["OPTIONS"]["options"], "-c statement_timeout=5000")
+
+    def test_pool_statistics_are_exported(self):
+        pool = mock.Mock()
+        pool.pop_stats.return_value = {
+            "pool_size": 4,
+            "pool_available": 3,
+            "requests_num": 7,
+            "requests_wait_ms": 1500,
+            "connections_lost": 1,
+        }
+        requests = metrics.DB_POOL_REQUESTS.labels("default")
+        lost = metrics.DB_POOL_ERRORS.labels("default", "lost")
+        before = requests._value.get(), lost._value.get()
+
+        with mock.patch.object(
+            connection, "pool", pool, create=True
+        ), mock.patch.object(metrics, "_pool_stats_read_at", 0.0):
+            self.client.get("/menu/")
+            # Read at most once a second
+            self.client.get("/menu/")
+
+        pool.pop_stats.assert_called_once_with()
+        size = metrics.DB_POOL_CONNECTIONS.labels("default", "size")
+        self.assertEqual(size._value.get(), 4)
+        self.assertEqual(
+            (requests._value.get(), lost._value.get()),
+            (before[0] + 7, before[1] + 1),
+        )
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_nearest_rank_percentiles(self):
+        hundred = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(hundred, 0.5), 50)
+        self.assertEqual(loadtest.percentile(hundred, 0.95), 95)
+        self.assertEqual(loadtest.percentile(hundred, 0.99), 99)
+        self.assertEqual(loadtest.percentile(list(range(1, 11)), 0.5), 5)
+        self.assertEqual(loadtest.percentile(list(range(1, 11)), 0.95), 10)
+        self.assertEqual(loadtest.percentile([7], 0.99), 7)
+        self.assertIsNone(loadtest.percentile([], 0.5))
+
+    def test_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix("browse=60, order=10,status"),
+            {"browse": 60.0, "order": 10.0, "status": 1.0},
+        )
+        with self.assertRaisesMessage(ValueError, "Unknown scenario 'checkout'"):
+            loadtest.parse_mix("browse=60,checkout=10")
+
+    def test_compare_against_a_baseline(self):
+        def results(p95_ms, throughput_rps, endpoint="GET /menu/"):
+            return {
+                "endpoints": {
+                    endpoint: {
+                        "p50_ms": 10.0,
+                        "p95_ms": p95_ms,
+                        "p99_ms": None,
+                        "throughput_rps": throughput_rps,
+                    }
+                }
+            }
+
+        current = results(30.0, 90.0)
+        current["endpoints"].update(results(5.0, 1.0, "POST /orders/")["endpoints"])
+        changes = loadtest.compare(current, results(20.0, 100.0))
+
+        self.assertEqual(list(changes), ["GET /menu/"])
+        self.assertEqual(
+            changes["GET /menu/"],
+            {"p50_ms": 0.0, "p95_ms": 0.5, "p99_ms": None, "throughput_rps": -0.1},
+        )
+        # A zero baseline has no relative change
+        changes = loadtest.compare(results(30.0, 90.0), results(0.0, 100.0))
+        self.assertIsNone(changes["GET /menu/"]["p95_ms"])
+
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        create_menu_items(2)
+
+    def test_not_sent_to_anonymous_clients(self):
+        self.assertFalse(self.client.get("/menu/").has_header("Server-Timing"))
+
+    def test_sent_to_staff(self):
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+        self.assertIn("total;dur=", self.client.get("/menu/")["Server-Timing"])
+
+    def test_sent_with_a_profile_token(self):
+        response = self.client.get("/menu/", HTTP_X_PROFILE=profiling.make_token())
+        self.assertIn("total;dur=", response["Server-Timing"])
+        # A forged one doesn't count
+        response = self.client.get("/menu/", HTTP_X_PROFILE="sample:forged:token")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_sent_to_everyone_when_enabled(self):
+        self.assertTrue(self.client.get("/menu/").has_header("Server-Timing"))
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        menu_cache.invalidate()
+        self.addCleanup(menu_cache.invalidate)
+        create_menu_items(2)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        profile_dir = override_settings(PROFILER_DIR=self.directory)
+        profile_dir.enable()
+        self.addCleanup(profile_dir.disable)
+
+    def profiled_functions(self, response):
+        stats = pstats.Stats(f"{self.directory}/{response['X-Profile-Id']}")
+        return {(path.rpartition("/")[2], name) for path, _, name in stats.stats}
+
+    def test_profile_covers_the_view_and_its_rendering(self):
+        item = MenuItem.objects.first()
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+        response = self.client.get(
+            f"/menu/{item.pk}/", HTTP_X_PROFILE=profiling.make_token("cprofile")
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("MenuItemViewSet.retrieve", response["X-Profile-Id"])
+        functions = self.profiled_functions(response)
+        self.assertIn(("views.py", "dispatch"), functions)
+        # The handler's wrapping of the view, and DRF rendering the response
+        # after the view returns
+        self.assertIn(("base.py", "make_view_atomic"), functions)
+        self.assertIn(("renderers.py", "render"), functions)
+
+    def test_concurrent_cprofile_requests_are_sampled(self):
+        token = profiling.make_token("cprofile")
+        with profiling._cprofile_lock:
+            response = self.client.get("/menu/", HTTP_X_PROFILE=token)
+        self.assertTrue(response["X-Profile-Id"].endswith(".folded"))
+
+        response = self.client.get("/menu/", HTTP_X_PROFILE=token)
+        self.assertTrue(response["X-Profile-Id"].endswith(".prof"))
+
+    def test_sampled_endpoints(self):
+        with self.settings(PROFILER_ENDPOINTS={"MenuItemViewSet.list": 1.0}):
+            self.client = self.client_class()
+            self.assertTrue(self.client.get("/menu/").has_header("X-Profile-Id"))
+            response = self.client.get("/menu/sizes/")
+            self.assertFalse(response.has_header("X-Profile-Id"))
+
+    def test_sync_views_are_profiled_under_asgi(self):
+        response = async_to_sync(AsyncClient().get)(
+            "/menu/", headers={"X-Profile": profiling.make_token("cprofile")}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(("views.py", "dispatch"), self.profiled_functions(response))
+
+
+class WarmupTests(APITestCase):
+    def setUp(self):
+        menu_cache.invalidate()
+        self.addCleanup(menu_cache.invalidate)
+
+    def test_first_request_served_from_the_warmed_cache(self):
+        create_menu_items(2)
+        timings = warmup.warm_up()
+        self.assertEqual(
+            set(timings), {name for name, _ in warmup.STEPS + warmup.WORKER_STEPS}
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get("/menu/")
+        self.assertEqual(len(response.json()), 2)
+
+    def test_failing_step_is_skipped(self):
+        def fail():
+            raise RuntimeError("no database yet")
+
+        with self.assertLogs("django_project.warmup", "WARNING"):
+            timings = warmup.warm_up([("fail", fail)] + warmup.STEPS)
+        self.assertNotIn("fail", timings)
+        self.assertIn("menu", timings)
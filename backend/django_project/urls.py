@@ -15,13 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework import routers, serializers, viewsets
 from rest_framework.authtoken.views import obtain_auth_token
 
 from backoffice.views import EmployeeViewSet, UserViewSet
 from delivery.views import OrderViewSet
+from django_project.metrics import metrics_view
+from django_project.profiling import profile_token_view
 from menu.views import MenuItemViewSet, SizeViewSet
 
 # Routers provide an easy way of automatically determining the URL conf.
@@ -32,10 +35,27 @@ router.register(r"sizes", SizeViewSet)
 router.register(r"orders", OrderViewSet)
 router.register(r"employees", EmployeeViewSet)  # Add employee endpoints
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_READ_VIEWS:
+    from delivery import async_views as delivery_async
+    from menu import async_views as menu_async
+
+    # Same routes as the router; requests the async views don't serve
+    # themselves are handed on to the viewsets
+    urlpatterns += [
+        path("menu/", menu_async.menu_list_view),
+        path("orders/my-orders/", delivery_async.my_orders_view),
+        re_path(r"^orders/(?P<pk>[0-9]+)/$", delivery_async.order_detail_view),
+        re_path(r"^orders/(?P<pk>[0-9]+)/status/$", delivery_async.order_status_view),
+    ]
+
+urlpatterns += [
     path("", include(router.urls)),
     path("admin/", admin.site.urls),
     path("payments/", include("payments.urls")),
+    path("metrics", metrics_view, name="metrics"),  # Prometheus scrape target
+    path("profiling/token", profile_token_view, name="profile_token"),
     path("api-auth/", include("rest_framework.urls")),
     path(
         "api-token-auth/", obtain_auth_token, name="api_token_auth"
@@ -0,0 +1,125 @@
+"""
+Worker warmup
+
+warm_up() does the work the first requests of a new worker would otherwise
+pay for: it populates the URL resolver (importing every view), builds the
+fields of each view's serializer, connects to the database and fills the
+menu cache, and starts listening for cache invalidations. gunicorn.conf.py
+runs it in each worker before it accepts requests or, when the app is
+preloaded (GUNICORN_PRELOAD=1), runs the STEPS once in the master before
+forking: workers inherit their result and only open their own connections
+(WORKER_STEPS).
+
+A step that fails (e.g. the database is not migrated yet) is logged and
+skipped: the worker then pays for it on the first request instead.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def iter_callbacks(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_callbacks(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Reversing and resolving build these on first use
+    resolver.reverse_dict
+    resolver.app_dict
+    return resolver
+
+
+def warm_serializers():
+    serializer_classes = set()
+    for callback in iter_callbacks(get_resolver().url_patterns):
+        view_class = getattr(callback, "cls", None)
+        serializer_class = getattr(view_class, "serializer_class", None)
+        if serializer_class is not None:
+            serializer_classes.add(serializer_class)
+    for serializer_class in serializer_classes:
+        serializer_class().fields
+    return serializer_classes
+
+
+def warm_imports():
+    # Imported by the middleware when the first request needs them
+    from caching.invalidation import TRANSPORTS
+
+    import_string(settings.SESSION_SERIALIZER)
+    import_string(settings.MESSAGE_STORAGE)
+    import_string(TRANSPORTS[settings.INVALIDATION_TRANSPORT])
+
+
+def warm_menu():
+    # Imported here: the views are only importable once the apps are ready
+    from menu.views import menu_body, menu_cache
+
+    menu_cache.get(menu_body)
+
+
+def warm_database():
+    connections["default"].ensure_connection()
+
+
+def warm_invalidation():
+    from caching.invalidation import bus
+
+    bus.ensure_listening()
+
+
+# Work a forked worker inherits from the master that did it
+STEPS = [
+    ("urls", warm_urls),
+    ("serializers", warm_serializers),
+    ("imports", warm_imports),
+    ("menu", warm_menu),
+]
+
+# Connections and threads, which every worker opens on its own
+WORKER_STEPS = [
+    ("database", warm_database),
+    ("invalidation", warm_invalidation),
+]
+
+
+def warm_up(steps=STEPS + WORKER_STEPS):
+    """Run the warmup ``steps``, returning the seconds each one took"""
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning("Warmup step %s failed", name, exc_info=True)
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info(
+        "Warmed up in %.3fs",
+        sum(timings.values()),
+        extra={"warmup": {name: round(t, 4) for name, t in timings.items()}},
+    )
+    return timings
+
+
+def close_connections():
+    """
+    Close the database connections and pools opened while warming up, so
+    that no forked worker shares them with the master
+    """
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        close_pool = getattr(connection, "close_pool", None)
+        if close_pool is not None:
+            close_pool()
@@ -0,0 +1,60 @@
+# Gunicorn configuration, loaded automatically from the working directory.
+# Command-line flags (e.g. in the Dockerfile CMD) take precedence.
+import gc
+import os
+import shutil
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+# In-process caches (resolved tokens, the menu) must be invalidated in every
+# worker, not only the one that made a change
+if workers > 1:
+    os.environ.setdefault("INVALIDATION_TRANSPORT", "socket")
+# Load the app once in the master and fork workers from it: they start
+# faster and share the imported code (and a warmed local cache) with it
+preload_app = bool(int(os.environ.get("GUNICORN_PRELOAD", 0)))
+
+
+def on_starting(server):
+    # Start every deployment with empty Prometheus multiprocess files
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from django.conf import settings
+    from django_project import warmup
+
+    if settings.WARMUP_ON_START:
+        warmup.warm_up(warmup.STEPS)
+    # Forked workers must not share the master's connections
+    warmup.close_connections()
+    # Keep the collector from writing to (and so copying) every page of the
+    # objects the workers inherit
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+    from django_project import warmup
+
+    # Warm up before accepting requests; a preloaded app was mostly warmed
+    # in the master
+    if settings.WARMUP_ON_START:
+        warmup.warm_up(
+            warmup.WORKER_STEPS
+            if worker.cfg.preload_app
+            else warmup.STEPS + warmup.WORKER_STEPS
+        )
+
+
+def child_exit(server, worker):
+    # Let /metrics drop the gauges of workers that are gone
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
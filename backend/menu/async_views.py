@@ -0,0 +1,18 @@
+from django_project.async_views import async_read_view
+from django_project.compression import precompressed_response
+from menu.views import MenuItemViewSet, menu_body, menu_cache
+
+
+async def menu_list(request):
+    """GET /menu/: the whole menu with its sizes"""
+    return precompressed_response(await menu_cache.aget(menu_body))
+
+
+menu_list_view = async_read_view(
+    menu_list,
+    MenuItemViewSet.as_view(
+        {"get": "list", "post": "create"}, basename="menuitem", detail=False
+    ),
+    "MenuItemViewSet",
+    "list",
+)
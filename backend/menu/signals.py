@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from caching import invalidation
+from caching.policies import invalidate_tags
+
+from .models import MenuItem, Size
+
+
+# Menu caches hold items with their sizes, keyed by the menu item
+@receiver([post_save, post_delete], sender=MenuItem)
+def invalidate_cached_menu_item(sender, instance, **kwargs):
+    invalidation.publish("menu", instance.pk)
+    invalidate_tags(f"menu-item:{instance.pk}")
+
+
+@receiver([post_save, post_delete], sender=Size)
+def invalidate_cached_size(sender, instance, **kwargs):
+    invalidation.publish("menu", instance.menu_item_id)
+    invalidate_tags(f"menu-item:{instance.menu_item_id}")
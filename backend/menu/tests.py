@@ -1,3 +1,167 @@
-from django.test import TestCase
+import gzip
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncRequestFactory
+from rest_framework.test import APITestCase
+
+from django_project import compression
+from django_project.testing import QueryBudgetMixin
+
+from .async_views import menu_list_view
+from .models import MenuItem, Size
+from .views import menu_cache
+
+
+def create_menu_items(count, sizes_per_item=3):
+    """Menu items with a few sizes each, as the CSV upload creates them"""
+    start = MenuItem.objects.count()
+    items = MenuItem.objects.bulk_create(
+        MenuItem(
+            name=f"Item {start + i}",
+            category="Pizzas" if i % 2 else "Drinks",
+            type="food" if i % 2 else "drink",
+            imgAlt=f"Picture of item {start + i}",
+            imgSrc=f"https://example.com/img/{start + i}.png",
+        )
+        for i in range(count)
+    )
+    Size.objects.bulk_create(
+        Size(
+            menu_item=item,
+            order=position,
+            name=["Small", "Medium", "Large", "Family"][position % 4],
+            price=Decimal("5.50") + position,
+            description=f"{item.name} in size {position}",
+        )
+        for item in items
+        for position in range(sizes_per_item)
+    )
+    return items
+
+
+class MenuQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        # Only listing the menu is public
+        self.admin = User.objects.create_superuser("admin", password="admin")
+
+        # Compute the menu on every request so its queries are counted
+        patcher = mock.patch.object(menu_cache, "ttl", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def seed(self, count):
+        create_menu_items(count)
+
+    def test_menu_list(self):
+        self.assertWithinBudget(
+            lambda: self.client.get("/menu/"), queries=2, max_bytes=600, per_row=True
+        )
+
+    def test_menu_retrieve(self):
+        self.authenticate(self.admin)
+        self.seed(1)
+        item = MenuItem.objects.first()
+        self.assertWithinBudget(
+            lambda: self.client.get(f"/menu/{item.pk}/"), queries=2, max_bytes=600
+        )
+
+    def test_sizes_list(self):
+        self.authenticate(self.admin)
+        self.assertWithinBudget(
+            lambda: self.client.get("/sizes/"),
+            queries=1,
+            max_bytes=3 * 120,
+            per_row=True,
+        )
+
+    def test_size_retrieve(self):
+        self.authenticate(self.admin)
+        self.seed(1)
+        size = Size.objects.first()
+        self.assertWithinBudget(
+            lambda: self.client.get(f"/sizes/{size.pk}/"), queries=1, max_bytes=150
+        )
+
+
+class MenuCacheTests(APITestCase):
+    def setUp(self):
+        menu_cache.invalidate()
+        self.addCleanup(menu_cache.invalidate)
+
+    def test_cached_until_an_item_changes(self):
+        item = create_menu_items(2)[0]
+        with self.assertNumQueries(2):
+            self.client.get("/menu/")
+        with self.assertNumQueries(0):
+            self.client.get("/menu/")
+
+        item.name = "Renamed"
+        item.save()
+        with self.assertNumQueries(2):
+            response = self.client.get("/menu/")
+        self.assertIn("Renamed", [row["name"] for row in response.json()])
+
+
+
+
+class MenuCompressionTests(APITestCase):
+    def setUp(self):
+        menu_cache.invalidate()
+        self.addCleanup(menu_cache.invalidate)
+        create_menu_items(10)
+        self.body = self.client.get("/menu/").content
+
+    def get(self, accept_encoding):
+        return self.client.get("/menu/", HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_cached_variants_are_served_without_compressing(self):
+        with mock.patch.object(
+            compression, "compress", wraps=compression.compress
+        ) as compress:
+            response = self.get("gzip")
+            compress.assert_not_called()
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    @unittest.skipIf(compression.brotli is None, "Brotli isn't installed")
+    def test_brotli_preferred(self):
+        response = self.get("gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content), self.body)
+
+    def test_negotiation(self):
+        self.assertEqual(self.get("br;q=0.5, gzip")["Content-Encoding"], "gzip")
+        self.assertEqual(self.get("*")["Content-Encoding"], compression.CODINGS[0])
+        self.assertFalse(self.get("identity").has_header("Content-Encoding"))
+        self.assertFalse(self.get("gzip;q=0").has_header("Content-Encoding"))
+        self.assertEqual(self.get("gzip;q=0").content, self.body)
+
+    def test_small_bodies_are_sent_as_is(self):
+        menu_cache.invalidate()
+        MenuItem.objects.all().delete()
+        response = self.get("gzip")
+        self.assertEqual(response.content, b"[]")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class AsyncMenuListTests(APITestCase):
+    def setUp(self):
+        menu_cache.invalidate()
+        self.addCleanup(menu_cache.invalidate)
+
+    def test_same_as_drf(self):
+        create_menu_items(5)
+        expected = self.client.get("/menu/")
+        response = async_to_sync(menu_list_view)(AsyncRequestFactory().get("/menu/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+
+
 
-# Create your tests here.
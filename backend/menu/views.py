@@ -2,26 +2,54 @@ import csv
 import io
 import json
 
+from caching import invalidation
+from caching.loader import SingleFlightCache
+from caching.policies import CachedViewMixin, CachePolicy
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django_project.compression import PrecompressedBody, precompressed_response
+from django_project.instrumentation import InstrumentedViewMixin, span
 from menu.models import MenuItem, Size
 from menu.permissions import IsAdminOrReadOnly
 from menu.serializers import MenuItemSerializer, SizeSerializer
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+# The JSON body of GET /menu/, dropped whenever an item changes
+menu_cache = SingleFlightCache(
+    "menu", ttl=settings.MENU_CACHE_TTL, stale_ttl=settings.MENU_CACHE_STALE_TTL
+)
+invalidation.subscribe("menu", lambda menu_item_id: menu_cache.invalidate())
+
+
+def menu_data():
+    """The whole menu with its sizes, as GET /menu/ renders it"""
+    items = MenuItem.objects.prefetch_related("sizes")
+    with span("serialize"):
+        return MenuItemSerializer(items, many=True).data
+
+
+def menu_body():
+    """The menu rendered to JSON, with its compressed variants"""
+    return PrecompressedBody(JSONRenderer().render(menu_data()))
+
 
 # Create your views here.
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(CachedViewMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing menu items instances.
     """
 
     serializer_class = MenuItemSerializer
-    queryset = MenuItem.objects.all()
+    queryset = MenuItem.objects.prefetch_related("sizes")
     permission_classes_by_action = {"create": [IsAdminUser], "list": [AllowAny]}
+    cache_policies = {
+        "retrieve": CachePolicy(ttl=settings.MENU_CACHE_TTL, tags=["menu-item:{pk}"]),
+    }
 
     def get_permissions(self):
         try:
@@ -34,6 +62,12 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             # action is not set return default permission_classes
             return [permission() for permission in self.permission_classes]
 
+    def list(self, request, *args, **kwargs):
+        if request.accepted_media_type != JSONRenderer.media_type:
+            # The browsable API, or JSON with renderer parameters
+            return Response(menu_data())
+        return precompressed_response(menu_cache.get(menu_body))
+
     @action(detail=False, methods=["post"], url_path="upload-csv")
     def upload_from_csv(self, request):
         """
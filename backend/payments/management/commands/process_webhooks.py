@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_project.metrics import start_metrics_server
+from payments.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued Stripe webhook events in batches. Runs until "
+        "interrupted unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Events per batch (default: STRIPE_WEBHOOK_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Seconds to sleep when the inbox is empty or events failed "
+            "(default: STRIPE_WEBHOOK_POLL_INTERVAL)",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=None,
+            help="Serve Prometheus metrics on this port, 0 for none "
+            "(default: STRIPE_WEBHOOK_METRICS_PORT)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the inbox once and exit",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or settings.STRIPE_WEBHOOK_POLL_INTERVAL
+        total = 0
+
+        metrics_port = options["metrics_port"]
+        if metrics_port is None:
+            metrics_port = settings.STRIPE_WEBHOOK_METRICS_PORT
+        if metrics_port:
+            start_metrics_server(metrics_port)
+            self.stdout.write(f"Serving metrics on port {metrics_port}")
+
+        try:
+            while True:
+                close_old_connections()
+                processed, failed = process_pending_events(options["batch_size"])
+                total += processed
+
+                if processed:
+                    self.stdout.write(f"Processed {processed} events")
+                if failed:
+                    # Back off rather than spend the events' attempts at once
+                    self.stderr.write(f"{failed} events failed")
+                elif processed:
+                    continue
+                if options["once"]:
+                    break
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} events in total"))
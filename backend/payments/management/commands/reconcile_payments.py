@@ -0,0 +1,80 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payments.reconciliation import reconcile_payment_intents
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile PaymentIntent and Order rows with the payment provider: "
+        "fix status mismatches, mark orders with succeeded payments as paid, "
+        "fill missing transaction ids and report what was found."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Only reconcile intents created in the last N days (default: all)",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Provider page size (max 100)",
+        )
+        parser.add_argument(
+            "--stuck-after-minutes",
+            type=int,
+            default=60,
+            help="Report local intents still in progress after this long",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report mismatches without writing anything",
+        )
+        parser.add_argument("--report", help="Also write the report as JSON here")
+
+    def handle(self, *args, **options):
+        if not 1 <= options["page_size"] <= 100:
+            raise CommandError("--page-size must be between 1 and 100.")
+
+        since = None
+        if options["days"]:
+            since = timezone.now() - timedelta(days=options["days"])
+
+        started = time.perf_counter()
+        try:
+            report = reconcile_payment_intents(
+                since=since,
+                page_size=options["page_size"],
+                dry_run=options["dry_run"],
+                stuck_after=timedelta(minutes=options["stuck_after_minutes"]),
+            )
+        except Exception as e:
+            raise CommandError(f"Reconciliation failed: {e}")
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+
+        if options["report"]:
+            with open(options["report"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(f"Provider intents seen:      {report['provider_seen']}")
+        self.stdout.write(f"Pages fetched:              {report['pages']}")
+        self.stdout.write(f"Missing locally:            {report['missing_locally']}")
+        for status, count in sorted(report["status_mismatches"].items()):
+            self.stdout.write(f"Status mismatch -> {status:<15} {count}")
+        self.stdout.write(f"Orders marked paid:         {report['orders_marked_paid']}")
+        self.stdout.write(
+            f"Order transaction ids set:  {report['orders_transaction_filled']}"
+        )
+        self.stdout.write(f"Stuck locally:              {report['stuck_locally']}")
+
+        verb = "Checked" if options["dry_run"] else "Reconciled"
+        self.stdout.write(self.style.SUCCESS(f"{verb} in {report['elapsed_seconds']}s"))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from payments.standin import StripeStandin, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Stripe API stand-in for offline development and "
+        "benchmarking. Start the backend with "
+        "STRIPE_API_BASE=http://<host>:<port> to use it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=0,
+            help="Artificial latency added to every response",
+        )
+        parser.add_argument(
+            "--decline-rate",
+            type=float,
+            default=0,
+            help="Fraction of payment intent confirmations to decline (0-1)",
+        )
+        parser.add_argument(
+            "--seed-payment-intents",
+            type=int,
+            default=0,
+            help="Pre-populate this many payment intents (for reconciliation runs)",
+        )
+        parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    def handle(self, *args, **options):
+        standin = StripeStandin(
+            latency=options["latency_ms"] / 1000,
+            decline_rate=options["decline_rate"],
+        )
+        if options["seed_payment_intents"]:
+            standin.seed_payment_intents(
+                options["seed_payment_intents"],
+                statuses=[
+                    "succeeded",
+                    "succeeded",
+                    "succeeded",
+                    "requires_payment_method",
+                    "canceled",
+                ],
+            )
+        server = make_server(
+            options["host"], options["port"], standin, verbose=options["verbose"]
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stripe stand-in listening on "
+                f"http://{options['host']}:{options['port']}"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
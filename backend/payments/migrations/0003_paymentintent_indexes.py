@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0006_alter_order_status_length'),
+        ('payments', '0002_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentintent',
+            index=models.Index(fields=['status', 'created_at'], name='paymentintent_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentintent',
+            index=models.Index(fields=['created_at'], name='paymentintent_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_paymentintent_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentintent',
+            name='last_event_created',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -17,9 +17,20 @@ class PaymentIntent(models.Model):
     currency = models.CharField(max_length=3, default="usd")
     status = models.CharField(max_length=50)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True)
+    # ``created`` (Unix time) of the newest webhook event applied to it
+    last_event_created = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Stuck-payment lookups (status, age) and date-bounded scans
+            models.Index(
+                fields=["status", "created_at"], name="paymentintent_status_idx"
+            ),
+            models.Index(fields=["created_at"], name="paymentintent_created_idx"),
+        ]
+
 
 class PaymentMethod(models.Model):
     customer = models.ForeignKey(StripeCustomer, on_delete=models.CASCADE)
@@ -27,3 +38,36 @@ class PaymentMethod(models.Model):
     type = models.CharField(max_length=50)  # card, etc.
     is_default = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of verified Stripe webhook events, processed in batches by the
+    process_webhooks worker
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for the oldest pending events
+            models.Index(
+                fields=["status", "received_at"], name="webhook_status_received_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
@@ -0,0 +1,165 @@
+"""
+Reconcile local PaymentIntent/Order rows against the payment provider
+
+Provider payment intents are paged through 100 at a time. Each page is
+matched against local rows with one IN query and mismatches are fixed with
+one UPDATE per target status, so the cost grows with the number of pages,
+not with rows times queries.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from delivery.models import Order
+from delivery.signals import invalidate_cached_orders
+
+from .models import PaymentIntent
+from .services.stripe_service import StripeService
+from .webhooks import PAYMENT_INTENT_TRANSITIONS
+
+# Provider statuses that still expect customer or provider action
+IN_PROGRESS_STATUSES = [
+    "requires_payment_method",
+    "requires_confirmation",
+    "requires_action",
+    "requires_capture",
+    "processing",
+]
+
+# Orders linked to a succeeded intent get the same status the webhook sets
+ORDER_STATUS_FOR_SUCCEEDED = PAYMENT_INTENT_TRANSITIONS["payment_intent.succeeded"][1]
+UNPAID_ORDER_STATUSES = ["pending", "payment_failed"]
+
+
+def iter_provider_pages(created_gte=None, page_size=100):
+    """
+    Yield pages of provider payment intents, fetching the next page while the
+    caller works on the current one
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(
+            StripeService.list_payment_intents, page_size, None, created_gte
+        )
+        while future is not None:
+            page = future.result()
+            future = None
+            if page["has_more"] and page["data"]:
+                future = executor.submit(
+                    StripeService.list_payment_intents,
+                    page_size,
+                    page["data"][-1]["id"],
+                    created_gte,
+                )
+            yield page["data"]
+
+
+def reconcile_page(remote_intents, report, dry_run=False):
+    remote_status = {intent["id"]: intent["status"] for intent in remote_intents}
+
+    local = dict(
+        PaymentIntent.objects.filter(
+            stripe_payment_intent_id__in=remote_status.keys()
+        ).values_list("stripe_payment_intent_id", "status")
+    )
+
+    report["provider_seen"] += len(remote_status)
+    missing = [intent_id for intent_id in remote_status if intent_id not in local]
+    report["missing_locally"] += len(missing)
+    report["missing_sample"].extend(missing[: 20 - len(report["missing_sample"])])
+
+    # Group status fixes so every target status costs one UPDATE
+    fixes = {}
+    for intent_id, status in local.items():
+        if remote_status[intent_id] != status:
+            fixes.setdefault(remote_status[intent_id], []).append(intent_id)
+
+    for status, intent_ids in fixes.items():
+        report["status_mismatches"][status] = report["status_mismatches"].get(
+            status, 0
+        ) + len(intent_ids)
+
+    succeeded = [
+        intent_id for intent_id in local if remote_status[intent_id] == "succeeded"
+    ]
+    unpaid_orders = Order.objects.filter(
+        paymentintent__stripe_payment_intent_id__in=succeeded,
+        status__in=UNPAID_ORDER_STATUSES,
+    )
+    orders_without_transaction = Order.objects.filter(
+        Q(transaction_id__isnull=True) | Q(transaction_id=""),
+        paymentintent__stripe_payment_intent_id__in=succeeded,
+    )
+
+    if dry_run:
+        report["orders_marked_paid"] += unpaid_orders.count()
+        report["orders_transaction_filled"] += orders_without_transaction.count()
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        for status, intent_ids in fixes.items():
+            PaymentIntent.objects.filter(
+                stripe_payment_intent_id__in=intent_ids
+            ).update(status=status, updated_at=now)
+
+        if succeeded:
+            report["orders_marked_paid"] += unpaid_orders.update(
+                status=ORDER_STATUS_FOR_SUCCEEDED, last_updated=now
+            )
+            report["orders_transaction_filled"] += orders_without_transaction.update(
+                transaction_id=Subquery(
+                    PaymentIntent.objects.filter(
+                        order=OuterRef("pk"), status="succeeded"
+                    ).values("stripe_payment_intent_id")[:1]
+                ),
+                last_updated=now,
+            )
+            # Bulk updates send no signals
+            invalidate_cached_orders(
+                *Order.objects.filter(
+                    paymentintent__stripe_payment_intent_id__in=succeeded
+                ).values_list("pk", flat=True)
+            )
+
+
+def reconcile_payment_intents(
+    since=None, page_size=100, dry_run=False, stuck_after=None
+):
+    """
+    Reconcile provider payment intents created at or after ``since``
+
+    Returns a report dictionary with counts of what was seen and fixed.
+    """
+    report = {
+        "dry_run": dry_run,
+        "provider_seen": 0,
+        "pages": 0,
+        "missing_locally": 0,
+        "missing_sample": [],
+        "status_mismatches": {},
+        "orders_marked_paid": 0,
+        "orders_transaction_filled": 0,
+    }
+
+    created_gte = int(since.timestamp()) if since else None
+    for page in iter_provider_pages(created_gte, page_size):
+        report["pages"] += 1
+        if page:
+            reconcile_page(page, report, dry_run=dry_run)
+
+    # Local intents that never reached a final status (served by
+    # paymentintent_status_idx instead of a full scan)
+    stuck_after = stuck_after or timedelta(hours=1)
+    stuck = PaymentIntent.objects.filter(
+        status__in=IN_PROGRESS_STATUSES,
+        created_at__lt=timezone.now() - stuck_after,
+    )
+    if since:
+        stuck = stuck.filter(created_at__gte=since)
+    report["stuck_locally"] = stuck.count()
+
+    return report
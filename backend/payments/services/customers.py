@@ -0,0 +1,104 @@
+# services/customers.py
+"""
+Resolve a user's Stripe customer without a Stripe round-trip when possible
+
+The mapping user -> (StripeCustomer pk, stripe_customer_id) is cached per
+worker. Stripe is only contacted when the user has no local StripeCustomer
+row. Concurrent requests for one user in a worker wait for a single
+creation, without holding up other users meanwhile. A deterministic
+idempotency key means racing workers get the same remote customer back; it
+is prefixed per environment (STRIPE_IDEMPOTENCY_KEY_PREFIX, by default a
+digest of the database's location) so that environments sharing a Stripe
+account don't get each other's customers for the same user id.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from caching import invalidation
+from caching.local import TTLCache
+
+from ..models import StripeCustomer
+from .stripe_service import StripeService
+
+customer_cache = TTLCache(
+    maxsize=getattr(settings, "STRIPE_CUSTOMER_CACHE_MAXSIZE", 10000),
+    ttl=getattr(settings, "STRIPE_CUSTOMER_CACHE_TTL", 3600),
+    name="stripe_customer",
+)
+
+# User id -> Event set once the thread creating its customer is done
+_creating = {}
+_creating_lock = threading.Lock()
+
+
+def idempotency_key(user_id):
+    prefix = getattr(settings, "STRIPE_IDEMPOTENCY_KEY_PREFIX", "")
+    if not prefix:
+        database = connections[DEFAULT_DB_ALIAS].settings_dict
+        location = f"{database['HOST']}:{database['PORT']}/{database['NAME']}"
+        prefix = hashlib.sha256(location.encode()).hexdigest()[:12] + "-"
+    return f"{prefix}stripe-customer-user-{user_id}"
+
+
+def _lookup(user_id):
+    return (
+        StripeCustomer.objects.filter(user_id=user_id)
+        .values_list("pk", "stripe_customer_id")
+        .first()
+    )
+
+
+def resolve_stripe_customer(user):
+    """
+    Return (StripeCustomer pk, stripe_customer_id) for ``user``, creating the
+    Stripe customer and the local row only if they don't exist yet
+    """
+    if user.pk is None:
+        raise ValueError("Can't resolve the Stripe customer of an unsaved user")
+
+    while True:
+        resolved = customer_cache.get(user.pk)
+        if resolved is not None:
+            return resolved
+
+        with _creating_lock:
+            done = _creating.get(user.pk)
+            if done is None:
+                done = _creating[user.pk] = threading.Event()
+                break
+        # Another thread is resolving it; if it failed, try again ourselves
+        done.wait()
+
+    try:
+        resolved = _lookup(user.pk)
+        if resolved is None:
+            stripe_customer_id = StripeService.create_customer(
+                user, idempotency_key=idempotency_key(user.pk)
+            )
+            try:
+                with transaction.atomic():
+                    customer = StripeCustomer.objects.create(
+                        user=user, stripe_customer_id=stripe_customer_id
+                    )
+                resolved = (customer.pk, customer.stripe_customer_id)
+            except IntegrityError:
+                # Another worker created the row first
+                resolved = _lookup(user.pk)
+
+        customer_cache.set(user.pk, resolved)
+        return resolved
+    finally:
+        with _creating_lock:
+            del _creating[user.pk]
+        done.set()
+
+
+def forget_stripe_customer(user_id):
+    customer_cache.invalidate(user_id)
+
+
+invalidation.subscribe("stripe_customer", forget_stripe_customer)
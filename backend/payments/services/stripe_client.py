@@ -0,0 +1,150 @@
+# services/stripe_client.py
+"""
+Shared, pooled Stripe client
+
+Every StripeService call goes through one StripeClient per worker process.
+It talks HTTP through a requests.Session with keep-alive connection pooling
+and explicit connect/read timeouts. The SDK retries failed calls a bounded
+number of times and sends the same Idempotency-Key on every attempt. Each
+call's latency is recorded in ``call_stats`` and, for measured requests, in
+the "payment" span of their Server-Timing. The SDK itself is only imported
+by the first call.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from django_project.instrumentation import span
+from django_project.lazy import LazyModule
+from django_project.metrics import STRIPE_LATENCY
+
+# Imported by the first Stripe call rather than by every worker at startup
+stripe = LazyModule("stripe")
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def build_http_client():
+    """requests-based HTTP client with a bounded keep-alive pool and timeouts"""
+    pool_size = settings.STRIPE_HTTP_POOL_MAXSIZE
+
+    session = requests.Session()
+    # Retries are left to the SDK, which reuses the idempotency key
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=False
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+
+
+def get_client():
+    """Return this process's StripeClient, creating it on first use"""
+    global _client, _client_pid
+
+    # Pooled sockets must not be shared across a fork, so key on the pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            base_addresses = {}
+            if settings.STRIPE_API_BASE:
+                base_addresses["api"] = settings.STRIPE_API_BASE
+
+            _client = stripe.StripeClient(
+                settings.STRIPE_SECRET_KEY,
+                base_addresses=base_addresses,
+                max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+                http_client=build_http_client(),
+            )
+            _client_pid = pid
+
+    return _client
+
+
+def reset_client():
+    """Drop the cached client, e.g. after changing settings in tests"""
+    global _client, _client_pid
+
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+
+class CallStats:
+    """Per-operation latency and error counters for Stripe calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, operation, seconds, error=False):
+        with self._lock:
+            stats = self._stats.setdefault(
+                operation,
+                {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            )
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if error:
+                stats["errors"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                operation: {
+                    **stats,
+                    "avg_seconds": stats["total_seconds"] / stats["count"],
+                }
+                for operation, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+call_stats = CallStats()
+
+
+@contextmanager
+def timed_call(operation):
+    """Record how long a Stripe call took and whether it failed"""
+    started = time.perf_counter()
+    error = False
+    try:
+        with span("payment"):
+            yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        call_stats.record(operation, elapsed, error)
+        STRIPE_LATENCY.labels(operation, str(error).lower()).observe(elapsed)
+        logger.info(
+            "stripe call",
+            extra={
+                "stripe_operation": operation,
+                "duration_ms": round(elapsed * 1000, 2),
+                "error": error,
+            },
+        )
@@ -1,28 +1,39 @@
 # services/stripe_service.py
-import stripe
-from django.conf import settings
 from django.contrib.auth.models import User
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from .stripe_client import get_client, stripe, timed_call
+
+
+def _request_options(idempotency_key=None):
+    # Without an explicit key the SDK generates one per call and reuses it on
+    # every retry, so a retried POST never creates a second object
+    return {"idempotency_key": idempotency_key} if idempotency_key else {}
 
 
 class StripeService:
     @staticmethod
-    def create_customer(user: User) -> str:
+    def create_customer(user: User, idempotency_key: str = None) -> str:
         """Create a Stripe customer for a user"""
         try:
-            customer = stripe.Customer.create(
-                email=user.email,
-                name=f"{user.first_name} {user.last_name}",
-                metadata={"user_id": user.id},
-            )
+            with timed_call("customers.create"):
+                customer = get_client().v1.customers.create(
+                    params={
+                        "email": user.email,
+                        "name": f"{user.first_name} {user.last_name}",
+                        "metadata": {"user_id": user.id},
+                    },
+                    options=_request_options(idempotency_key),
+                )
             return customer.id
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
 
     @staticmethod
     def create_payment_intent(
-        amount: int, currency: str = "usd", customer_id: str = None
+        amount: int,
+        currency: str = "usd",
+        customer_id: str = None,
+        idempotency_key: str = None,
     ) -> dict:
         """Create a PaymentIntent for one-time payment"""
         try:
@@ -38,41 +49,83 @@ class StripeService:
             if customer_id:
                 intent_data["customer"] = customer_id
 
-            intent = stripe.PaymentIntent.create(**intent_data)
+            with timed_call("payment_intents.create"):
+                intent = get_client().v1.payment_intents.create(
+                    params=intent_data, options=_request_options(idempotency_key)
+                )
 
             return {
                 "client_secret": intent.client_secret,
                 "id": intent.id,
                 "status": intent.status,
             }
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
 
     @staticmethod
-    def create_setup_intent(customer_id: str) -> dict:
+    def create_setup_intent(customer_id: str, idempotency_key: str = None) -> dict:
         """Create a SetupIntent for saving payment method"""
         try:
-            setup_intent = stripe.SetupIntent.create(
-                customer=customer_id,
-                payment_method_types=["card"],
-            )
+            with timed_call("setup_intents.create"):
+                setup_intent = get_client().v1.setup_intents.create(
+                    params={
+                        "customer": customer_id,
+                        "payment_method_types": ["card"],
+                    },
+                    options=_request_options(idempotency_key),
+                )
             return {"client_secret": setup_intent.client_secret, "id": setup_intent.id}
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
 
     @staticmethod
-    def confirm_payment_intent(payment_intent_id: str) -> dict:
+    def confirm_payment_intent(
+        payment_intent_id: str, idempotency_key: str = None
+    ) -> dict:
         """Confirm a PaymentIntent"""
         try:
-            intent = stripe.PaymentIntent.confirm(payment_intent_id)
+            with timed_call("payment_intents.confirm"):
+                intent = get_client().v1.payment_intents.confirm(
+                    payment_intent_id, options=_request_options(idempotency_key)
+                )
             return {"status": intent.status, "id": intent.id}
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
 
     @staticmethod
     def retrieve_payment_intent(payment_intent_id: str) -> dict:
         """Retrieve a PaymentIntent"""
         try:
-            return stripe.PaymentIntent.retrieve(payment_intent_id)
-        except stripe.error.StripeError as e:
+            with timed_call("payment_intents.retrieve"):
+                return get_client().v1.payment_intents.retrieve(payment_intent_id)
+        except stripe.StripeError as e:
+            raise Exception(f"Stripe error: {str(e)}")
+
+    @staticmethod
+    def list_payment_intents(
+        limit: int = 100, starting_after: str = None, created_gte: int = None
+    ) -> dict:
+        """List PaymentIntents newest first, one page at a time"""
+        params = {"limit": limit}
+        if starting_after:
+            params["starting_after"] = starting_after
+        if created_gte:
+            params["created"] = {"gte": created_gte}
+
+        try:
+            with timed_call("payment_intents.list"):
+                page = get_client().v1.payment_intents.list(params=params)
+            return {
+                "data": [
+                    {
+                        "id": intent.id,
+                        "status": intent.status,
+                        "amount": intent.amount,
+                        "created": intent.created,
+                    }
+                    for intent in page.data
+                ],
+                "has_more": page.has_more,
+            }
+        except stripe.StripeError as e:
             raise Exception(f"Stripe error: {str(e)}")
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from caching import invalidation
+
+from .models import StripeCustomer
+
+
+@receiver([post_save, post_delete], sender=StripeCustomer)
+def invalidate_cached_stripe_customer(sender, instance, **kwargs):
+    invalidation.publish("stripe_customer", instance.user_id)
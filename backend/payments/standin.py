@@ -0,0 +1,268 @@
+"""
+Local stand-in for the subset of the Stripe API that StripeService uses
+
+Point STRIPE_API_BASE at a running stand-in (see the stripe_standin management
+command) to exercise and benchmark the payment endpoints offline. Objects live
+in memory, responses follow Stripe's JSON shapes and POSTs honour the
+Idempotency-Key header the SDK sends.
+"""
+
+import json
+import re
+import secrets
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _unflatten(pairs):
+    """Turn form keys like metadata[user_id] into nested dictionaries"""
+    data = {}
+    for key, value in pairs:
+        parts = re.findall(r"[^\[\]]+", key)
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return data
+
+
+class StripeStandin:
+    """In-memory store behind the stand-in HTTP server"""
+
+    def __init__(self, latency=0.0, decline_rate=0.0):
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.customers = {}
+        self.setup_intents = {}
+        self.payment_intents = {}
+        # Insertion order doubles as creation order for list pagination
+        self._payment_intent_ids = []
+        self._payment_intent_positions = {}
+        self._idempotent_responses = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id(prefix):
+        return f"{prefix}_{secrets.token_hex(12)}"
+
+    def create_customer(self, params):
+        customer = {
+            "id": self.new_id("cus"),
+            "object": "customer",
+            "email": params.get("email"),
+            "name": params.get("name"),
+            "metadata": params.get("metadata", {}),
+            "created": int(time.time()),
+        }
+        self.customers[customer["id"]] = customer
+        return 200, customer
+
+    def create_payment_intent(self, params, status="requires_payment_method"):
+        intent_id = self.new_id("pi")
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params.get("amount", 0)),
+            "currency": params.get("currency", "usd"),
+            "customer": params.get("customer"),
+            "status": status,
+            "client_secret": f"{intent_id}_secret_{secrets.token_hex(8)}",
+            "metadata": params.get("metadata", {}),
+            "created": int(params.get("created") or time.time()),
+        }
+        self.payment_intents[intent_id] = intent
+        self._payment_intent_positions[intent_id] = len(self._payment_intent_ids)
+        self._payment_intent_ids.append(intent_id)
+        return 200, intent
+
+    def seed_payment_intents(self, count, statuses, days=30):
+        """Create ``count`` intents spread over the last ``days`` days, oldest first"""
+        now = int(time.time())
+        span = days * 86400
+        for i in range(count):
+            self.create_payment_intent(
+                {
+                    "amount": 100 + secrets.randbelow(10000),
+                    "currency": "usd",
+                    "created": now - span + (span * i) // max(count, 1),
+                },
+                status=statuses[secrets.randbelow(len(statuses))],
+            )
+
+    def confirm_payment_intent(self, intent_id):
+        intent = self.payment_intents.get(intent_id)
+        if intent is None:
+            return self.not_found("payment_intent", intent_id)
+
+        declined = self.decline_rate and secrets.randbelow(10000) < (
+            self.decline_rate * 10000
+        )
+        intent["status"] = "requires_payment_method" if declined else "succeeded"
+        return 200, intent
+
+    def retrieve_payment_intent(self, intent_id):
+        intent = self.payment_intents.get(intent_id)
+        if intent is None:
+            return self.not_found("payment_intent", intent_id)
+        return 200, intent
+
+    def list_payment_intents(self, params):
+        """Newest first, paginated with limit/starting_after like Stripe"""
+        limit = min(int(params.get("limit", 10)), 100)
+        created = params.get("created", {})
+        created_gte = int(created.get("gte", 0)) if isinstance(created, dict) else 0
+        starting_after = params.get("starting_after")
+
+        ids = self._payment_intent_ids
+        position = len(ids) - 1
+        if starting_after:
+            if starting_after not in self._payment_intent_positions:
+                return self.not_found("payment_intent", starting_after)
+            position = self._payment_intent_positions[starting_after] - 1
+
+        data = []
+        while position >= 0 and len(data) < limit + 1:
+            intent = self.payment_intents[ids[position]]
+            if intent["created"] >= created_gte:
+                data.append(intent)
+            position -= 1
+
+        return 200, {
+            "object": "list",
+            "url": "/v1/payment_intents",
+            "has_more": len(data) > limit,
+            "data": data[:limit],
+        }
+
+    def create_setup_intent(self, params):
+        intent_id = self.new_id("seti")
+        setup_intent = {
+            "id": intent_id,
+            "object": "setup_intent",
+            "customer": params.get("customer"),
+            "status": "requires_payment_method",
+            "client_secret": f"{intent_id}_secret_{secrets.token_hex(8)}",
+            "created": int(time.time()),
+        }
+        self.setup_intents[intent_id] = setup_intent
+        return 200, setup_intent
+
+    @staticmethod
+    def not_found(kind, object_id):
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "code": "resource_missing",
+                "message": f"No such {kind}: '{object_id}'",
+            }
+        }
+
+    def dispatch(self, method, path, params, idempotency_key=None):
+        if method == "POST" and idempotency_key:
+            with self._lock:
+                cached = self._idempotent_responses.get(idempotency_key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            response = self._route(method, path, params)
+            if method == "POST" and idempotency_key:
+                self._idempotent_responses[idempotency_key] = response
+
+        return response
+
+    def _route(self, method, path, params):
+        match = re.fullmatch(r"/v1/payment_intents/([^/]+)(/confirm)?", path)
+
+        if method == "POST" and path == "/v1/customers":
+            return self.create_customer(params)
+        if method == "POST" and path == "/v1/payment_intents":
+            return self.create_payment_intent(params)
+        if method == "GET" and path == "/v1/payment_intents":
+            return self.list_payment_intents(params)
+        if method == "POST" and path == "/v1/setup_intents":
+            return self.create_setup_intent(params)
+        if match and method == "POST" and match.group(2):
+            return self.confirm_payment_intent(match.group(1))
+        if match and method == "GET" and not match.group(2):
+            return self.retrieve_payment_intent(match.group(1))
+
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "message": f"Unrecognized request URL ({method}: {path})",
+            }
+        }
+
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the pooled client's connection reuse is measurable
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without TCP_NODELAY
+        # delayed ACKs would add ~40ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        self.handle_api_request("GET")
+
+    def do_POST(self):
+        self.handle_api_request("POST")
+
+    def handle_api_request(self, method):
+        standin = self.server.standin
+        url = urlsplit(self.path)
+
+        if not self.headers.get("Authorization"):
+            return self.send_json(
+                401,
+                {
+                    "error": {
+                        "type": "invalid_request_error",
+                        "message": "You did not provide an API key.",
+                    }
+                },
+            )
+
+        pairs = parse_qsl(url.query)
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode("utf-8") if length else ""
+            pairs += parse_qsl(body)
+
+        if standin.latency:
+            time.sleep(standin.latency)
+
+        status, payload = standin.dispatch(
+            method,
+            url.path,
+            _unflatten(pairs),
+            idempotency_key=self.headers.get("Idempotency-Key"),
+        )
+        self.send_json(status, payload)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Request-Id", f"req_{secrets.token_hex(7)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=12111, standin=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), StandinRequestHandler)
+    server.daemon_threads = True
+    server.standin = standin or StripeStandin()
+    server.verbose = verbose
+    return server
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import io
+import threading
+import urllib.request
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from delivery.models import Customer, Order
+from delivery.tests import create_orders
+from django_project import instrumentation
+from django_project.lazy import LazyModule
+from django_project.metrics import PAYMENTS, start_metrics_server
+
+from .models import PaymentIntent, StripeCustomer, WebhookEvent
+from .reconciliation import reconcile_payment_intents
+from .services import customers, stripe_client
+from .services.customers import customer_cache, resolve_stripe_customer
+from .services.stripe_client import timed_call
+from .services.stripe_service import StripeService
+from .standin import StripeStandin, make_server
+from .webhooks import process_pending_events
+
+
+class LazyStripeTests(SimpleTestCase):
+    def test_imported_on_first_attribute(self):
+        module = LazyModule("json")
+        self.assertIn("not loaded", repr(module))
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertIn("(loaded)", repr(module))
+
+    def test_stripe_client_binds_the_sdk_lazily(self):
+        self.assertIsInstance(stripe_client.stripe, LazyModule)
+
+
+class StripeTimingTests(SimpleTestCase):
+    def test_calls_are_timed_in_the_payment_span(self):
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation._current.set(metrics)
+        self.addCleanup(instrumentation._current.reset, token)
+
+        with self.assertLogs("payments.services.stripe_client"):
+            with timed_call("customers.create"):
+                pass
+            with self.assertRaises(TimeoutError):
+                with timed_call("payment_intents.create"):
+                    raise TimeoutError
+
+        self.assertEqual(list(metrics.spans), ["payment"])
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test_standin", STRIPE_MAX_NETWORK_RETRIES=0)
+class StripeServiceTests(SimpleTestCase):
+    def setUp(self):
+        self.standin = StripeStandin()
+        server = make_server(port=0, standin=self.standin)
+        self.connections = 0
+        process_request = server.process_request
+
+        def count_connections(request, client_address):
+            self.connections += 1
+            process_request(request, client_address)
+
+        server.process_request = count_connections
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        settings = self.settings(
+            STRIPE_API_BASE=f"http://127.0.0.1:{server.server_port}"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        stripe_client.reset_client()
+        self.addCleanup(stripe_client.reset_client)
+        stripe_client.call_stats.reset()
+        self.addCleanup(stripe_client.call_stats.reset)
+
+    def test_calls_share_a_pooled_connection(self):
+        with self.assertLogs("payments.services.stripe_client"):
+            intent = StripeService.create_payment_intent(1000, customer_id="cus_1")
+            confirmed = StripeService.confirm_payment_intent(intent["id"])
+            retrieved = StripeService.retrieve_payment_intent(intent["id"])
+
+        self.assertEqual(confirmed, {"status": "succeeded", "id": intent["id"]})
+        self.assertEqual(retrieved.status, "succeeded")
+        self.assertEqual(self.connections, 1)
+        stats = stripe_client.call_stats.snapshot()
+        self.assertEqual(stats["payment_intents.create"]["count"], 1)
+        self.assertEqual(stats["payment_intents.retrieve"]["errors"], 0)
+
+    def test_retried_creations_reuse_the_idempotency_key(self):
+        with self.assertLogs("payments.services.stripe_client"):
+            first = StripeService.create_setup_intent("cus_1", idempotency_key="k1")
+            again = StripeService.create_setup_intent("cus_1", idempotency_key="k1")
+            other = StripeService.create_setup_intent("cus_1")
+
+        self.assertEqual(again, first)
+        self.assertNotEqual(other["id"], first["id"])
+        self.assertEqual(len(self.standin.setup_intents), 2)
+
+    def test_errors_are_counted(self):
+        with self.assertLogs("payments.services.stripe_client"):
+            with self.assertRaisesMessage(Exception, "Stripe error"):
+                StripeService.retrieve_payment_intent("pi_missing")
+
+        stats = stripe_client.call_stats.snapshot()["payment_intents.retrieve"]
+        self.assertEqual((stats["count"], stats["errors"]), (1, 1))
+
+    def test_one_client_per_process(self):
+        client = stripe_client.get_client()
+        self.assertIs(stripe_client.get_client(), client)
+        with mock.patch("os.getpid", return_value=-1):
+            self.assertIsNot(stripe_client.get_client(), client)
+
+
+def intent_event(event_id, event_type, intent_id, created):
+    return WebhookEvent.objects.create(
+        event_id=event_id,
+        type=event_type,
+        payload={"created": created, "data": {"object": {"id": intent_id}}},
+    )
+
+
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        customer = StripeCustomer.objects.create(
+            user=User.objects.create(username="ana"), stripe_customer_id="cus_1"
+        )
+        self.orders = create_orders(2, Customer.objects.create(), [])
+        for n, order in enumerate(self.orders, start=1):
+            PaymentIntent.objects.create(
+                customer=customer,
+                stripe_payment_intent_id=f"pi_{n}",
+                amount=Decimal("10.00"),
+                status="requires_payment_method",
+                order=order,
+            )
+
+    def assertPayment(self, intent_id, intent_status, order_status):
+        intent = PaymentIntent.objects.select_related("order").get(
+            stripe_payment_intent_id=intent_id
+        )
+        self.assertEqual(
+            (intent.status, intent.order.status), (intent_status, order_status)
+        )
+
+    def test_newest_event_in_a_batch_wins(self):
+        intent_event("evt_2", "payment_intent.succeeded", "pi_1", 200)
+        intent_event("evt_1", "payment_intent.payment_failed", "pi_1", 100)
+
+        self.assertEqual(process_pending_events(), (2, 0))
+        self.assertPayment("pi_1", "succeeded", "paid")
+
+    def test_older_event_in_a_later_batch_is_ignored(self):
+        intent_event("evt_2", "payment_intent.succeeded", "pi_1", 200)
+        process_pending_events()
+        # A late redelivery of an earlier failure
+        intent_event("evt_1", "payment_intent.payment_failed", "pi_1", 100)
+
+        self.assertEqual(process_pending_events(), (1, 0))
+        self.assertPayment("pi_1", "succeeded", "paid")
+        self.assertEqual(
+            PaymentIntent.objects.get(
+                stripe_payment_intent_id="pi_1"
+            ).last_event_created,
+            200,
+        )
+
+    def test_success_wins_a_same_second_tie(self):
+        intent_event("evt_2", "payment_intent.succeeded", "pi_1", 100)
+        intent_event("evt_1", "payment_intent.payment_failed", "pi_1", 100)
+        process_pending_events()
+        self.assertPayment("pi_1", "succeeded", "paid")
+
+        # The same tie split across batches, in either order
+        intent_event("evt_3", "payment_intent.payment_failed", "pi_2", 100)
+        process_pending_events()
+        intent_event("evt_4", "payment_intent.succeeded", "pi_2", 100)
+        process_pending_events()
+        self.assertPayment("pi_2", "succeeded", "paid")
+
+        intent_event("evt_5", "payment_intent.payment_failed", "pi_2", 100)
+        process_pending_events()
+        self.assertPayment("pi_2", "succeeded", "paid")
+
+    def test_only_the_failing_event_uses_an_attempt(self):
+        intent_event("evt_1", "payment_intent.succeeded", "pi_1", 100)
+        bad = WebhookEvent.objects.create(
+            event_id="evt_bad", type="payment_intent.succeeded", payload={}
+        )
+        intent_event("evt_2", "payment_intent.payment_failed", "pi_2", 100)
+
+        with self.assertLogs("payments.webhooks", "ERROR"):
+            self.assertEqual(process_pending_events(), (2, 1))
+
+        self.assertPayment("pi_1", "succeeded", "paid")
+        self.assertPayment("pi_2", "failed", "payment_failed")
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ("pending", 1))
+        self.assertIn("data", bad.last_error)
+
+    def test_parked_after_the_last_attempt(self):
+        bad = WebhookEvent.objects.create(
+            event_id="evt_bad", type="payment_intent.succeeded", payload={}
+        )
+        with self.settings(STRIPE_WEBHOOK_MAX_ATTEMPTS=2), self.assertLogs(
+            "payments.webhooks", "ERROR"
+        ):
+            self.assertEqual(process_pending_events(), (0, 1))
+            self.assertEqual(process_pending_events(), (0, 1))
+            self.assertEqual(process_pending_events(), (0, 0))
+
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ("failed", 2))
+
+    def test_command_backs_off_after_failures(self):
+        WebhookEvent.objects.create(
+            event_id="evt_bad", type="payment_intent.succeeded", payload={}
+        )
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with self.assertLogs("payments.webhooks", "ERROR"):
+            call_command("process_webhooks", "--once", stdout=stdout, stderr=stderr)
+
+        # One attempt, then the --once run stops instead of retrying at once
+        self.assertEqual(WebhookEvent.objects.get().attempts, 1)
+        self.assertNotIn("Processed 1 events", stdout.getvalue())
+        self.assertIn("1 events failed", stderr.getvalue())
+
+    def test_worker_serves_payment_outcomes(self):
+        succeeded = PAYMENTS.labels("webhook", "success")
+        before = succeeded._value.get()
+        intent_event("evt_1", "payment_intent.succeeded", "pi_1", 100)
+        intent_event("evt_2", "payment_intent.succeeded", "pi_2", 100)
+        process_pending_events()
+
+        server = start_metrics_server(0, "127.0.0.1")
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+
+        self.assertEqual(succeeded._value.get(), before + 2)
+        self.assertIn(
+            f'payments_total{{outcome="success",source="webhook"}} {before + 2}',
+            body,
+        )
+
+
+def provider_pages(*pages):
+    """Stand-in for StripeService.list_payment_intents serving ``pages``"""
+    pages = [[{"id": i, "status": status} for i, status in page] for page in pages]
+
+    def list_payment_intents(limit, starting_after=None, created_gte=None):
+        index = 0
+        if starting_after:
+            index = next(
+                n + 1
+                for n, page in enumerate(pages)
+                if page and page[-1]["id"] == starting_after
+            )
+        return {"data": pages[index], "has_more": index + 1 < len(pages)}
+
+    return mock.patch.object(
+        StripeService, "list_payment_intents", side_effect=list_payment_intents
+    )
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        customer = StripeCustomer.objects.create(
+            user=User.objects.create(username="ana"), stripe_customer_id="cus_1"
+        )
+        statuses = ["requires_payment_method", "succeeded", "processing"]
+        for n, status in enumerate(statuses, start=1):
+            order = Order.objects.create(
+                order_number=f"ORD-TEST-{n}",
+                customer_name="Ana",
+                customer_phone="5550000000",
+                address_line_1="1 Main Street",
+                no_exterior="1",
+                card_number="4242",
+                card_holder="Ana",
+                expiry_date="12/2030",
+                cvv="123",
+                total_amount=Decimal("10.00"),
+            )
+            PaymentIntent.objects.create(
+                customer=customer,
+                stripe_payment_intent_id=f"pi_{n}",
+                amount=Decimal("10.00"),
+                status=status,
+                order=order,
+            )
+        self.pages = provider_pages(
+            [("pi_1", "succeeded"), ("pi_2", "succeeded")],
+            [("pi_3", "canceled"), ("pi_remote", "succeeded")],
+        )
+
+    def statuses(self):
+        return dict(
+            PaymentIntent.objects.values_list("stripe_payment_intent_id", "status")
+        )
+
+    def test_mismatches_are_fixed_page_by_page(self):
+        with self.pages as list_payment_intents:
+            report = reconcile_payment_intents()
+
+        self.assertEqual(list_payment_intents.call_count, 2)
+        self.assertEqual(report["pages"], 2)
+        self.assertEqual(report["provider_seen"], 4)
+        self.assertEqual(report["missing_sample"], ["pi_remote"])
+        self.assertEqual(report["status_mismatches"], {"succeeded": 1, "canceled": 1})
+        self.assertEqual(report["orders_marked_paid"], 2)
+        self.assertEqual(report["orders_transaction_filled"], 2)
+        self.assertEqual(
+            self.statuses(),
+            {"pi_1": "succeeded", "pi_2": "succeeded", "pi_3": "canceled"},
+        )
+        orders = Order.objects.order_by("pk")
+        self.assertEqual(
+            [(order.status, order.transaction_id) for order in orders],
+            [("paid", "pi_1"), ("paid", "pi_2"), ("pending", None)],
+        )
+
+        # Nothing left to fix
+        with self.pages:
+            report = reconcile_payment_intents()
+        self.assertEqual(report["status_mismatches"], {})
+        self.assertEqual(report["orders_marked_paid"], 0)
+
+    def test_dry_run_only_reports(self):
+        with self.pages:
+            report = reconcile_payment_intents(dry_run=True)
+
+        self.assertEqual(report["orders_marked_paid"], 2)
+        self.assertEqual(self.statuses()["pi_1"], "requires_payment_method")
+        self.assertFalse(Order.objects.filter(status="paid").exists())
+
+    def test_stuck_intents_are_reported(self):
+        PaymentIntent.objects.filter(stripe_payment_intent_id="pi_3").update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        stdout = io.StringIO()
+        with provider_pages([]):
+            call_command("reconcile_payments", "--dry-run", stdout=stdout)
+        self.assertIn("Stuck locally:              1", stdout.getvalue())
+
+    def test_page_size_is_bounded(self):
+        with self.assertRaisesMessage(CommandError, "--page-size"):
+            call_command("reconcile_payments", "--page-size", "101")
+
+
+def mock_create_customer(**kwargs):
+    return mock.patch.object(
+        customers.StripeService, "create_customer", autospec=True, **kwargs
+    )
+
+
+class CustomerResolutionTests(TestCase):
+    def setUp(self):
+        customer_cache.clear()
+        self.addCleanup(customer_cache.clear)
+        self.user = User.objects.create(username="ana")
+
+    def test_existing_customer_is_resolved_locally_then_cached(self):
+        customer = StripeCustomer.objects.create(
+            user=self.user, stripe_customer_id="cus_1"
+        )
+        with mock_create_customer() as create:
+            self.assertEqual(resolve_stripe_customer(self.user), (customer.pk, "cus_1"))
+            with self.assertNumQueries(0):
+                resolve_stripe_customer(self.user)
+        create.assert_not_called()
+
+    def test_missing_customer_is_created_once(self):
+        with self.settings(STRIPE_IDEMPOTENCY_KEY_PREFIX="staging-"):
+            with mock_create_customer(return_value="cus_new") as create:
+                pk, stripe_customer_id = resolve_stripe_customer(self.user)
+                customer_cache.clear()
+                self.assertEqual(resolve_stripe_customer(self.user)[0], pk)
+
+        create.assert_called_once_with(
+            self.user, idempotency_key=f"staging-stripe-customer-user-{self.user.pk}"
+        )
+        self.assertEqual(stripe_customer_id, "cus_new")
+        self.assertEqual(StripeCustomer.objects.get(pk=pk).user, self.user)
+
+    def test_idempotency_keys_are_scoped_to_the_database(self):
+        key = customers.idempotency_key(1)
+        self.assertTrue(key.endswith("-stripe-customer-user-1"))
+        with mock.patch.dict(connection.settings_dict, {"NAME": "other"}):
+            self.assertNotEqual(customers.idempotency_key(1), key)
+
+    def test_unsaved_user_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_stripe_customer(User(username="new"))
+
+
+class ConcurrentCustomerResolutionTests(TransactionTestCase):
+    def setUp(self):
+        customer_cache.clear()
+        self.addCleanup(customer_cache.clear)
+
+    def resolve_in_thread(self, user, results):
+        def resolve():
+            try:
+                results.append(resolve_stripe_customer(user))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=resolve)
+        thread.start()
+        return thread
+
+    def test_one_creation_per_user_without_blocking_others(self):
+        ana = User.objects.create(username="ana")
+        ben = User.objects.create(username="ben")
+        ben_customer = StripeCustomer.objects.create(
+            user=ben, stripe_customer_id="cus_ben"
+        )
+        calling, release = threading.Event(), threading.Event()
+
+        def create_customer(user, idempotency_key=None):
+            calling.set()
+            release.wait(5)
+            return "cus_ana"
+
+        results = []
+        with mock_create_customer(side_effect=create_customer) as create:
+            threads = [self.resolve_in_thread(ana, results) for _ in range(3)]
+            self.assertTrue(calling.wait(5))
+            # Ana's creation is waiting on Stripe; Ben doesn't wait for it
+            self.assertEqual(resolve_stripe_customer(ben), (ben_customer.pk, "cus_ben"))
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        create.assert_called_once()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(results[0][1], "cus_ana")
+        self.assertEqual(StripeCustomer.objects.filter(user=ana).count(), 1)
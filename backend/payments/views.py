@@ -6,7 +6,9 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from .models import PaymentIntent, StripeCustomer
+from .models import PaymentIntent, WebhookEvent
+from .services.customers import resolve_stripe_customer
+from .services.stripe_client import stripe
 from .services.stripe_service import StripeService
 
 
@@ -18,22 +20,17 @@ def create_payment_intent(request):
         amount = data.get("amount")  # Amount in cents
         currency = data.get("currency", "usd")
 
-        # Get or create Stripe customer
-        customer, created = StripeCustomer.objects.get_or_create(
-            user=request.user,
-            defaults={
-                "stripe_customer_id": StripeService.create_customer(request.user)
-            },
-        )
+        # Only contacts Stripe when the user has no customer yet
+        customer_pk, stripe_customer_id = resolve_stripe_customer(request.user)
 
         # Create payment intent
         intent_data = StripeService.create_payment_intent(
-            amount=amount, currency=currency, customer_id=customer.stripe_customer_id
+            amount=amount, currency=currency, customer_id=stripe_customer_id
         )
 
         # Save payment intent to database
         PaymentIntent.objects.create(
-            customer=customer,
+            customer_id=customer_pk,
             stripe_payment_intent_id=intent_data["id"],
             amount=amount / 100,  # Convert back to dollars
             currency=currency,
@@ -55,14 +52,9 @@ def create_payment_intent(request):
 def create_setup_intent(request):
     """Create SetupIntent for saving payment method"""
     try:
-        customer, created = StripeCustomer.objects.get_or_create(
-            user=request.user,
-            defaults={
-                "stripe_customer_id": StripeService.create_customer(request.user)
-            },
-        )
+        customer_pk, stripe_customer_id = resolve_stripe_customer(request.user)
 
-        setup_data = StripeService.create_setup_intent(customer.stripe_customer_id)
+        setup_data = StripeService.create_setup_intent(stripe_customer_id)
 
         return JsonResponse(
             {
@@ -78,69 +70,35 @@ def create_setup_intent(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def stripe_webhook(request):
-    """Handle Stripe webhooks"""
+    """
+    Verify a Stripe webhook and queue it in the inbox
+
+    Events are applied later in batches by the process_webhooks worker, so
+    retry storms never compete with checkout for database time.
+    """
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
     try:
         # Verify webhook signature
-        event = stripe.Webhook.construct_event(
+        payload = payload.decode("utf-8")
+        stripe.WebhookSignature.verify_header(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
-    except ValueError as e:
+        event = json.loads(payload)
+        event_id, event_type = event["id"], event["type"]
+    except (ValueError, KeyError, TypeError):
         # Invalid payload
         return JsonResponse({"error": "Invalid payload"}, status=400)
-    except stripe.error.SignatureVerificationError as e:
+    except stripe.SignatureVerificationError:
         # Invalid signature
         return JsonResponse({"error": "Invalid signature"}, status=400)
 
-    # Handle the event
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent = event["data"]["object"]
-        handle_payment_succeeded(payment_intent)
-    elif event["type"] == "payment_intent.payment_failed":
-        payment_intent = event["data"]["object"]
-        handle_payment_failed(payment_intent)
-    elif event["type"] == "customer.subscription.created":
-        subscription = event["data"]["object"]
-        handle_subscription_created(subscription)
-    # Add more event handlers as needed
+    # Stripe redelivers events with the same id; the unique constraint on
+    # event_id turns duplicates into no-ops
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event_id, type=event_type, payload=event)],
+        ignore_conflicts=True,
+    )
 
     return JsonResponse({"success": True})
-
-
-def handle_payment_succeeded(payment_intent):
-    """Handle successful payment"""
-    try:
-        # Update your database
-        payment = PaymentIntent.objects.get(
-            stripe_payment_intent_id=payment_intent["id"]
-        )
-        payment.status = "succeeded"
-        payment.save()
-
-        # Update order status, send confirmation email, etc.
-        if payment.order:
-            payment.order.status = "paid"
-            payment.order.save()
-
-    except PaymentIntent.DoesNotExist:
-        pass
-
-
-def handle_payment_failed(payment_intent):
-    """Handle failed payment"""
-    try:
-        payment = PaymentIntent.objects.get(
-            stripe_payment_intent_id=payment_intent["id"]
-        )
-        payment.status = "failed"
-        payment.save()
-
-        # Notify user, update order status, etc.
-        if payment.order:
-            payment.order.status = "payment_failed"
-            payment.order.save()
-
-    except PaymentIntent.DoesNotExist:
-        pass  # Create your views here.
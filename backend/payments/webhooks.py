@@ -0,0 +1,207 @@
+"""
+Batch processing of the Stripe webhook inbox
+
+stripe_webhook only verifies and stores events. ``process_pending_events``
+claims a batch of pending WebhookEvent rows, folds them into the latest
+status per payment intent and applies the result with one UPDATE per target
+status on PaymentIntent and Order, instead of a query and save per event.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Q, Value, When
+from django.utils import timezone
+
+from delivery.models import Order
+from delivery.signals import invalidate_cached_orders
+from django_project import metrics
+
+from .models import PaymentIntent, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Stripe event type -> (PaymentIntent.status, Order.status)
+PAYMENT_INTENT_TRANSITIONS = {
+    "payment_intent.succeeded": ("succeeded", "paid"),
+    "payment_intent.payment_failed": ("failed", "payment_failed"),
+}
+
+# Stripe's ``created`` has a resolution of one second, and within one second
+# a payment can fail and then succeed but never the reverse: on a tie these
+# event types win, however the events were delivered
+SETTLING_EVENTS = {"payment_intent.succeeded"}
+
+# PaymentIntent.status -> payments_total outcome label
+PAYMENT_OUTCOMES = {"succeeded": "success", "failed": "failure"}
+
+
+def apply_payment_intent_events(events):
+    """
+    Apply payment intent events with set-based updates
+
+    Only the newest event per payment intent counts, within the batch and
+    against the last event applied to the intent (``last_event_created``),
+    so a retried or out-of-order delivery can't move a payment back to an
+    older state. Events created in the same second are ordered by
+    ``SETTLING_EVENTS``, in a batch and across batches alike.
+    """
+    latest = {}
+    for event in events:
+        if event.type not in PAYMENT_INTENT_TRANSITIONS:
+            continue
+
+        intent_id = event.payload["data"]["object"]["id"]
+        key = (event.payload.get("created", 0), event.type in SETTLING_EVENTS)
+        if intent_id not in latest or key > latest[intent_id][0]:
+            latest[intent_id] = (key, event.type)
+
+    by_type = {}
+    for intent_id, ((created, _), event_type) in latest.items():
+        by_type.setdefault(event_type, {})[intent_id] = created
+
+    now = timezone.now()
+    outcomes = {}
+    for event_type, created_by_intent in by_type.items():
+        intent_status, order_status = PAYMENT_INTENT_TRANSITIONS[event_type]
+        lookup = (
+            "last_event_created__lte"
+            if event_type in SETTLING_EVENTS
+            else "last_event_created__lt"
+        )
+
+        # Intents that haven't seen a newer event yet, locked until commit
+        newer = Q()
+        for intent_id, created in created_by_intent.items():
+            newer |= Q(stripe_payment_intent_id=intent_id, **{lookup: created})
+        intent_ids = list(
+            PaymentIntent.objects.select_for_update()
+            .filter(newer)
+            .values_list("stripe_payment_intent_id", flat=True)
+        )
+        if not intent_ids:
+            continue
+
+        PaymentIntent.objects.filter(stripe_payment_intent_id__in=intent_ids).update(
+            status=intent_status,
+            updated_at=now,
+            last_event_created=Case(
+                *(
+                    When(
+                        stripe_payment_intent_id=intent_id,
+                        then=Value(created_by_intent[intent_id]),
+                    )
+                    for intent_id in intent_ids
+                ),
+                default=F("last_event_created"),
+                output_field=BigIntegerField(),
+            ),
+        )
+        order_ids = list(
+            Order.objects.filter(
+                paymentintent__stripe_payment_intent_id__in=intent_ids
+            ).values_list("pk", flat=True)
+        )
+        # A bulk update sends no signals
+        Order.objects.filter(pk__in=order_ids).update(
+            status=order_status, last_updated=now
+        )
+        invalidate_cached_orders(*order_ids)
+
+        outcomes[intent_status] = len(intent_ids)
+
+    return outcomes
+
+
+def claim_pending_events(batch_size, pks=None):
+    """Lock up to ``batch_size`` pending events (of ``pks``), oldest first"""
+    events = WebhookEvent.objects.select_for_update(skip_locked=True).filter(
+        status="pending"
+    )
+    if pks is not None:
+        events = events.filter(pk__in=pks)
+    # skip_locked lets several workers drain the inbox side by side
+    return list(events.order_by("received_at")[:batch_size])
+
+
+def apply_events(events):
+    """Apply claimed ``events`` and mark them processed, in the caller's transaction"""
+    outcomes = apply_payment_intent_events(events)
+    WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+        status="processed",
+        processed_at=timezone.now(),
+        attempts=F("attempts") + 1,
+        last_error=None,
+    )
+    return outcomes
+
+
+def record_outcomes(outcomes):
+    # Counted only once the events have committed
+    for intent_status, count in outcomes.items():
+        metrics.record_payment("webhook", PAYMENT_OUTCOMES[intent_status], count)
+
+
+def record_failure(event, error):
+    """Use up one of ``event``'s attempts, parking it after the last one"""
+    WebhookEvent.objects.filter(pk=event.pk).update(
+        attempts=F("attempts") + 1, last_error=str(error)
+    )
+    # Park events that keep failing so they stop blocking the queue
+    WebhookEvent.objects.filter(
+        pk=event.pk, attempts__gte=settings.STRIPE_WEBHOOK_MAX_ATTEMPTS
+    ).update(status="failed")
+
+
+def process_events_one_by_one(events):
+    """
+    Process ``events`` in a transaction each, so only the ones that fail use
+    up an attempt; returns (processed, failed)
+    """
+    processed = failed = 0
+    for event in events:
+        try:
+            with transaction.atomic():
+                claimed = claim_pending_events(1, [event.pk])
+                if not claimed:
+                    # Taken (or finished) by another worker meanwhile
+                    continue
+                outcomes = apply_events(claimed)
+        except Exception as e:
+            logger.exception("webhook event failed", extra={"event_id": event.event_id})
+            record_failure(event, e)
+            failed += 1
+        else:
+            record_outcomes(outcomes)
+            processed += 1
+    return processed, failed
+
+
+def process_pending_events(batch_size=None):
+    """
+    Claim and process one batch of pending events
+
+    Returns the numbers of events (processed, failed): both 0 when the inbox
+    is empty. A batch that fails as a whole is retried one event at a time.
+    """
+    batch_size = batch_size or settings.STRIPE_WEBHOOK_BATCH_SIZE
+    events = []
+
+    try:
+        with transaction.atomic():
+            events = claim_pending_events(batch_size)
+            if not events:
+                return 0, 0
+            outcomes = apply_events(events)
+    except Exception:
+        if not events:
+            raise
+        logger.exception(
+            "webhook batch failed, retrying its events one by one",
+            extra={"batch_size": len(events)},
+        )
+        return process_events_one_by_one(events)
+
+    record_outcomes(outcomes)
+    return len(events), 0